@@ -1,17 +1,24 @@
 import asyncio
 import json
-import os
-import sys
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional, AsyncGenerator
 from datetime import datetime
 
-import requests
 from pydantic import BaseModel
 
 from config import AgentConfig, settings
+from llm import (
+    get_llm_backend, get_response_cache, LLMResponseCache, get_rate_limiter,
+    get_singleflight, get_model_router, get_request_hedger, LLMRequestError
+)
 from memory.context import ConversationContext
-from tools import get_tool_by_name
+from memory.sessions import current_session
+from tools import get_tool_by_name, get_tool_keywords
+from utils.keyword_matcher import MessageFeatures, extract_features, register_keyword_groups
+from .intent import IntentEngine, classify_intent
+from .pipeline import PreparedRequest, StageTimer
+from .prompt_builder import PromptBuilder, estimate_tokens, estimate_message_tokens
 
 
 class AgentResponse(BaseModel):
@@ -24,140 +31,394 @@ class AgentResponse(BaseModel):
     metadata: Dict[str, Any] = {}
 
 
+class AgentStreamEvent(BaseModel):
+    """A single event from a streaming agent response"""
+    type: str  # "token" or "response"
+    content: str = ""
+    response: Optional[AgentResponse] = None
+
+
 class BaseAgent(ABC):
     """Base class for all AI agents in the system"""
     
+    # Number of recent interactions included as chat history
+    history_turns = 5
+    
+    # Shown to the user when processing fails
+    error_message = "I apologize, but I encountered an error while processing your request"
+    error_reasoning = "Error occurred during processing"
+    
+    # Routing keyword tables by group, compiled into the shared keyword matcher
+    keyword_groups: Dict[str, List[str]] = {}
+    
+    # Name of this agent's configuration in settings
+    config_name: str = ""
+    
     def __init__(self, config: AgentConfig):
         self.config = config
         self.name = config.name
         self.personality = config.personality
         self.capabilities = config.capabilities
-        self.tools = [get_tool_by_name(tool_name) for tool_name in config.tools]
+        self.tool_names = list(config.tools)
         
-        # Initialize OpenRouter client
-        self.openrouter_api_key = os.environ.get('OPENROUTER_API_KEY')
-        if not self.openrouter_api_key:
-            sys.exit('OPENROUTER_API_KEY environment variable must be set')
+        # LLM backend selected in settings (OpenRouter or the offline local backend)
+        self.backend = get_llm_backend()
+        self.model_router = get_model_router()
         
-        # OpenRouter configuration
-        self.model = settings.model_name
-        self.openrouter_url = "https://openrouter.ai/api/v1/chat/completions"
+        # Tools and conversation context are built on first use
+        self._tools = None
+        self._conversation_context = None
+        self.intent_engine = IntentEngine()
         
-        self.conversation_context = ConversationContext(agent_name=self.name)
+        register_keyword_groups(self.routing_keyword_groups(config))
+    
+    @property
+    def tools(self) -> List[Any]:
+        if self._tools is None:
+            self._tools = [get_tool_by_name(tool_name) for tool_name in self.tool_names]
+        return self._tools
+    
+    @property
+    def conversation_context(self) -> ConversationContext:
+        # Requests bound to a session read and write that session's history
+        session = current_session()
+        if session is not None:
+            return session.context_for(self.name)
+        
+        if self._conversation_context is None:
+            self._conversation_context = ConversationContext(agent_name=self.name)
+        return self._conversation_context
+    
+    async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None,
+                              record: bool = True) -> AgentResponse:
+        """Process a message and return a response, adding the exchange to context unless record is False"""
+        timer = StageTimer()
+        prepared = None
+        
+        try:
+            prepared = await self._prepare_request(message, context, timer)
+            self._apply_prompt_budget(prepared, timer)
+            
+            with timer.measure("llm"):
+                response_content = await self._call_llm(prepared.messages, priority=prepared.priority)
+            
+            return self._finalize_response(message, response_content, prepared, timer, record)
+            
+        except Exception as e:
+            return self._error_response(e, prepared, timer)
+    
+    async def process_message_stream(self, message: str,
+                                     context: Optional[Dict[str, Any]] = None) -> AsyncGenerator[AgentStreamEvent, None]:
+        """
+        Process a message, yielding tokens as they arrive.
+        
+        Yields "token" events during generation followed by exactly one
+        "response" event carrying the finished AgentResponse.
+        """
+        timer = StageTimer()
+        prepared = None
+        
+        try:
+            prepared = await self._prepare_request(message, context, timer)
+            self._apply_prompt_budget(prepared, timer)
+            
+            chunks = []
+            with timer.measure("llm"):
+                async for chunk in self._stream_llm(prepared.messages, priority=prepared.priority):
+                    if not chunks:
+                        timer.mark("first_token")
+                    chunks.append(chunk)
+                    yield AgentStreamEvent(type="token", content=chunk)
+            
+            response = self._finalize_response(message, "".join(chunks), prepared, timer)
+            
+        except Exception as e:
+            response = self._error_response(e, prepared, timer)
+        
+        yield AgentStreamEvent(type="response", response=response)
+    
+    def _error_response(self, error: Exception, prepared: Optional[PreparedRequest],
+                        timer: StageTimer) -> AgentResponse:
+        return AgentResponse(
+            content=f"{self.error_message}: {error}",
+            agent_name=self.name,
+            tools_used=prepared.tools_used if prepared else [],
+            confidence=0.1,
+            reasoning=self.error_reasoning,
+            metadata={"error": str(error), "stage_timings": timer.summary()}
+        )
     
     @abstractmethod
-    async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> AgentResponse:
-        """Process a message and return a response"""
+    async def _prepare_request(self, message: str, context: Optional[Dict[str, Any]],
+                               timer: StageTimer) -> PreparedRequest:
+        """Run intent analysis, tools and history assembly for a message"""
         pass
     
-    def can_handle(self, message: str, context: Optional[Dict[str, Any]] = None) -> float:
+    def _finalize_response(self, message: str, response_content: str,
+                           prepared: PreparedRequest, timer: StageTimer, record: bool = True) -> AgentResponse:
+        """Format the LLM output, record it in context and wrap it in an AgentResponse"""
+        
+        if prepared.format_response:
+            response_content = prepared.format_response(response_content)
+        
+        # Add to conversation context
+        if record:
+            self.add_to_context(message, response_content)
+        
+        return AgentResponse(
+            content=response_content,
+            agent_name=self.name,
+            tools_used=prepared.tools_used,
+            confidence=prepared.confidence,
+            reasoning=prepared.reasoning,
+            metadata={**prepared.metadata, "stage_timings": timer.summary()}
+        )
+    
+    def _build_history_messages(self, count: int) -> List[Dict[str, str]]:
+        """Turn recent conversation context into LLM chat messages"""
+        messages = []
+        
+        for hist in self.conversation_context.get_recent_messages(count):
+            messages.append({"role": "user", "content": hist["user"]})
+            messages.append({"role": "assistant", "content": hist["assistant"]})
+        
+        return messages
+    
+    def _history_token_budget(self, current_messages: List[Dict[str, str]]) -> int:
+        """Tokens left for history after the system prompt, current prompt and reply"""
+        return (
+            settings.model_context_tokens
+            - self.config.max_tokens
+            - estimate_tokens(self.config.system_prompt)
+            - estimate_message_tokens(current_messages)
+            - settings.prompt_safety_margin_tokens
+        )
+    
+    def _apply_prompt_budget(self, prepared: PreparedRequest, timer: StageTimer):
+        """Fit the history in front of the current prompt into the model's context window"""
+        
+        with timer.measure("prompt_budget"):
+            history, current = prepared.messages[:-1], prepared.messages[-1:]
+            builder = PromptBuilder(self._history_token_budget(current))
+            history, budget = builder.build(history)
+            
+            prepared.messages = history + current
+            prepared.metadata["prompt_budget"] = budget.to_dict()
+    
+    @classmethod
+    def routing_keyword_groups(cls, config: Optional[AgentConfig] = None) -> Dict[str, List[str]]:
+        """Keyword groups this agent scores messages with, available without building the agent"""
+        config = config or settings.get_agent_config(cls.config_name)
+        groups = {f"{config.name}.{name}": keywords for name, keywords in cls.keyword_groups.items()}
+        groups[f"{config.name}.capabilities"] = config.capabilities
+        
+        for tool_name in config.tools:
+            keywords = get_tool_keywords(tool_name)
+            if keywords:
+                groups[f"tool.{tool_name}"] = keywords
+        
+        return groups
+    
+    @staticmethod
+    def _group(config: AgentConfig, name: str) -> str:
+        """Name of one of an agent's groups in the shared keyword matcher"""
+        return f"{config.name}.{name}"
+    
+    @classmethod
+    def routing_score(cls, message: str, context: Optional[Dict[str, Any]] = None,
+                      features: Optional[MessageFeatures] = None,
+                      config: Optional[AgentConfig] = None) -> float:
         """
-        Determine if this agent can handle the given message.
-        Returns a confidence score between 0.0 and 1.0
+        Confidence between 0.0 and 1.0 that this agent suits the message.
+        Scored from the agent's configuration, so the agent needn't be built.
         """
+        config = config or settings.get_agent_config(cls.config_name)
+        
         # Default implementation based on keywords
-        message_lower = message.lower()
-        score = 0.0
+        features = features or extract_features(message)
         
         # Check for capability keywords
-        for capability in self.capabilities:
-            if capability.lower() in message_lower:
-                score += 0.3
+        score = features.count(cls._group(config, "capabilities")) * 0.3
         
         # Check for tool-related keywords
-        for tool in self.tools:
-            if hasattr(tool, 'keywords'):
-                for keyword in tool.keywords:
-                    if keyword.lower() in message_lower:
-                        score += 0.2
+        for tool_name in config.tools:
+            score += features.count(f"tool.{tool_name}") * 0.2
         
         return min(score, 1.0)
     
-    async def _call_llm(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None) -> str:
-        """Call the OpenRouter LLM with the given messages"""
+    @classmethod
+    def scores_without_instance(cls) -> bool:
+        """Whether routing_score gives this agent's score, or can_handle is overridden and needs an instance"""
+        return cls.can_handle is BaseAgent.can_handle
+    
+    def can_handle(self, message: str, context: Optional[Dict[str, Any]] = None,
+                   features: Optional[MessageFeatures] = None) -> float:
+        """
+        Determine if this agent can handle the given message.
+        Returns a confidence score between 0.0 and 1.0
+        """
+        return self.routing_score(message, context, features, self.config)
+    
+    async def _call_llm(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None,
+                        priority: int = 3, call_class: str = "answer") -> str:
+        """Call the LLM backend with the given messages"""
         try:
-            # Prepare system message
-            if not system_prompt:
-                system_prompt = self.config.system_prompt
-            
-            # Add system message to the beginning
-            formatted_messages = []
-            if system_prompt:
-                formatted_messages.append({"role": "system", "content": system_prompt})
-            formatted_messages.extend(messages)
-                
-            headers = {
-                "Authorization": f"Bearer {self.openrouter_api_key}",
-                "Content-Type": "application/json"
-            }
+            models = self.model_router.candidates(call_class)
+            payload = self._build_payload(messages, system_prompt, models[0])
+            
+            # Serve repeated requests from the response cache
+            cache = get_response_cache() if self._should_cache() else None
+            cache_key = LLMResponseCache.make_key(payload)
+            
+            if cache:
+                cached_response = await cache.get(cache_key)
+                if cached_response is not None:
+                    return cached_response
             
-            payload = {
-                "model": self.model,
-                "messages": formatted_messages,
-                "max_tokens": self.config.max_tokens,
-                "temperature": self.config.temperature
-            }
+            async def send():
+                content = await self._complete_with_failover(payload, models, priority)
+                if cache:
+                    await cache.set(cache_key, content)
+                return content
             
-            response = requests.post(self.openrouter_url, headers=headers, json=payload)
-            response.raise_for_status()
+            # Identical requests already in flight share one completion
+            if settings.singleflight_enabled and self.config.cache_responses:
+                return await get_singleflight("llm").do(cache_key, send)
             
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            return await send()
             
         except Exception as e:
             raise Exception(f"Error calling LLM: {e}")
     
-    async def _stream_llm(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
-        """Stream responses from the OpenRouter LLM"""
+    def _build_payload(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None,
+                       model: Optional[str] = None) -> Dict[str, Any]:
+        """Build the chat completion payload, prepending the system prompt"""
+        
+        # Prepare system message
+        if not system_prompt:
+            system_prompt = self.config.system_prompt
+        
+        # Add system message to the beginning
+        formatted_messages = []
+        if system_prompt:
+            formatted_messages.append({"role": "system", "content": system_prompt})
+        formatted_messages.extend(messages)
+        
+        return {
+            "model": model or settings.model_name,
+            "messages": formatted_messages,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature
+        }
+    
+    async def _complete_with_failover(self, payload: Dict[str, Any], models: List[str], priority: int) -> str:
+        """Try each candidate model in turn until one returns a completion"""
+        for index, model in enumerate(models):
+            is_last = index == len(models) - 1
+            try:
+                # Only the last candidate spends retries; earlier ones fail over straight away
+                return await self._send_with_retries({**payload, "model": model}, priority,
+                                                     max_retries=settings.llm_max_retries if is_last else 0)
+            except LLMRequestError as e:
+                if is_last:
+                    raise
+                self.model_router.record_failover(model, models[index + 1], e)
+    
+    async def _send_with_retries(self, payload: Dict[str, Any], priority: int,
+                                 max_retries: Optional[int] = None) -> str:
+        """Send a completion, retrying on 429/5xx and timeouts"""
+        if max_retries is None:
+            max_retries = settings.llm_max_retries
+        
+        for attempt in range(max_retries + 1):
+            try:
+                if settings.llm_hedging_enabled:
+                    return await get_request_hedger().run(
+                        payload["model"], lambda: self._attempt_completion(payload, priority)
+                    )
+                return await self._attempt_completion(payload, priority)
+            except LLMRequestError as e:
+                if not e.retryable or attempt >= max_retries:
+                    raise
+    
+    async def _attempt_completion(self, payload: Dict[str, Any], priority: int) -> str:
+        """Make one rate-limited completion request with a timeout, recording model health"""
+        limiter = get_rate_limiter()
+        timeout = settings.llm_request_timeout_seconds
+        
+        # The limiter holds retries back until any Retry-After has passed
+        async with limiter.slot(priority):
+            start = time.monotonic()
+            try:
+                content = await asyncio.wait_for(self.backend.complete(payload), timeout)
+            except asyncio.TimeoutError:
+                self.model_router.record(payload["model"], (time.monotonic() - start) * 1000, ok=False)
+                raise LLMRequestError(f"Request timed out after {timeout:.0f}s")
+            except LLMRequestError:
+                self.model_router.record(payload["model"], (time.monotonic() - start) * 1000, ok=False)
+                raise
+            
+            self.model_router.record(payload["model"], (time.monotonic() - start) * 1000, ok=True)
+            return content
+    
+    def _should_cache(self) -> bool:
+        """Check whether LLM responses for this agent may be cached"""
+        return settings.llm_cache_enabled and self.config.cache_responses
+    
+    async def _stream_llm(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None,
+                          priority: int = 3, call_class: str = "answer") -> AsyncGenerator[str, None]:
+        """Stream responses from the LLM backend"""
         try:
-            if not system_prompt:
-                system_prompt = self.config.system_prompt
-            
-            # Add system message to the beginning
-            formatted_messages = []
-            if system_prompt:
-                formatted_messages.append({"role": "system", "content": system_prompt})
-            formatted_messages.extend(messages)
-                
-            headers = {
-                "Authorization": f"Bearer {self.openrouter_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": formatted_messages,
-                "max_tokens": self.config.max_tokens,
-                "temperature": self.config.temperature,
-                "stream": True
-            }
-            
-            response = requests.post(self.openrouter_url, headers=headers, json=payload, stream=True)
-            response.raise_for_status()
-            
-            for line in response.iter_lines():
-                if line:
-                    line_str = line.decode('utf-8')
-                    if line_str.startswith('data: '):
-                        if line_str == 'data: [DONE]':
-                            break
-                        try:
-                            data = json.loads(line_str[6:])
-                            if 'choices' in data and len(data['choices']) > 0:
-                                delta = data['choices'][0].get('delta', {})
-                                if 'content' in delta:
-                                    yield delta['content']
-                        except json.JSONDecodeError:
-                            continue
+            models = self.model_router.candidates(call_class)
+            payload = self._build_payload(messages, system_prompt, models[0])
+            
+            # A cached completion is replayed as a single chunk
+            cache = get_response_cache() if self._should_cache() else None
+            cache_key = LLMResponseCache.make_key(payload)
+            
+            if cache:
+                cached_response = await cache.get(cache_key)
+                if cached_response is not None:
+                    yield cached_response
+                    return
+            
+            chunks = []
+            
+            for index, model in enumerate(models):
+                start = time.monotonic()
+                try:
+                    # Streams hold a slot for the whole generation, so their duration isn't a latency signal
+                    async with get_rate_limiter().slot(priority, track_latency=False):
+                        async for chunk in self.backend.stream({**payload, "model": model}):
+                            if not chunks:
+                                # Time to first token is the stream's latency sample
+                                self.model_router.record(model, (time.monotonic() - start) * 1000, ok=True)
+                            chunks.append(chunk)
+                            yield chunk
+                    break
+                except LLMRequestError as e:
+                    if not chunks:
+                        self.model_router.record(model, (time.monotonic() - start) * 1000, ok=False)
+                    # Once text has reached the caller the stream can't switch models
+                    if chunks or index == len(models) - 1:
+                        raise
+                    self.model_router.record_failover(model, models[index + 1], e)
+            
+            if cache and chunks:
+                await cache.set(cache_key, "".join(chunks))
                     
         except Exception as e:
-            yield f"Error streaming response: {e}"
+            raise Exception(f"Error streaming response: {e}")
     
     async def use_tool(self, tool_name: str, **kwargs) -> Dict[str, Any]:
         """Use a specific tool"""
         for tool in self.tools:
             if tool.name == tool_name:
                 try:
+                    # Concurrent identical calls to side-effect free tools run once
+                    if settings.singleflight_enabled and getattr(tool, "idempotent", False):
+                        key = f"{tool_name}:{json.dumps(kwargs, sort_keys=True, default=str)}"
+                        return await get_singleflight("tools").do(key, lambda: tool.execute(**kwargs))
                     return await tool.execute(**kwargs)
                 except Exception as e:
                     return {"error": f"Tool execution failed: {e}"}
@@ -166,7 +427,7 @@ class BaseAgent(ABC):
     
     def get_available_tools(self) -> List[str]:
         """Get list of available tool names"""
-        return [tool.name for tool in self.tools]
+        return list(self.tool_names)
     
     def add_to_context(self, message: str, response: str):
         """Add interaction to conversation context"""
@@ -178,16 +439,30 @@ class BaseAgent(ABC):
     
     def get_info(self) -> Dict[str, Any]:
         """Get information about this agent"""
+        return self.describe(self.config)
+    
+    @classmethod
+    def describe(cls, config: Optional[AgentConfig] = None) -> Dict[str, Any]:
+        """Get information about this agent from its configuration, without building it"""
+        config = config or settings.get_agent_config(cls.config_name)
         return {
-            "name": self.name,
-            "personality": self.personality,
-            "capabilities": self.capabilities,
-            "tools": self.get_available_tools(),
-            "description": self.config.system_prompt[:200] + "..." if len(self.config.system_prompt) > 200 else self.config.system_prompt
+            "name": config.name,
+            "personality": config.personality,
+            "capabilities": config.capabilities,
+            "tools": list(config.tools),
+            "description": config.system_prompt[:200] + "..." if len(config.system_prompt) > 200 else config.system_prompt
         }
     
     async def _analyze_intent(self, message: str) -> Dict[str, Any]:
         """Analyze the intent of the user message"""
+        return await self.intent_engine.analyze(message, self._local_intent, self._llm_intent)
+    
+    def _local_intent(self, message: str) -> Dict[str, Any]:
+        """Rule-based intent analysis that needs no LLM round trip"""
+        return classify_intent(message, self.get_available_tools())
+    
+    async def _llm_intent(self, message: str) -> Optional[Dict[str, Any]]:
+        """Analyze intent with the LLM, returning None if the response can't be used"""
         analysis_prompt = f"""
         Analyze the following user message and determine:
         1. The main intent or goal
@@ -203,29 +478,18 @@ class BaseAgent(ABC):
         try:
             response = await self._call_llm([
                 {"role": "user", "content": analysis_prompt}
-            ])
+            ], call_class="intent")
             
             # Try to parse JSON response
             import re
             json_match = re.search(r'\{.*\}', response, re.DOTALL)
             if json_match:
                 return json.loads(json_match.group())
-            else:
-                return {
-                    "intent": "general_query",
-                    "tools_needed": [],
-                    "priority": 3,
-                    "requirements": []
-                }
                 
-        except Exception as e:
-            return {
-                "intent": "general_query",
-                "tools_needed": [],
-                "priority": 3,
-                "requirements": [],
-                "analysis_error": str(e)
-            }
+        except Exception:
+            pass
+        
+        return None
     
     def __repr__(self):
         return f"{self.__class__.__name__}(name='{self.name}', capabilities={self.capabilities})"
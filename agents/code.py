@@ -4,26 +4,56 @@ import re
 from typing import Dict, Any, List, Optional
 
 from .base import BaseAgent, AgentResponse
-from config import settings
+from .intent import estimate_priority
+from .pipeline import PreparedRequest, StageTimer
+from config import AgentConfig, settings
+from utils.keyword_matcher import MessageFeatures, extract_features
 
 
 class CodeAgent(BaseAgent):
 
+    config_name = "code"
+    history_turns = 3
+    error_message = "I encountered an error while processing your code request"
+    error_reasoning = "Error occurred during code processing"
+    
+    # Supported programming languages
+    supported_languages = [
+        "python", "javascript", "typescript", "java", "c", "cpp", "c++",
+        "go", "rust", "html", "css", "sql", "bash", "shell", "json", "yaml"
+    ]
+    
+    keyword_groups = {
+        "keywords": [
+            "code", "program", "script", "function", "class", "method", "algorithm",
+            "debug", "error", "bug", "fix", "optimize", "refactor", "review",
+            "implement", "create", "write", "develop", "build", "test"
+        ],
+        "languages": supported_languages + ["programming", "software", "development"],
+        "explicit_requests": ["write code", "create function", "debug this", "fix the code"]
+    }
+    
+    # Code-specific patterns, compiled once into a single alternation
+    CODE_PATTERN = re.compile("|".join([
+        r"```", r"def\s+\w+", r"function\s+\w+", r"class\s+\w+", r"import\s+\w+",
+        r"#include", r"public\s+class", r"console\.log", r"print\("
+    ]))
+    
     def __init__(self):
-        config = settings.get_agent_config("code")
+        config = settings.get_agent_config(self.config_name)
         super().__init__(config)
-        
-        # Supported programming languages
-        self.supported_languages = [
-            "python", "javascript", "typescript", "java", "c", "cpp", "c++",
-            "go", "rust", "html", "css", "sql", "bash", "shell", "json", "yaml"
-        ]
     
-    async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> AgentResponse:
-        """Process code-related queries"""
+    async def _prepare_request(self, message: str, context: Optional[Dict[str, Any]],
+                               timer: StageTimer) -> PreparedRequest:
+        """Prepare a code-related query"""
+        
+        # Analyze the coding intent while conversation history is assembled
+        intent_task = timer.start("intent", self._analyze_coding_intent(message))
+        
+        with timer.measure("history"):
+            history_messages = self._build_history_messages(self.history_turns)
         
-        # Analyze the coding intent
-        intent_analysis = await self._analyze_coding_intent(message)
+        intent_analysis = await intent_task
         
         # Determine the type of coding task
         task_type = intent_analysis.get("task_type", "general")
@@ -31,9 +61,10 @@ class CodeAgent(BaseAgent):
         tools_used = []
         execution_result = ""
         
-        # Handle different types of coding tasks
+        # Tools with side effects only run once the intent is known, never speculatively
         if task_type == "execution" and "code_exec" in self.get_available_tools():
-            execution_result = await self._execute_code_safely(message)
+            with timer.measure("code_exec"):
+                execution_result = await self._execute_code_safely(message)
             tools_used.append("code_exec")
         elif task_type == "file_operation" and "file_ops" in self.get_available_tools():
             file_result = await self._handle_file_operations(message)
@@ -42,101 +73,76 @@ class CodeAgent(BaseAgent):
         # Build the coding prompt
         coding_prompt = self._build_coding_prompt(message, intent_analysis, execution_result, context)
         
-        # Get conversation history for context
-        conversation_history = self.conversation_context.get_recent_messages(3)
-        
-        # Build messages for LLM
-        messages = []
-        
-        # Add conversation history
-        for hist in conversation_history:
-            messages.append({"role": "user", "content": hist["user"]})
-            messages.append({"role": "assistant", "content": hist["assistant"]})
-        
-        # Add current query
-        messages.append({"role": "user", "content": coding_prompt})
-        
-        try:
-            response_content = await self._call_llm(messages)
-            
-            # Post-process the response for code formatting
-            formatted_response = self._format_code_response(response_content)
-            
-            # Add to conversation context
-            self.add_to_context(message, formatted_response)
-            
-            return AgentResponse(
-                content=formatted_response,
-                agent_name=self.name,
-                tools_used=tools_used,
-                confidence=0.9,
-                reasoning=f"Code task processed: {task_type}",
-                metadata={
-                    "task_type": task_type,
-                    "intent_analysis": intent_analysis,
-                    "languages_detected": intent_analysis.get("languages", []),
-                    "execution_performed": bool(execution_result)
-                }
-            )
-            
-        except Exception as e:
-            return AgentResponse(
-                content=f"I encountered an error while processing your code request: {e}",
-                agent_name=self.name,
-                tools_used=tools_used,
-                confidence=0.1,
-                reasoning="Error occurred during code processing",
-                metadata={"error": str(e)}
-            )
+        # Add current query after the conversation history
+        messages = history_messages + [{"role": "user", "content": coding_prompt}]
+        
+        return PreparedRequest(
+            messages=messages,
+            tools_used=tools_used,
+            reasoning=f"Code task processed: {task_type}",
+            confidence=0.9,
+            priority=intent_analysis.get("priority", 3),
+            format_response=self._format_code_response,
+            metadata={
+                "task_type": task_type,
+                "intent_analysis": intent_analysis,
+                "languages_detected": intent_analysis.get("languages", []),
+                "execution_performed": bool(execution_result)
+            }
+        )
     
-    def can_handle(self, message: str, context: Optional[Dict[str, Any]] = None) -> float:
+    @classmethod
+    def routing_score(cls, message: str, context: Optional[Dict[str, Any]] = None,
+                      features: Optional[MessageFeatures] = None,
+                      config: Optional[AgentConfig] = None) -> float:
         """Determine if this agent can handle the coding query"""
-        base_score = super().can_handle(message, context)
-        
-        message_lower = message.lower()
-        
-        # Code-related keywords
-        code_keywords = [
-            "code", "program", "script", "function", "class", "method", "algorithm",
-            "debug", "error", "bug", "fix", "optimize", "refactor", "review",
-            "implement", "create", "write", "develop", "build", "test"
-        ]
-        
-        # Programming language keywords
-        lang_keywords = self.supported_languages + ["programming", "software", "development"]
-        
-        # Code-specific patterns
-        code_patterns = [
-            r"```", r"def\s+\w+", r"function\s+\w+", r"class\s+\w+", r"import\s+\w+",
-            r"#include", r"public\s+class", r"console\.log", r"print\("
-        ]
-        
-        keyword_score = 0
+        config = config or settings.get_agent_config(cls.config_name)
+        features = features or extract_features(message)
+        base_score = super().routing_score(message, context, features, config)
         
-        # Check for code keywords
-        for keyword in code_keywords:
-            if keyword in message_lower:
-                keyword_score += 0.25
-        
-        # Check for language keywords
-        for lang in lang_keywords:
-            if lang in message_lower:
-                keyword_score += 0.3
+        # Check for code and language keywords
+        keyword_score = features.count(cls._group(config, "keywords")) * 0.25
+        keyword_score += features.count(cls._group(config, "languages")) * 0.3
         
         # Check for code patterns
-        for pattern in code_patterns:
-            if re.search(pattern, message):
-                keyword_score += 0.4
-                break
+        if cls.CODE_PATTERN.search(message):
+            keyword_score += 0.4
         
         # Boost for explicit code requests
-        if any(phrase in message_lower for phrase in ["write code", "create function", "debug this", "fix the code"]):
+        if features.any(cls._group(config, "explicit_requests")):
             keyword_score += 0.5
         
         return min(base_score + keyword_score, 1.0)
     
     async def _analyze_coding_intent(self, message: str) -> Dict[str, Any]:
         """Analyze the coding intent of the user message"""
+        return await self.intent_engine.analyze(
+            message, self._local_coding_intent, self._llm_coding_intent
+        )
+    
+    def _local_coding_intent(self, message: str) -> Dict[str, Any]:
+        """Rule-based coding intent analysis"""
+        task_type = self._detect_task_type(message)
+        languages = self._detect_languages(message)
+        
+        # Explicit task words and named languages make the guess more reliable
+        confidence = 0.5
+        if task_type != "generation":
+            confidence += 0.2
+        if languages:
+            confidence += 0.2
+        
+        return {
+            "task_type": task_type,
+            "languages": languages,
+            "complexity": 3,
+            "needs_execution": "run" in message.lower() or "execute" in message.lower(),
+            "priority": estimate_priority(message),
+            "confidence": round(confidence, 2)
+        }
+    
+    async def _llm_coding_intent(self, message: str) -> Optional[Dict[str, Any]]:
+        """Analyze the coding intent with the LLM"""
         
         intent_prompt = f"""
         Analyze this coding-related message and determine:
@@ -152,7 +158,7 @@ class CodeAgent(BaseAgent):
         """
         
         try:
-            response = await self._call_llm([{"role": "user", "content": intent_prompt}])
+            response = await self._call_llm([{"role": "user", "content": intent_prompt}], call_class="intent")
             
             # Try to parse JSON response
             json_match = re.search(r'\{.*\}', response, re.DOTALL)
@@ -170,13 +176,7 @@ class CodeAgent(BaseAgent):
         except Exception as e:
             pass
         
-        # Fallback analysis
-        return {
-            "task_type": self._detect_task_type(message),
-            "languages": self._detect_languages(message),
-            "complexity": 3,
-            "needs_execution": "run" in message.lower() or "execute" in message.lower()
-        }
+        return None
     
     def _detect_task_type(self, message: str) -> str:
         """Detect the type of coding task"""
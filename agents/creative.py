@@ -4,13 +4,42 @@ import random
 from typing import Dict, Any, List, Optional
 
 from .base import BaseAgent, AgentResponse
-from config import settings
+from .intent import estimate_priority
+from .pipeline import PreparedRequest, StageTimer
+from config import AgentConfig, settings
+from utils.keyword_matcher import MessageFeatures, extract_features
 
 
 class CreativeAgent(BaseAgent):
 
+    config_name = "creative"
+    history_turns = 4
+    error_message = "I encountered an issue while working on your creative request"
+    error_reasoning = "Error occurred during creative processing"
+    
+    keyword_groups = {
+        "keywords": [
+            "create", "write", "story", "poem", "idea", "brainstorm", "imagine",
+            "design", "creative", "artistic", "innovative", "original", "unique",
+            "inspiration", "concept", "theme", "character", "plot", "narrative",
+            "content", "script", "dialogue", "scene", "chapter", "book", "novel"
+        ],
+        "action_words": [
+            "compose", "craft", "develop", "invent", "generate", "produce",
+            "conceive", "formulate", "devise", "dream up", "come up with"
+        ],
+        "output_types": [
+            "blog post", "article", "essay", "story", "poem", "song", "script",
+            "advertisement", "slogan", "tagline", "headline", "caption", "description"
+        ],
+        "explicit_requests": [
+            "be creative", "think creatively", "creative ideas", "out of the box",
+            "brainstorm", "come up with", "write a", "create a", "design a"
+        ]
+    }
+    
     def __init__(self):
-        config = settings.get_agent_config("creative")
+        config = settings.get_agent_config(self.config_name)
         super().__init__(config)
         
         # Creative domains
@@ -27,11 +56,17 @@ class CreativeAgent(BaseAgent):
             "reverse_brainstorming", "six_thinking_hats", "scamper_method"
         ]
     
-    async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> AgentResponse:
-        """Process creative requests"""
+    async def _prepare_request(self, message: str, context: Optional[Dict[str, Any]],
+                               timer: StageTimer) -> PreparedRequest:
+        """Prepare a creative request"""
+        
+        # Analyze creative intent while conversation history is assembled
+        intent_task = timer.start("intent", self._analyze_creative_intent(message))
         
-        # Analyze creative intent
-        creative_analysis = await self._analyze_creative_intent(message)
+        with timer.measure("history"):
+            history_messages = self._build_history_messages(self.history_turns)
+        
+        creative_analysis = await intent_task
         
         # Determine creative approach
         approach = creative_analysis.get("approach", "general_creative")
@@ -46,109 +81,72 @@ class CreativeAgent(BaseAgent):
         # Build creative prompt based on the approach
         creative_prompt = self._build_creative_prompt(message, creative_analysis, context)
         
-        # Get conversation history for creative context
-        conversation_history = self.conversation_context.get_recent_messages(4)
-        
-        # Build messages for LLM
-        messages = []
-        
-        # Add conversation history for creative continuity
-        for hist in conversation_history:
-            messages.append({"role": "user", "content": hist["user"]})
-            messages.append({"role": "assistant", "content": hist["assistant"]})
-        
-        # Add current creative request
-        messages.append({"role": "user", "content": creative_prompt})
-        
-        try:
-            response_content = await self._call_llm(messages)
-            
-            # Enhance creative response with formatting
-            formatted_response = self._format_creative_response(response_content, approach)
-            
-            # Add to conversation context
-            self.add_to_context(message, formatted_response)
-            
-            return AgentResponse(
-                content=formatted_response,
-                agent_name=self.name,
-                tools_used=tools_used,
-                confidence=0.85,
-                reasoning=f"Creative task processed using {approach} approach",
-                metadata={
-                    "creative_approach": approach,
-                    "domain": domain,
-                    "analysis": creative_analysis,
-                    "creativity_level": creative_analysis.get("creativity_level", "medium")
-                }
-            )
-            
-        except Exception as e:
-            return AgentResponse(
-                content=f"I encountered an issue while working on your creative request: {e}",
-                agent_name=self.name,
-                tools_used=tools_used,
-                confidence=0.1,
-                reasoning="Error occurred during creative processing",
-                metadata={"error": str(e)}
-            )
+        # Add current creative request after the conversation history
+        messages = history_messages + [{"role": "user", "content": creative_prompt}]
+        
+        return PreparedRequest(
+            messages=messages,
+            tools_used=tools_used,
+            reasoning=f"Creative task processed using {approach} approach",
+            confidence=0.85,
+            priority=creative_analysis.get("priority", 3),
+            format_response=lambda content: self._format_creative_response(content, approach),
+            metadata={
+                "creative_approach": approach,
+                "domain": domain,
+                "analysis": creative_analysis,
+                "creativity_level": creative_analysis.get("creativity_level", "medium")
+            }
+        )
     
-    def can_handle(self, message: str, context: Optional[Dict[str, Any]] = None) -> float:
+    @classmethod
+    def routing_score(cls, message: str, context: Optional[Dict[str, Any]] = None,
+                      features: Optional[MessageFeatures] = None,
+                      config: Optional[AgentConfig] = None) -> float:
         """Determine if this agent can handle the creative request"""
-        base_score = super().can_handle(message, context)
-        
-        message_lower = message.lower()
-        
-        # Creative keywords
-        creative_keywords = [
-            "create", "write", "story", "poem", "idea", "brainstorm", "imagine",
-            "design", "creative", "artistic", "innovative", "original", "unique",
-            "inspiration", "concept", "theme", "character", "plot", "narrative",
-            "content", "script", "dialogue", "scene", "chapter", "book", "novel"
-        ]
-        
-        # Creative action words
-        action_words = [
-            "compose", "craft", "develop", "invent", "generate", "produce",
-            "conceive", "formulate", "devise", "dream up", "come up with"
-        ]
-        
-        # Creative output types
-        output_types = [
-            "blog post", "article", "essay", "story", "poem", "song", "script",
-            "advertisement", "slogan", "tagline", "headline", "caption", "description"
-        ]
-        
-        keyword_score = 0
+        config = config or settings.get_agent_config(cls.config_name)
+        features = features or extract_features(message)
+        base_score = super().routing_score(message, context, features, config)
         
-        # Check for creative keywords
-        for keyword in creative_keywords:
-            if keyword in message_lower:
-                keyword_score += 0.2
-        
-        # Check for action words
-        for action in action_words:
-            if action in message_lower:
-                keyword_score += 0.25
-        
-        # Check for output types
-        for output_type in output_types:
-            if output_type in message_lower:
-                keyword_score += 0.3
+        # Check for creative keywords, action words and output types
+        keyword_score = features.count(cls._group(config, "keywords")) * 0.2
+        keyword_score += features.count(cls._group(config, "action_words")) * 0.25
+        keyword_score += features.count(cls._group(config, "output_types")) * 0.3
         
         # Boost for explicit creative requests
-        creative_phrases = [
-            "be creative", "think creatively", "creative ideas", "out of the box",
-            "brainstorm", "come up with", "write a", "create a", "design a"
-        ]
-        
-        if any(phrase in message_lower for phrase in creative_phrases):
+        if features.any(cls._group(config, "explicit_requests")):
             keyword_score += 0.4
         
         return min(base_score + keyword_score, 1.0)
     
     async def _analyze_creative_intent(self, message: str) -> Dict[str, Any]:
         """Analyze the creative intent of the user message"""
+        return await self.intent_engine.analyze(
+            message, self._local_creative_intent, self._llm_creative_intent
+        )
+    
+    def _local_creative_intent(self, message: str) -> Dict[str, Any]:
+        """Rule-based creative intent analysis"""
+        approach = self._detect_creative_approach(message)
+        domain = self._detect_creative_domain(message)
+        
+        confidence = 0.4
+        if approach != "general_creative":
+            confidence += 0.3
+        if domain != "general":
+            confidence += 0.2
+        
+        return {
+            "approach": approach,
+            "domain": domain,
+            "creativity_level": "medium",
+            "needs_file_save": "save" in message.lower() or "file" in message.lower(),
+            "priority": estimate_priority(message),
+            "confidence": round(confidence, 2)
+        }
+    
+    async def _llm_creative_intent(self, message: str) -> Optional[Dict[str, Any]]:
+        """Analyze the creative intent with the LLM"""
         
         intent_prompt = f"""
         Analyze this creative request and determine:
@@ -165,7 +163,7 @@ class CreativeAgent(BaseAgent):
         """
         
         try:
-            response = await self._call_llm([{"role": "user", "content": intent_prompt}])
+            response = await self._call_llm([{"role": "user", "content": intent_prompt}], call_class="intent")
             
             # Try to parse JSON response
             import re
@@ -184,13 +182,7 @@ class CreativeAgent(BaseAgent):
         except Exception as e:
             pass
         
-        # Fallback analysis
-        return {
-            "approach": self._detect_creative_approach(message),
-            "domain": self._detect_creative_domain(message),
-            "creativity_level": "medium",
-            "needs_file_save": "save" in message.lower() or "file" in message.lower()
-        }
+        return None
     
     def _detect_creative_approach(self, message: str) -> str:
         """Detect the type of creative approach needed"""
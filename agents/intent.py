@@ -0,0 +1,144 @@
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Keyword tables for the local intent classifier
+URGENCY_KEYWORDS = {
+    5: ["urgent", "asap", "immediately", "emergency", "critical", "right now"],
+    4: ["quickly", "soon", "today", "deadline", "important"],
+    2: ["no rush", "whenever", "eventually", "someday", "low priority"]
+}
+
+INTENT_KEYWORDS = {
+    "troubleshooting": ["debug", "fix", "error", "bug", "broken", "not working", "issue"],
+    "creation_request": ["create", "write", "generate", "design", "compose", "draft"],
+    "planning": ["plan", "schedule", "organize", "roadmap", "timeline", "prioritize"],
+    "instruction_request": ["how to", "how do i", "how can i", "steps to", "guide"],
+    "information_request": ["what is", "who is", "when did", "where is", "explain",
+                            "tell me about", "research", "find", "search"]
+}
+
+TOOL_KEYWORDS = {
+    "web_search": ["current", "latest", "recent", "today", "news", "price", "statistics",
+                   "search", "look up", "find"],
+    "code_exec": ["run", "execute", "output of", "test this"],
+    "file_ops": ["save", "file", "load", "export", "read"]
+}
+
+REQUIREMENT_MARKERS = ["must", "should", "without", "using", "only", "at least", "no more than"]
+
+
+def estimate_priority(message: str) -> int:
+    """Estimate a 1-5 priority from urgency keywords"""
+    message_lower = message.lower()
+    
+    for priority in (5, 4, 2):
+        if any(keyword in message_lower for keyword in URGENCY_KEYWORDS[priority]):
+            return priority
+    
+    return 3
+
+
+def classify_intent(message: str, available_tools: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Rule-based intent classification.
+    
+    Returns the same schema as the LLM intent prompt (intent, tools_needed,
+    priority, requirements) plus a confidence score.
+    """
+    message_lower = message.lower()
+    
+    # Pick the intent with the most keyword hits
+    intent = "general_query"
+    best_hits = 0
+    for candidate, keywords in INTENT_KEYWORDS.items():
+        hits = sum(1 for keyword in keywords if keyword in message_lower)
+        if hits > best_hits:
+            intent = candidate
+            best_hits = hits
+    
+    tools_needed = []
+    for tool_name, keywords in TOOL_KEYWORDS.items():
+        if available_tools is not None and tool_name not in available_tools:
+            continue
+        if any(keyword in message_lower for keyword in keywords):
+            tools_needed.append(tool_name)
+    
+    requirements = [marker for marker in REQUIREMENT_MARKERS if f" {marker} " in f" {message_lower} "]
+    
+    # More matching signals means a more reliable classification
+    confidence = 0.3 if intent == "general_query" else min(0.5 + 0.15 * best_hits, 0.95)
+    
+    return {
+        "intent": intent,
+        "tools_needed": tools_needed,
+        "priority": estimate_priority(message),
+        "requirements": requirements,
+        "confidence": confidence
+    }
+
+
+class IntentEngine:
+    """
+    Pluggable intent analysis.
+    
+    Modes:
+        local: rule-based classification only (no network)
+        llm: always ask the LLM, falling back to local on failure
+        hybrid: local first, LLM only when local confidence is low
+    """
+    
+    MODES = ("local", "llm", "hybrid")
+    
+    def __init__(self, mode: Optional[str] = None, confidence_threshold: Optional[float] = None):
+        self.mode = mode or settings.intent_mode
+        if self.mode not in self.MODES:
+            logger.warning(f"Unknown intent mode '{self.mode}', using local")
+            self.mode = "local"
+        
+        self.confidence_threshold = (
+            confidence_threshold if confidence_threshold is not None
+            else settings.intent_confidence_threshold
+        )
+        
+        self.stats = {"local": 0, "llm": 0, "llm_failures": 0}
+    
+    async def analyze(self, message: str,
+                      local_classifier: Callable[[str], Dict[str, Any]],
+                      llm_classifier: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Dict[str, Any]:
+        """
+        Analyze a message with the configured mode.
+        
+        Args:
+            message: User message to analyze
+            local_classifier: Fast rule-based classifier
+            llm_classifier: LLM-backed classifier, returns None on failure
+            
+        Returns:
+            Intent analysis dict with an intent_source key
+        """
+        analysis = local_classifier(message)
+        analysis["intent_source"] = "local"
+        
+        use_llm = self.mode == "llm" or (
+            self.mode == "hybrid" and analysis.get("confidence", 0.0) < self.confidence_threshold
+        )
+        
+        if not use_llm:
+            self.stats["local"] += 1
+            return analysis
+        
+        llm_analysis = await llm_classifier(message)
+        
+        if llm_analysis is None:
+            self.stats["llm_failures"] += 1
+            return analysis
+        
+        self.stats["llm"] += 1
+        
+        # Keep local fields the LLM omitted so the schema stays complete
+        return {**analysis, **llm_analysis, "intent_source": "llm"}
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+
+@dataclass
+class PreparedRequest:
+    """Everything an agent assembled before the final LLM call"""
+    messages: List[Dict[str, str]]
+    tools_used: List[str] = field(default_factory=list)
+    reasoning: str = ""
+    confidence: float = 0.8
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    priority: int = 3
+    format_response: Optional[Callable[[str], str]] = None
+
+
+class StageTimer:
+    """
+    Records wall-clock timings for agent pipeline stages.
+    
+    Stages may overlap, so the sum of stage durations can exceed the total
+    elapsed time. The difference is the latency saved by running them
+    concurrently.
+    """
+    
+    def __init__(self):
+        self._started_at = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+    
+    @contextmanager
+    def measure(self, stage: str):
+        """Time a synchronous or awaited block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = (time.perf_counter() - start) * 1000
+    
+    def mark(self, event: str):
+        """Record the time elapsed since the pipeline started, e.g. time to first token"""
+        self.marks[event] = (time.perf_counter() - self._started_at) * 1000
+    
+    def start(self, stage: str, coro: Awaitable[Any]) -> asyncio.Task:
+        """Start a stage as a background task and time it until it finishes"""
+        
+        async def timed():
+            start = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                self.timings[stage] = (time.perf_counter() - start) * 1000
+        
+        return asyncio.create_task(timed())
+    
+    def summary(self) -> Dict[str, Any]:
+        """Get per-stage timings in milliseconds"""
+        total_ms = (time.perf_counter() - self._started_at) * 1000
+        sequential_ms = sum(self.timings.values())
+        
+        summary = {
+            "stages_ms": {stage: round(ms, 2) for stage, ms in self.timings.items()},
+            "total_ms": round(total_ms, 2),
+            "overlap_saved_ms": round(max(sequential_ms - total_ms, 0.0), 2)
+        }
+        
+        if self.marks:
+            summary["marks_ms"] = {event: round(ms, 2) for event, ms in self.marks.items()}
+        
+        return summary
@@ -0,0 +1,177 @@
+import re
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional
+
+from config import settings
+
+
+# Fenced code blocks, including the language hint
+CODE_BLOCK_PATTERN = re.compile(r"```[^\n]*\n.*?```", re.DOTALL)
+
+TRUNCATION_MARKER = "\n...[rest of message truncated]"
+
+ELISION_MARKER = "lines of code omitted]"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of a string without a tokenizer.
+    
+    English text averages about four characters per token; the word count
+    is used as a floor so short, space-separated text isn't underestimated.
+    """
+    if not text:
+        return 0
+    return max((len(text) + 3) // 4, text.count(" ") + 1)
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimate tokens for chat messages, including per-message overhead"""
+    return sum(estimate_tokens(message.get("content", "")) + 4 for message in messages)
+
+
+@dataclass
+class HistoryBudget:
+    """Outcome of fitting conversation history into a token budget"""
+    budget_tokens: int
+    original_tokens: int
+    used_tokens: int
+    turns_available: int
+    turns_included: int
+    code_blocks_elided: int = 0
+    
+    @property
+    def saved_tokens(self) -> int:
+        return max(self.original_tokens - self.used_tokens, 0)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "saved_tokens": self.saved_tokens}
+
+
+class PromptBuilder:
+    """
+    Fits conversation history into a token budget.
+    
+    The most recent turn is kept verbatim when it fits. Older assistant
+    messages have their code blocks elided and are truncated, and turns
+    that still don't fit are dropped, oldest first.
+    """
+    
+    def __init__(self, budget_tokens: int, assistant_max_tokens: Optional[int] = None,
+                 code_block_max_lines: Optional[int] = None, full_turns: int = 1):
+        self.budget_tokens = max(budget_tokens, 0)
+        self.assistant_max_tokens = assistant_max_tokens or settings.history_assistant_max_tokens
+        self.code_block_max_lines = (
+            code_block_max_lines if code_block_max_lines is not None
+            else settings.history_code_block_max_lines
+        )
+        self.full_turns = full_turns
+    
+    def build(self, history: List[Dict[str, str]]) -> tuple:
+        """
+        Fit history messages into the budget.
+        
+        Args:
+            history: Alternating user/assistant messages, oldest first
+            
+        Returns:
+            Tuple of (messages, HistoryBudget)
+        """
+        turns = self._pair_turns(history)
+        original_tokens = estimate_message_tokens(history)
+        
+        remaining = self.budget_tokens
+        selected = []
+        
+        # Walk from the newest turn backwards so recent context wins
+        for age, turn in enumerate(reversed(turns)):
+            candidate = turn if age < self.full_turns else self._compact_turn(turn)
+            cost = estimate_message_tokens(candidate)
+            
+            if cost > remaining and age < self.full_turns:
+                candidate = self._compact_turn(turn)
+                cost = estimate_message_tokens(candidate)
+            
+            if cost > remaining:
+                candidate = self._truncate_to_fit(candidate, remaining)
+                if candidate is None:
+                    break
+                cost = estimate_message_tokens(candidate)
+            
+            selected.append(candidate)
+            remaining -= cost
+        
+        messages = [message for turn in reversed(selected) for message in turn]
+        
+        return messages, HistoryBudget(
+            budget_tokens=self.budget_tokens,
+            original_tokens=original_tokens,
+            used_tokens=estimate_message_tokens(messages),
+            turns_available=len(turns),
+            turns_included=len(selected),
+            code_blocks_elided=sum(m["content"].count(ELISION_MARKER) for m in messages)
+        )
+    
+    def _pair_turns(self, history: List[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+        """Group messages into turns that start at each user message"""
+        turns = []
+        for message in history:
+            if message.get("role") == "user" or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return turns
+    
+    def _compact_turn(self, turn: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Elide large code blocks and cap the length of assistant messages"""
+        compacted = []
+        for message in turn:
+            if message.get("role") == "assistant":
+                content = self._elide_code_blocks(message["content"])
+                content = self._truncate_text(content, self.assistant_max_tokens)
+                compacted.append({**message, "content": content})
+            else:
+                compacted.append(message)
+        return compacted
+    
+    def _elide_code_blocks(self, content: str) -> str:
+        
+        def replace(match):
+            block = match.group(0)
+            lines = block.count("\n") - 1
+            if lines <= self.code_block_max_lines:
+                return block
+            header = block.split("\n", 1)[0]
+            return f"{header}\n# [{lines} {ELISION_MARKER}\n```"
+        
+        return CODE_BLOCK_PATTERN.sub(replace, content)
+    
+    def _truncate_text(self, content: str, max_tokens: int) -> str:
+        """Keep the start of a message, where answers usually lead, cut to fit max_tokens"""
+        if estimate_tokens(content) <= max_tokens:
+            return content
+        
+        # Text with many short words is estimated by word count, so four characters per token can overshoot
+        length = max_tokens * 4 - len(TRUNCATION_MARKER)
+        while length > 0:
+            truncated = content[:length] + TRUNCATION_MARKER
+            tokens = estimate_tokens(truncated)
+            if tokens <= max_tokens:
+                return truncated
+            length = min(length - 1, length * max_tokens // tokens)
+        return TRUNCATION_MARKER.lstrip()
+    
+    def _truncate_to_fit(self, turn: List[Dict[str, str]], remaining: int) -> Optional[List[Dict[str, str]]]:
+        """Shrink the assistant side of a turn to fit, or give up if the user side alone doesn't"""
+        user_cost = estimate_message_tokens([m for m in turn if m.get("role") != "assistant"])
+        assistant_budget = remaining - user_cost - 4
+        
+        # Not worth including a turn whose answer would be cut to almost nothing
+        if assistant_budget < 32:
+            return None
+        
+        return [
+            {**m, "content": self._truncate_text(m["content"], assistant_budget)}
+            if m.get("role") == "assistant" else m
+            for m in turn
+        ]
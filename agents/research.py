@@ -3,109 +3,117 @@ import json
 from typing import Dict, Any, List, Optional
 
 from .base import BaseAgent, AgentResponse
-from config import settings
+from .pipeline import PreparedRequest, StageTimer
+from config import AgentConfig, settings
+from utils.keyword_matcher import MessageFeatures, extract_features
 
 
 class ResearchAgent(BaseAgent):
 
+    config_name = "research"
+    history_turns = 5
+    error_message = "I apologize, but I encountered an error while researching"
+    error_reasoning = "Error occurred during research"
+    
+    keyword_groups = {
+        "keywords": [
+            "research", "find", "search", "what is", "who is", "when did", "where is",
+            "how many", "statistics", "data", "facts", "information", "explain",
+            "tell me about", "learn about", "study", "analyze", "investigate",
+            "compare", "contrast", "history", "background", "details", "source"
+        ],
+        "question_words": ["what", "who", "when", "where", "why", "how"]
+    }
+    
     def __init__(self):
-        config = settings.get_agent_config("research")
+        config = settings.get_agent_config(self.config_name)
         super().__init__(config)
     
-    async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> AgentResponse:
-        """Process research-related queries"""
+    async def _prepare_request(self, message: str, context: Optional[Dict[str, Any]],
+                               timer: StageTimer) -> PreparedRequest:
+        """Prepare a research query, overlapping intent analysis and web search"""
+        
+        search_available = "web_search" in self.get_available_tools()
+        
+        # Local intent analysis is near instant, so there is nothing to overlap unless the LLM
+        # may be asked. Even then, only start the search early when the local classifier
+        # already predicts one; the result is discarded if the final intent disagrees
+        search_task = None
+        if (search_available and settings.speculative_tool_calls and settings.intent_mode != "local"
+                and self._needs_web_search(message, self._local_intent(message))):
+            search_task = timer.start("web_search", self._perform_research(message))
+        
+        intent_task = timer.start("intent", self._analyze_intent(message))
+        
+        # Get conversation history for context
+        with timer.measure("history"):
+            history_messages = self._build_history_messages(self.history_turns)
         
-        # Analyze the intent of the message
-        intent_analysis = await self._analyze_intent(message)
+        intent_analysis = await intent_task
         
         # Determine if web search is needed
         needs_search = self._needs_web_search(message, intent_analysis)
         
         tools_used = []
         search_results = ""
+        speculative_discarded = False
         
-        # Perform web search if needed
-        if needs_search and "web_search" in self.get_available_tools():
-            search_results = await self._perform_research(message)
+        if needs_search and search_available:
+            if search_task is None:
+                search_task = timer.start("web_search", self._perform_research(message))
+            search_results = await search_task
             tools_used.append("web_search")
+        elif search_task is not None:
+            search_task.cancel()
+            speculative_discarded = True
         
         # Prepare the research prompt
         research_prompt = self._build_research_prompt(message, search_results, context)
         
-        # Get conversation history for context
-        conversation_history = self.conversation_context.get_recent_messages(5)
-        
-        # Build messages for LLM
-        messages = []
-        
-        # Add conversation history if available
-        for hist in conversation_history:
-            messages.append({"role": "user", "content": hist["user"]})
-            messages.append({"role": "assistant", "content": hist["assistant"]})
-        
-        # Add current query
-        messages.append({"role": "user", "content": research_prompt})
-        
-        # Generate response
-        try:
-            response_content = await self._call_llm(messages)
-            
-            # Add to conversation context
-            self.add_to_context(message, response_content)
-            
-            return AgentResponse(
-                content=response_content,
-                agent_name=self.name,
-                tools_used=tools_used,
-                confidence=0.8,
-                reasoning=f"Research query processed with intent: {intent_analysis.get('intent', 'unknown')}",
-                metadata={
-                    "intent_analysis": intent_analysis,
-                    "search_performed": needs_search,
-                    "search_results_length": len(search_results)
-                }
-            )
-            
-        except Exception as e:
-            return AgentResponse(
-                content=f"I apologize, but I encountered an error while researching: {e}",
-                agent_name=self.name,
-                tools_used=tools_used,
-                confidence=0.1,
-                reasoning="Error occurred during research",
-                metadata={"error": str(e)}
-            )
+        # Add current query after the conversation history
+        messages = history_messages + [{"role": "user", "content": research_prompt}]
+        
+        return PreparedRequest(
+            messages=messages,
+            tools_used=tools_used,
+            reasoning=f"Research query processed with intent: {intent_analysis.get('intent', 'unknown')}",
+            confidence=0.8,
+            priority=intent_analysis.get("priority", 3),
+            metadata={
+                "intent_analysis": intent_analysis,
+                "search_performed": needs_search,
+                "search_results_length": len(search_results),
+                "speculative_search_discarded": speculative_discarded
+            }
+        )
     
-    def can_handle(self, message: str, context: Optional[Dict[str, Any]] = None) -> float:
+    @classmethod
+    def routing_score(cls, message: str, context: Optional[Dict[str, Any]] = None,
+                      features: Optional[MessageFeatures] = None,
+                      config: Optional[AgentConfig] = None) -> float:
         """Determine if this agent can handle the research query"""
-        base_score = super().can_handle(message, context)
+        config = config or settings.get_agent_config(cls.config_name)
+        features = features or extract_features(message)
+        base_score = super().routing_score(message, context, features, config)
         
-        message_lower = message.lower()
-        research_keywords = [
-            "research", "find", "search", "what is", "who is", "when did", "where is",
-            "how many", "statistics", "data", "facts", "information", "explain",
-            "tell me about", "learn about", "study", "analyze", "investigate",
-            "compare", "contrast", "history", "background", "details", "source"
-        ]
-        
-        keyword_score = 0
-        for keyword in research_keywords:
-            if keyword in message_lower:
-                keyword_score += 0.2
+        keyword_score = features.count(cls._group(config, "keywords")) * 0.2
         
         # Boost score for question words
-        question_words = ["what", "who", "when", "where", "why", "how"]
-        if any(word in message_lower for word in question_words):
+        if features.any(cls._group(config, "question_words")):
             keyword_score += 0.3
         
         return min(base_score + keyword_score, 1.0)
     
+    def _is_personal_query(self, message: str) -> bool:
+        """Check for personal or opinion-based questions that never need a search"""
+        personal_indicators = ["i think", "my opinion", "what do you think", "personal", "yourself"]
+        return any(indicator in message.lower() for indicator in personal_indicators)
+    
     def _needs_web_search(self, message: str, intent_analysis: Dict[str, Any]) -> bool:
         """Determine if web search is needed for this query"""
         
         # Skip search for personal or opinion-based questions
-        personal_indicators = ["i think", "my opinion", "what do you think", "personal", "yourself"]
-        if any(indicator in message.lower() for indicator in personal_indicators):
+        if self._is_personal_query(message):
             return False
         
         # Search for factual, current, or specific information requests
@@ -1,16 +1,46 @@
 import asyncio
 import json
+import re
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 
 from .base import BaseAgent, AgentResponse
-from config import settings
+from .intent import estimate_priority
+from .pipeline import PreparedRequest, StageTimer
+from config import AgentConfig, settings
+from utils.keyword_matcher import MessageFeatures, extract_features
 
 
 class TaskAgent(BaseAgent):
 
+    config_name = "task"
+    history_turns = 3
+    error_message = "I encountered an issue while processing your task management request"
+    error_reasoning = "Error occurred during task processing"
+    
+    keyword_groups = {
+        "keywords": [
+            "plan", "planning", "project", "task", "schedule", "organize",
+            "manage", "coordinate", "timeline", "deadline", "milestone",
+            "goal", "objective", "strategy", "workflow", "process"
+        ],
+        "action_words": [
+            "create plan", "make schedule", "organize", "break down",
+            "prioritize", "track progress", "set goals", "manage time",
+            "coordinate", "delegate", "optimize", "streamline"
+        ],
+        "project_terms": [
+            "project management", "agile", "scrum", "kanban", "sprint",
+            "backlog", "roadmap", "deliverables", "resources", "budget"
+        ],
+        "explicit_requests": [
+            "help me plan", "create a plan", "organize this", "break this down",
+            "manage this project", "set up a timeline", "track progress"
+        ]
+    }
+    
     def __init__(self):
-        config = settings.get_agent_config("task")
+        config = settings.get_agent_config(self.config_name)
         super().__init__(config)
         
         # Task management domains
@@ -26,11 +56,17 @@ class TaskAgent(BaseAgent):
             "pomodoro", "eisenhower_matrix", "okr", "smart_goals"
         ]
     
-    async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> AgentResponse:
-        """Process task and project management requests"""
+    async def _prepare_request(self, message: str, context: Optional[Dict[str, Any]],
+                               timer: StageTimer) -> PreparedRequest:
+        """Prepare a task or project management request"""
+        
+        # Analyze task management intent while conversation history is assembled
+        intent_task = timer.start("intent", self._analyze_task_intent(message))
+        
+        with timer.measure("history"):
+            history_messages = self._build_history_messages(self.history_turns)
         
-        # Analyze task management intent
-        task_analysis = await self._analyze_task_intent(message)
+        task_analysis = await intent_task
         
         # Determine task type and approach
         task_type = task_analysis.get("task_type", "general_planning")
@@ -45,109 +81,80 @@ class TaskAgent(BaseAgent):
         # Build task management prompt
         task_prompt = self._build_task_prompt(message, task_analysis, context)
         
-        # Get conversation history for project context
-        conversation_history = self.conversation_context.get_recent_messages(3)
-        
-        # Build messages for LLM
-        messages = []
-        
-        # Add conversation history for project continuity
-        for hist in conversation_history:
-            messages.append({"role": "user", "content": hist["user"]})
-            messages.append({"role": "assistant", "content": hist["assistant"]})
-        
-        # Add current task request
-        messages.append({"role": "user", "content": task_prompt})
-        
-        try:
-            response_content = await self._call_llm(messages)
-            
-            # Format response for task management
-            formatted_response = self._format_task_response(response_content, task_type)
-            
-            # Add to conversation context
-            self.add_to_context(message, formatted_response)
-            
-            return AgentResponse(
-                content=formatted_response,
-                agent_name=self.name,
-                tools_used=tools_used,
-                confidence=0.9,
-                reasoning=f"Task management processed using {methodology} approach for {task_type}",
-                metadata={
-                    "task_type": task_type,
-                    "methodology": methodology,
-                    "analysis": task_analysis,
-                    "complexity": task_analysis.get("complexity", "medium")
-                }
-            )
-            
-        except Exception as e:
-            return AgentResponse(
-                content=f"I encountered an issue while processing your task management request: {e}",
-                agent_name=self.name,
-                tools_used=tools_used,
-                confidence=0.1,
-                reasoning="Error occurred during task processing",
-                metadata={"error": str(e)}
-            )
+        # Add current task request after the conversation history
+        messages = history_messages + [{"role": "user", "content": task_prompt}]
+        
+        return PreparedRequest(
+            messages=messages,
+            tools_used=tools_used,
+            reasoning=f"Task management processed using {methodology} approach for {task_type}",
+            confidence=0.9,
+            priority=task_analysis.get("priority", 3),
+            format_response=lambda content: self._format_task_response(content, task_type),
+            metadata={
+                "task_type": task_type,
+                "methodology": methodology,
+                "analysis": task_analysis,
+                "complexity": task_analysis.get("complexity", "medium")
+            }
+        )
     
-    def can_handle(self, message: str, context: Optional[Dict[str, Any]] = None) -> float:
+    @classmethod
+    def routing_score(cls, message: str, context: Optional[Dict[str, Any]] = None,
+                      features: Optional[MessageFeatures] = None,
+                      config: Optional[AgentConfig] = None) -> float:
         """Determine if this agent can handle the task management request"""
-        base_score = super().can_handle(message, context)
+        config = config or settings.get_agent_config(cls.config_name)
+        features = features or extract_features(message)
+        base_score = super().routing_score(message, context, features, config)
         
-        message_lower = message.lower()
-        
-        # Task management keywords
-        task_keywords = [
-            "plan", "planning", "project", "task", "schedule", "organize",
-            "manage", "coordinate", "timeline", "deadline", "milestone",
-            "goal", "objective", "strategy", "workflow", "process"
-        ]
-        
-        # Action words for task management
-        action_words = [
-            "create plan", "make schedule", "organize", "break down",
-            "prioritize", "track progress", "set goals", "manage time",
-            "coordinate", "delegate", "optimize", "streamline"
-        ]
-        
-        # Project-related terms
-        project_terms = [
-            "project management", "agile", "scrum", "kanban", "sprint",
-            "backlog", "roadmap", "deliverables", "resources", "budget"
-        ]
-        
-        keyword_score = 0
-        
-        # Check for task keywords
-        for keyword in task_keywords:
-            if keyword in message_lower:
-                keyword_score += 0.2
-        
-        # Check for action words
-        for action in action_words:
-            if action in message_lower:
-                keyword_score += 0.3
-        
-        # Check for project terms
-        for term in project_terms:
-            if term in message_lower:
-                keyword_score += 0.4
+        # Check for task keywords, action words and project terms
+        keyword_score = features.count(cls._group(config, "keywords")) * 0.2
+        keyword_score += features.count(cls._group(config, "action_words")) * 0.3
+        keyword_score += features.count(cls._group(config, "project_terms")) * 0.4
         
         # Boost for explicit task requests
-        task_phrases = [
-            "help me plan", "create a plan", "organize this", "break this down",
-            "manage this project", "set up a timeline", "track progress"
-        ]
-        
-        if any(phrase in message_lower for phrase in task_phrases):
+        if features.any(cls._group(config, "explicit_requests")):
             keyword_score += 0.5
         
         return min(base_score + keyword_score, 1.0)
     
     async def _analyze_task_intent(self, message: str) -> Dict[str, Any]:
         """Analyze the task management intent of the user message"""
+        return await self.intent_engine.analyze(
+            message, self._local_task_intent, self._llm_task_intent
+        )
+    
+    def _local_task_intent(self, message: str) -> Dict[str, Any]:
+        """Rule-based task management intent analysis"""
+        message_lower = message.lower()
+        task_type = self._detect_task_type(message)
+        
+        # "planning" is also the default, so only count it when asked for explicitly
+        confidence = 0.4
+        if task_type != "planning" or "plan" in message_lower:
+            confidence += 0.3
+        
+        methodology = "agile"
+        for candidate in self.methodologies:
+            if re.search(rf"\b{candidate.replace('_', ' ')}\b", message_lower):
+                methodology = candidate
+                confidence += 0.2
+                break
+        
+        return {
+            "task_type": task_type,
+            "scale": self._detect_project_scale(message),
+            "timeline": "weekly",
+            "methodology": methodology,
+            "complexity": 3,
+            "needs_file_save": "save" in message_lower or "file" in message_lower,
+            "priority": estimate_priority(message),
+            "confidence": round(min(confidence, 0.95), 2)
+        }
+    
+    async def _llm_task_intent(self, message: str) -> Optional[Dict[str, Any]]:
+        """Analyze the task management intent with the LLM"""
         
         intent_prompt = f"""
         Analyze this task management request and determine:
@@ -164,7 +171,7 @@ class TaskAgent(BaseAgent):
         """
         
         try:
-            response = await self._call_llm([{"role": "user", "content": intent_prompt}])
+            response = await self._call_llm([{"role": "user", "content": intent_prompt}], call_class="intent")
             
             # Try to parse JSON response
             import re
@@ -185,15 +192,7 @@ class TaskAgent(BaseAgent):
         except Exception as e:
             pass
         
-        # Fallback analysis
-        return {
-            "task_type": self._detect_task_type(message),
-            "scale": self._detect_project_scale(message),
-            "timeline": "weekly",
-            "methodology": "agile",
-            "complexity": 3,
-            "needs_file_save": "save" in message.lower() or "file" in message.lower()
-        }
+        return None
     
     def _detect_task_type(self, message: str) -> str:
         """Detect the type of task management needed"""
@@ -0,0 +1,98 @@
+"""
+Offline benchmark of the full coordinator stack.
+
+Runs messages through AgentCoordinator against the local LLM backend so
+routing, intent analysis, prompt assembly, rate limiting and storage can
+be profiled without a live endpoint.
+
+Usage:
+    python -m benchmarks.coordinator_bench --messages 200 --concurrency 16
+"""
+import os
+import sys
+import tempfile
+
+# Select the offline backend before settings are loaded
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("MEMORY_STORAGE_PATH", tempfile.mkdtemp(prefix="coordinator_bench_"))
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import statistics
+import time
+from typing import List
+
+import click
+
+from orchestration.coordinator import AgentCoordinator
+
+SAMPLE_MESSAGES = [
+    "Research the latest trends in renewable energy",
+    "Write a Python function that parses a CSV file and reports errors",
+    "Write a short poem about the ocean at night",
+    "Plan a three month roadmap for launching a mobile app",
+    "Debug this error: TypeError: 'NoneType' object is not subscriptable",
+    "Brainstorm names for a coffee shop that doubles as a bookstore",
+    "Compare the pros and cons of PostgreSQL and MongoDB",
+    "Break down the tasks needed to migrate a monolith to microservices"
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_benchmark(messages: int, concurrency: int, stream: bool):
+    coordinator = AgentCoordinator()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    
+    async def one(index: int):
+        nonlocal errors
+        message = f"{SAMPLE_MESSAGES[index % len(SAMPLE_MESSAGES)]} (#{index})"
+        async with semaphore:
+            start = time.perf_counter()
+            if stream:
+                response = None
+                async for event in coordinator.process_message_stream(message):
+                    if event.type == "done":
+                        response = event.response
+            else:
+                response = await coordinator.process_message(message)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response is None or response.metadata.get("error"):
+                errors += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    elapsed = time.perf_counter() - start
+    
+    await coordinator.shutdown()
+    
+    click.echo(f"messages:    {messages} (concurrency {concurrency}, {'streaming' if stream else 'buffered'})")
+    click.echo(f"elapsed:     {elapsed:.2f}s")
+    click.echo(f"throughput:  {messages / elapsed:.1f} msg/s")
+    click.echo(f"latency p50: {percentile(latencies, 50):.0f} ms")
+    click.echo(f"latency p95: {percentile(latencies, 95):.0f} ms")
+    click.echo(f"latency max: {max(latencies):.0f} ms")
+    click.echo(f"mean:        {statistics.mean(latencies):.0f} ms")
+    click.echo(f"errors:      {errors}")
+
+
+@click.command()
+@click.option('--messages', '-n', default=100, help='Number of messages to send')
+@click.option('--concurrency', '-c', default=8, help='Messages processed at once')
+@click.option('--stream', is_flag=True, help='Use the streaming path')
+def main(messages: int, concurrency: int, stream: bool):
+    """Benchmark the coordinator against the offline LLM backend"""
+    asyncio.run(run_benchmark(messages, concurrency, stream))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Routing cost per message.
+
+Times keyword feature extraction on its own, the full routing pass
+(feature extraction, every agent's routing score, keyword scores and the
+collaboration checks) with a cold routing cache, the same pass with
+cached decisions, and batch routing through route_messages, for a mix
+of short and long messages.
+
+Usage:
+    python -m benchmarks.routing_bench --iterations 2000
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("MEMORY_STORAGE_PATH", tempfile.mkdtemp(prefix="routing_bench_"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+
+import click
+
+from orchestration.coordinator import AgentCoordinator
+from utils.keyword_matcher import extract_features, get_keyword_matcher
+
+SAMPLE_MESSAGES = [
+    "What is the population of Tokyo?",
+    "Write a Python function that merges two sorted lists",
+    "Brainstorm taglines for an eco-friendly water bottle",
+    "Help me plan a product launch with milestones and deadlines",
+    "Research the history of the printing press and write a short story set in that era "
+    "about an apprentice who discovers a new way to organize type, then plan a project to "
+    "turn it into an illustrated book with a timeline, budget and list of deliverables",
+    "def parse(line):\n    return line.split(',')\n\nWhy does this fail on quoted fields?"
+]
+
+
+async def route_all(coordinator: AgentCoordinator, messages, cold: bool = False):
+    for message in messages:
+        if cold:
+            coordinator.router._routing_cache.clear()
+        features = extract_features(message)
+        decision = await coordinator.router.route_message(message, features=features)
+        await coordinator._check_collaboration_need(message, None, features)
+        await coordinator._identify_secondary_agents(message, decision.agent_name, features)
+
+
+@click.command()
+@click.option('--iterations', '-n', default=1000, help='Passes over the sample messages')
+def main(iterations: int):
+    """Benchmark keyword matching and routing per message"""
+    coordinator = AgentCoordinator()
+    matcher = get_keyword_matcher()
+    messages = SAMPLE_MESSAGES * iterations
+    
+    start = time.perf_counter()
+    for message in messages:
+        extract_features(message)
+    features_us = (time.perf_counter() - start) / len(messages) * 1e6
+    
+    start = time.perf_counter()
+    asyncio.run(route_all(coordinator, messages, cold=True))
+    routing_us = (time.perf_counter() - start) / len(messages) * 1e6
+    
+    start = time.perf_counter()
+    asyncio.run(route_all(coordinator, messages))
+    cached_us = (time.perf_counter() - start) / len(messages) * 1e6
+    
+    coordinator.router._routing_cache.clear()
+    start = time.perf_counter()
+    asyncio.run(coordinator.router.route_messages(messages))
+    batch_us = (time.perf_counter() - start) / len(messages) * 1e6
+    
+    click.echo(f"keyword groups:      {len(matcher.groups)}")
+    click.echo(f"distinct keywords:   {len(matcher.keywords)}")
+    click.echo(f"messages routed:     {len(messages)}")
+    click.echo(f"feature extraction:  {features_us:.1f} us/message")
+    click.echo(f"full routing:        {routing_us:.1f} us/message")
+    click.echo(f"cached routing:      {cached_us:.1f} us/message")
+    click.echo(f"batch routing:       {batch_us:.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
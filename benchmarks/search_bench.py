@@ -0,0 +1,127 @@
+"""
+Conversation search latency.
+
+For each session count, grows a fresh conversations table through each
+requested size and, at every size, times search_conversations next to
+the LIKE scan it replaced, for common words, rare words and prefixes,
+both within one session (ranked from the session's own rows) and across
+all sessions (the FTS5 index). Few sessions make each one large; many
+make the searched session a small slice of the table.
+Message text is drawn from a Zipf-like vocabulary so term frequencies
+look roughly like real text.
+
+Usage:
+    python -m benchmarks.search_bench --sizes 100000,1000000 --sessions 100,10000
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("MEMORY_STORAGE_PATH", tempfile.mkdtemp(prefix="search_bench_"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+import click
+
+from config import settings
+from memory.storage import ConversationStorage, ConversationEntry, INSERT_CONVERSATION
+
+VOCABULARY = [f"w{i:04d}" for i in range(5000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+QUERIES = {
+    "stopword": "w0001",
+    "common word": "w0020",
+    "rare word": "w4321",
+    "two words": "w0003 w0150",
+    "prefix": "w012*"
+}
+
+
+def make_entry(index: int, sessions: int, start: datetime) -> ConversationEntry:
+    rng = random.Random(index)
+    return ConversationEntry(
+        session_id=f"session-{index % sessions}",
+        timestamp=(start + timedelta(seconds=index)).isoformat(),
+        user_message=" ".join(rng.choices(VOCABULARY, WEIGHTS, k=12)),
+        agent_response=" ".join(rng.choices(VOCABULARY, WEIGHTS, k=60)),
+        agent_used="research",
+        tools_used=[],
+        confidence=rng.random(),
+        routing_confidence=rng.random(),
+        metadata={}
+    )
+
+
+def grow(storage: ConversationStorage, first: int, last: int, sessions: int, batch: int = 10000):
+    """Insert rows first..last-1; the triggers keep the search index up to date"""
+    start = datetime(2026, 1, 1)
+    for offset in range(first, last, batch):
+        entries = [make_entry(i, sessions, start) for i in range(offset, min(offset + batch, last))]
+        with storage.db.write() as conn:
+            conn.executemany(INSERT_CONVERSATION, [storage._database_row(entry) for entry in entries])
+
+
+def like_scan(storage: ConversationStorage, session_id, query: str):
+    """The old path: a substring scan over both text columns, newest first"""
+    session_filter = "session_id = ? AND" if session_id is not None else ""
+    session_params = (session_id,) if session_id is not None else ()
+    with storage.db.read() as conn:
+        return conn.execute(f"""
+            SELECT session_id, user_message, agent_response FROM conversations
+            WHERE {session_filter} (user_message LIKE ? OR agent_response LIKE ?)
+            ORDER BY ts DESC LIMIT 20
+        """, (*session_params, f"%{query}%", f"%{query}%")).fetchall()
+
+
+def latency_ms(fn: Callable[[], object], repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+@click.command()
+@click.option('--sizes', default="100000,1000000", help='Comma-separated table sizes to measure at')
+@click.option('--sessions', default="100,10000", help='Comma-separated session counts the rows are spread over')
+@click.option('--repeats', default=20, help='Runs of each query')
+def main(sizes: str, sessions: str, repeats: int):
+    """Benchmark conversation search against a LIKE scan"""
+    for session_count in (int(count) for count in sessions.split(",")):
+        with tempfile.TemporaryDirectory(prefix="search_bench_") as path:
+            settings.memory_storage_path = path
+            storage = ConversationStorage()
+            if not storage.fts_enabled:
+                raise click.ClickException("This SQLite build has no FTS5")
+            
+            session_id = f"session-{7 % session_count}"
+            rows = 0
+            for size in sorted(int(size) for size in sizes.split(",")):
+                start = time.perf_counter()
+                grow(storage, rows, size, session_count)
+                rows = size
+                click.echo(f"\n{rows} rows in {session_count} sessions (loaded in {time.perf_counter() - start:.1f}s)")
+                
+                for scope, scope_session in (("session", session_id), ("all", None)):
+                    for name, query in QUERIES.items():
+                        search = latency_ms(lambda: storage.search_conversations(scope_session, query), repeats)
+                        like = latency_ms(lambda: like_scan(storage, scope_session, query.rstrip("*")), repeats)
+                        
+                        click.echo(f"{scope:<8}{name:<14} search p50 {statistics.median(search):8.2f} ms   "
+                                   f"p95 {sorted(search)[int(len(search) * 0.95)]:8.2f} ms   "
+                                   f"like p50 {statistics.median(like):8.2f} ms")
+            
+            storage.close()
+
+
+if __name__ == "__main__":
+    main()
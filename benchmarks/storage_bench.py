@@ -0,0 +1,159 @@
+"""
+Conversation storage throughput and query latency.
+
+Fills a fresh conversations table with the requested number of rows
+through the pooled writer connection, then measures single-row inserts,
+group-committed batch inserts, and the latency of the storage queries
+against the full table. The same queries are also run the old way, with
+a fresh sqlite3 connection per call (and, for deep history pages,
+with OFFSET instead of a keyset cursor), for comparison.
+
+Usage:
+    python -m benchmarks.storage_bench --rows 1000000
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("MEMORY_STORAGE_PATH", tempfile.mkdtemp(prefix="storage_bench_"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import random
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+import click
+
+from memory.storage import ConversationStorage, ConversationEntry, INSERT_CONVERSATION, epoch_ms
+
+AGENTS = ["research", "code", "creative", "task"]
+TOOLS = [[], ["web_search"], ["code_exec"], ["file_ops"], ["web_search", "file_ops"]]
+WORDS = ("python data plan story research market design function error launch budget "
+         "timeline ocean coffee database async latency cache router agent").split()
+
+
+def make_entry(index: int, sessions: int, start: datetime) -> ConversationEntry:
+    rng = random.Random(index)
+    return ConversationEntry(
+        session_id=f"session-{index % sessions}",
+        timestamp=(start + timedelta(seconds=index)).isoformat(),
+        user_message=" ".join(rng.choices(WORDS, k=12)),
+        agent_response=" ".join(rng.choices(WORDS, k=60)),
+        agent_used=rng.choice(AGENTS),
+        tools_used=rng.choice(TOOLS),
+        confidence=rng.random(),
+        routing_confidence=rng.random(),
+        metadata={"index": index}
+    )
+
+
+def fill(storage: ConversationStorage, rows: int, sessions: int, batch: int = 10000):
+    """Load rows straight into the conversations table in large transactions"""
+    start = datetime.now() - timedelta(seconds=rows)
+    for offset in range(0, rows, batch):
+        entries = [make_entry(i, sessions, start) for i in range(offset, min(offset + batch, rows))]
+        with storage.db.write() as conn:
+            conn.executemany(INSERT_CONVERSATION, [storage._database_row(entry) for entry in entries])
+
+
+def latency_ms(fn: Callable[[], object], repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name: str, pooled: List[float], fresh: List[float]):
+    click.echo(f"{name:<24} p50 {statistics.median(pooled):8.2f} ms   "
+               f"p95 {sorted(pooled)[int(len(pooled) * 0.95)]:8.2f} ms   "
+               f"(fresh connection p50 {statistics.median(fresh):8.2f} ms)")
+
+
+@click.command()
+@click.option('--rows', '-n', default=1_000_000, help='Rows in the conversations table')
+@click.option('--sessions', default=1000, help='Distinct sessions the rows are spread over')
+@click.option('--inserts', default=2000, help='Rows written in the insert benchmarks')
+@click.option('--repeats', default=50, help='Runs of each query')
+def main(rows: int, sessions: int, inserts: int, repeats: int):
+    """Benchmark pooled SQLite storage against a large conversations table"""
+    storage = ConversationStorage()
+    
+    start = time.perf_counter()
+    fill(storage, rows, sessions)
+    click.echo(f"loaded {rows} rows in {time.perf_counter() - start:.1f}s")
+    
+    entries = [make_entry(rows + i, sessions, datetime.now()) for i in range(inserts)]
+    
+    start = time.perf_counter()
+    for entry in entries:
+        asyncio.run(storage._store_in_database(entry))
+    single_rate = inserts / (time.perf_counter() - start)
+    
+    # Batch inserts go through the write-behind path, without the session files
+    batch_rows = [storage._database_row(entry) for entry in entries]
+    start = time.perf_counter()
+    for offset in range(0, inserts, 100):
+        with storage.db.write() as conn:
+            conn.executemany(INSERT_CONVERSATION, batch_rows[offset:offset + 100])
+    batch_rate = inserts / (time.perf_counter() - start)
+    
+    click.echo(f"single-row inserts:      {single_rate:,.0f} rows/s")
+    click.echo(f"batched inserts (100):   {batch_rate:,.0f} rows/s")
+    
+    session_id = "session-7"
+    end = datetime.now().isoformat()
+    begin = (datetime.now() - timedelta(seconds=rows // 10)).isoformat()
+    
+    # A cursor deep into the session, to compare keyset paging with OFFSET
+    depth = rows // sessions // 2
+    deep_cursor = None
+    for _ in range(depth // 20):
+        deep_cursor = storage.get_history_page(session_id, 20, deep_cursor)["next_cursor"]
+    
+    queries = {
+        "recent conversations": ("""
+            SELECT user_message, agent_response, agent_used, timestamp, tools_used, confidence
+            FROM conversations WHERE session_id = ? ORDER BY ts DESC, id DESC LIMIT 10
+        """, (session_id,), lambda: storage.get_recent_conversations(session_id, 10)),
+        "conversations by date": ("""
+            SELECT user_message, agent_response, agent_used, timestamp, tools_used, confidence, metadata
+            FROM conversations WHERE session_id = ? AND ts BETWEEN ? AND ? ORDER BY ts ASC, id ASC
+        """, (session_id, epoch_ms(begin), epoch_ms(end)), lambda: storage.get_conversation_by_date(session_id, begin, end)),
+        "deep history page": ("""
+            SELECT user_message, agent_response, agent_used, timestamp, tools_used, confidence
+            FROM conversations WHERE session_id = ? ORDER BY ts DESC, id DESC LIMIT 20 OFFSET ?
+        """, (session_id, depth), lambda: storage.get_history_page(session_id, 20, deep_cursor)),
+        "search": ("""
+            SELECT user_message, agent_response, agent_used, timestamp, tools_used, confidence
+            FROM conversations WHERE session_id = ? AND (user_message LIKE ? OR agent_response LIKE ?)
+            ORDER BY ts DESC, id DESC LIMIT 20
+        """, (session_id, "%latency%", "%latency%"), lambda: storage.search_conversations(session_id, "latency")),
+        "session statistics": ("""
+            SELECT agent_used, COUNT(*) FROM conversations WHERE session_id = ? GROUP BY agent_used
+        """, (session_id,), lambda: storage.get_session_statistics(session_id))
+    }
+    
+    for name, (sql, params, pooled_call) in queries.items():
+        pooled = latency_ms(pooled_call, repeats)
+        
+        def fresh_call():
+            with sqlite3.connect(storage.db_path) as conn:
+                conn.execute(sql, params).fetchall()
+        
+        report(name, pooled, latency_ms(fresh_call, repeats))
+    
+    storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from dotenv import load_dotenv
 import os
 from typing import Dict, Any, Optional, List
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from pydantic_settings import BaseSettings
 
 load_dotenv()
@@ -15,14 +15,28 @@ class AgentConfig(BaseModel):
     temperature: float = 0.7
     max_tokens: int = 1000
     system_prompt: str = ""
+    cache_responses: bool = True
 
 
 class Settings(BaseSettings):
 
     
     # API Configuration
-    openrouter_api_key: str = Field(..., env="OPENROUTER_API_KEY")
+    llm_backend: str = "openrouter"  # openrouter or local
+    openrouter_api_key: Optional[str] = Field(None, env="OPENROUTER_API_KEY")
+    openrouter_url: str = "https://openrouter.ai/api/v1/chat/completions"
     model_name: str = "openai/gpt-oss-20b:free"  # OpenRouter free model
+    intent_model_name: Optional[str] = None  # Small fast model for intent prompts, defaults to model_name
+    fallback_models: List[str] = []  # Tried in order when preferred models fail or degrade
+    
+    # Local Backend (offline load testing)
+    local_llm_latency_ms: float = 300.0
+    local_llm_latency_distribution: str = "lognormal"  # fixed, uniform or lognormal
+    local_llm_latency_spread: float = 0.5
+    local_llm_tokens_per_second: float = 80.0
+    local_llm_response_mode: str = "echo"  # echo or canned
+    local_llm_canned_responses_path: Optional[str] = None
+    local_llm_seed: int = 0
     
     # System Configuration
     max_conversation_history: int = 100
@@ -34,6 +48,118 @@ class Settings(BaseSettings):
     default_temperature: float = 0.7
     max_tokens: int = 1500
     
+    # HTTP Client Configuration
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 10.0
+    http_read_timeout: float = 120.0
+    http2_enabled: bool = True
+    
+    # LLM Rate Limiting
+    llm_rate_limit_rps: float = 5.0
+    llm_rate_limit_burst: int = 10
+    llm_min_concurrency: int = 1
+    llm_max_concurrency: int = 16
+    llm_initial_concurrency: int = 4
+    llm_latency_target_ms: float = 10000.0
+    llm_max_retries: int = 3
+    llm_backoff_base_seconds: float = 1.0
+    llm_backoff_max_seconds: float = 30.0
+    llm_request_timeout_seconds: float = 120.0
+    
+    # Hedged Requests
+    llm_hedging_enabled: bool = False
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_min_delay_ms: float = 500.0
+    llm_hedge_max_rate: float = 0.1  # At most this fraction of requests get a duplicate
+    llm_hedge_min_samples: int = 20
+    
+    # Model Health
+    model_health_window: int = 50
+    model_health_min_samples: int = 5
+    model_max_error_rate: float = 0.3
+    model_max_p95_ms: float = 30000.0
+    model_recovery_seconds: float = 60.0
+    
+    # LLM Response Cache
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_seconds: int = 86400
+    llm_cache_memory_entries: int = 512
+    llm_cache_max_disk_mb: int = 100
+    singleflight_enabled: bool = True  # Share in-flight identical LLM and tool calls
+    
+    # Intent Analysis
+    intent_mode: str = "local"  # local, llm or hybrid
+    intent_confidence_threshold: float = 0.5
+    speculative_tool_calls: bool = True
+    
+    # Prompt Budget
+    model_context_tokens: int = 8192
+    prompt_safety_margin_tokens: int = 256
+    history_assistant_max_tokens: int = 300
+    history_code_block_max_lines: int = 12
+    
+    # Learned Router
+    learned_router_enabled: bool = True
+    learned_router_weight: float = 0.4  # Share of the routing score taken from the learned model
+    learned_router_min_examples: int = 50
+    learned_router_hash_buckets: int = 4096
+    learned_router_alpha: float = 1.0
+    learned_router_online: bool = False  # Also learn from the router's own successful answers, not just train-router
+    learned_router_save_every: int = 20  # Online examples are applied and saved in groups this size
+    routing_cache_size: int = 1024  # Routing decisions kept per normalized message
+    
+    # Speculative Routing
+    speculative_routing_enabled: bool = False  # Run the top two agents at once when routing is unsure
+    speculative_confidence_threshold: float = 0.4
+    speculative_margin: float = 0.05  # Runner-up within this score of the chosen agent counts as a close call
+    speculative_max_extra_tokens: int = 1500  # Estimated cost of the second agent allowed per request
+    speculative_max_rate: float = 0.25  # At most this fraction of requests run two agents
+    speculative_min_relevance: float = 0.3  # Share of the message's content words an answer must mention to win
+    
+    # Multi-Agent Collaboration
+    collaboration_max_concurrency: int = 3  # Collaboration steps running at once
+    collaboration_step_timeout_seconds: float = 90.0  # Slower steps are dropped from the synthesis
+    
+    # Conversation Persistence
+    storage_durability: str = "async"  # async, batch (commit every N) or sync
+    storage_queue_size: int = 1000  # Entries waiting to be written before callers block
+    storage_batch_size: int = 100  # Most entries in one group commit
+    storage_flush_every: int = 20  # Batch mode commits once this many entries are queued
+    storage_flush_interval_seconds: float = 5.0  # ...or once the oldest has waited this long
+    storage_retry_attempts: int = 3  # Tries per commit before its entries wait for the next one
+    storage_retry_backoff_seconds: float = 0.5  # Doubles after each failed try
+    storage_retry_interval_seconds: float = 30.0  # Failed entries are retried this often when nothing else arrives
+    session_log_compact_factor: float = 2.0  # Session logs are trimmed to max_conversation_history at this multiple
+    
+    # SQLite
+    sqlite_read_pool_size: int = 4
+    sqlite_synchronous: str = "NORMAL"  # Safe with WAL; FULL also syncs every commit
+    sqlite_cache_size_kb: int = 16384  # Page cache per connection
+    sqlite_mmap_size_mb: int = 256
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_statement_cache: int = 128  # Prepared statements kept per connection
+    storage_backfill_batch_size: int = 5000  # Rows per transaction when migrations fill new columns and indexes
+    
+    # Conversation Search
+    search_snippet_tokens: int = 16
+    search_highlight_start: str = "["
+    search_highlight_end: str = "]"
+    
+    # Retention
+    retention_enabled: bool = False  # Archive and delete idle sessions in the background
+    retention_days: int = 30  # Sessions idle longer than this are removed
+    retention_interval_seconds: float = 3600.0
+    retention_batch_size: int = 500  # Sessions deleted per transaction
+    retention_archive: bool = True  # Keep removed sessions in gzipped NDJSON under archive/
+    retention_vacuum_pages: int = 2000  # Pages released per incremental VACUUM step
+    retention_convert_vacuum: bool = False  # Let retention passes run the one-time full VACUUM that enables incremental mode
+    
+    # Session State
+    session_cache_size: int = 1000  # Sessions whose conversation state stays in memory
+    session_idle_seconds: float = 1800.0  # Idle sessions are spilled to storage after this long
+    
     # Tool Configuration
     web_search_enabled: bool = True
     file_operations_enabled: bool = True
@@ -50,12 +176,13 @@ class Settings(BaseSettings):
         'case_sensitive': False
     }
     
-    @field_validator("openrouter_api_key")
-    @classmethod
-    def validate_api_key(cls, v):
-        if not v or v == "your-api-key-here":
-            raise ValueError("OPENROUTER_API_KEY must be set to a valid API key")
-        return v
+    @model_validator(mode="after")
+    def validate_api_key(self):
+        # The local backend never talks to OpenRouter, so it runs without a key
+        if self.llm_backend == "openrouter":
+            if not self.openrouter_api_key or self.openrouter_api_key == "your-api-key-here":
+                raise ValueError("OPENROUTER_API_KEY must be set to a valid API key")
+        return self
     
     @field_validator("memory_storage_path")
     @classmethod
@@ -106,6 +233,7 @@ class Settings(BaseSettings):
                 capabilities=["content_creation", "brainstorming", "storytelling", "design"],
                 tools=["file_ops"],
                 temperature=0.9,
+                cache_responses=False,  # High-temperature output should vary between calls
                 system_prompt="""You are a Creative Agent, an expert in creative thinking and content creation.
                 Your personality is imaginative, expressive, and inspiring. You excel at:
                 - Generating creative ideas and concepts
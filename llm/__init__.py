@@ -0,0 +1,30 @@
+from .errors import LLMRequestError
+from .http import get_http_client, close_http_client, check_llm_response
+from .cache import LLMResponseCache, get_response_cache
+from .rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+from .backends import LLMBackend, OpenRouterBackend, LocalBackend, get_llm_backend
+from .model_router import ModelRouter, get_model_router
+from .hedging import RequestHedger, get_request_hedger
+from .singleflight import SingleFlight, get_singleflight, get_singleflight_stats
+
+__all__ = [
+    "LLMRequestError",
+    "get_http_client",
+    "close_http_client",
+    "check_llm_response",
+    "LLMResponseCache",
+    "get_response_cache",
+    "AdaptiveRateLimiter",
+    "get_rate_limiter",
+    "LLMBackend",
+    "OpenRouterBackend",
+    "LocalBackend",
+    "get_llm_backend",
+    "ModelRouter",
+    "get_model_router",
+    "RequestHedger",
+    "get_request_hedger",
+    "SingleFlight",
+    "get_singleflight",
+    "get_singleflight_stats"
+]
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import random
+from pathlib import Path
+from typing import Dict, Any, List, Optional, AsyncIterator, Protocol
+
+import httpx
+
+from config import settings
+from utils.logger import get_logger
+from .errors import LLMRequestError
+from .http import get_http_client, check_llm_response
+
+logger = get_logger(__name__)
+
+
+class LLMBackend(Protocol):
+    """Interface every LLM transport implements"""
+    
+    name: str
+    
+    async def complete(self, payload: Dict[str, Any]) -> str:
+        """Return the full completion for a chat payload"""
+        ...
+    
+    def stream(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yield completion text chunks for a chat payload"""
+        ...
+
+
+class OpenRouterBackend:
+    """Chat completions served by the OpenRouter API"""
+    
+    name = "openrouter"
+    
+    def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None):
+        self.url = url or settings.openrouter_url
+        self.api_key = api_key or settings.openrouter_api_key
+    
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    async def complete(self, payload: Dict[str, Any]) -> str:
+        """POST a single completion request"""
+        client = get_http_client()
+        
+        try:
+            response = await client.post(self.url, headers=self._headers(), json=payload)
+        except httpx.TransportError as e:
+            raise LLMRequestError(f"Connection error: {e}")
+        
+        check_llm_response(response)
+        
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
+    
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream a completion as server-sent events"""
+        client = get_http_client()
+        payload = {**payload, "stream": True}
+        
+        try:
+            async with client.stream("POST", self.url, headers=self._headers(), json=payload) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                check_llm_response(response)
+                
+                async for line_str in response.aiter_lines():
+                    if line_str.startswith('data: '):
+                        if line_str == 'data: [DONE]':
+                            break
+                        try:
+                            data = json.loads(line_str[6:])
+                            if 'choices' in data and len(data['choices']) > 0:
+                                delta = data['choices'][0].get('delta', {})
+                                if 'content' in delta:
+                                    yield delta['content']
+                        except json.JSONDecodeError:
+                            continue
+        except httpx.TransportError as e:
+            raise LLMRequestError(f"Connection error: {e}")
+
+
+class LocalBackend:
+    """
+    Offline backend for load tests and profiling.
+    
+    Responses are either an echo of the last user message or picked from a
+    JSON list of canned responses by hashing the prompt, so the same prompt
+    always gets the same answer. Latency is drawn from a seeded fixed,
+    uniform or lognormal distribution, and output is paced at a fixed
+    token rate.
+    """
+    
+    name = "local"
+    
+    DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+    
+    def __init__(self, latency_ms: Optional[float] = None, distribution: Optional[str] = None,
+                 spread: Optional[float] = None, tokens_per_second: Optional[float] = None,
+                 response_mode: Optional[str] = None, canned_responses: Optional[List[str]] = None,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms if latency_ms is not None else settings.local_llm_latency_ms
+        self.distribution = distribution or settings.local_llm_latency_distribution
+        self.spread = spread if spread is not None else settings.local_llm_latency_spread
+        self.tokens_per_second = (
+            tokens_per_second if tokens_per_second is not None else settings.local_llm_tokens_per_second
+        )
+        self.response_mode = response_mode or settings.local_llm_response_mode
+        self.canned_responses = canned_responses or self._load_canned_responses()
+        self._random = random.Random(seed if seed is not None else settings.local_llm_seed)
+        
+        if self.distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+        
+        self.stats = {
+            "requests": 0,
+            "tokens": 0
+        }
+    
+    def _load_canned_responses(self) -> List[str]:
+        path = settings.local_llm_canned_responses_path
+        if not path:
+            return []
+        
+        try:
+            with open(Path(path), 'r', encoding='utf-8') as f:
+                responses = json.load(f)
+            return [str(response) for response in responses]
+        except Exception as e:
+            logger.error(f"Error loading canned responses from {path}: {e}")
+            return []
+    
+    def _sample_latency(self) -> float:
+        """Draw a time-to-first-token in seconds"""
+        base = self.latency_ms / 1000
+        
+        if self.distribution == "fixed":
+            return base
+        if self.distribution == "uniform":
+            return self._random.uniform(base * (1 - self.spread), base * (1 + self.spread))
+        
+        # Lognormal with the configured median gives a realistic long tail
+        return self._random.lognormvariate(0, self.spread) * base
+    
+    def _respond(self, payload: Dict[str, Any]) -> str:
+        messages = payload.get("messages", [])
+        prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        
+        if self.response_mode == "canned" and self.canned_responses:
+            digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+            return self.canned_responses[int.from_bytes(digest[:4], "big") % len(self.canned_responses)]
+        
+        words = prompt.split()
+        limit = payload.get("max_tokens") or len(words)
+        return f"[{self.name}:{payload.get('model', 'model')}] " + " ".join(words[:limit])
+    
+    def _tokens(self, text: str) -> List[str]:
+        # Whitespace-delimited pieces keep the spacing when joined back together
+        return [token + " " for token in text.split(" ")] if text else []
+    
+    async def complete(self, payload: Dict[str, Any]) -> str:
+        """Return a response after the sampled latency plus generation time"""
+        self.stats["requests"] += 1
+        content = self._respond(payload)
+        tokens = len(self._tokens(content))
+        self.stats["tokens"] += tokens
+        
+        generation = tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        await asyncio.sleep(self._sample_latency() + generation)
+        return content
+    
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yield a response token by token at the configured rate"""
+        self.stats["requests"] += 1
+        tokens = self._tokens(self._respond(payload))
+        
+        await asyncio.sleep(self._sample_latency())
+        
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for index, token in enumerate(tokens):
+            if delay and index:
+                await asyncio.sleep(delay)
+            self.stats["tokens"] += 1
+            yield token.rstrip(" ") if index == len(tokens) - 1 else token
+
+
+# Available backends by settings name
+BACKENDS = {
+    "openrouter": OpenRouterBackend,
+    "local": LocalBackend
+}
+
+# Global backend instance shared by all agents
+_backend: Optional[LLMBackend] = None
+
+
+def get_llm_backend() -> LLMBackend:
+    """Get the LLM backend selected in settings"""
+    global _backend
+    if _backend is None:
+        backend_class = BACKENDS.get(settings.llm_backend)
+        if backend_class is None:
+            raise ValueError(f"Unknown LLM backend: {settings.llm_backend}")
+        _backend = backend_class()
+    return _backend
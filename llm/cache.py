@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM completions.
+    
+    Responses are keyed on the full request payload (model, messages,
+    temperature, max_tokens). Hot entries live in an in-memory LRU and
+    everything is persisted to SQLite so hits survive restarts.
+    """
+    
+    def __init__(self, db_path: Optional[Path] = None, memory_entries: Optional[int] = None,
+                 ttl_seconds: Optional[int] = None, max_disk_bytes: Optional[int] = None):
+        self.db_path = db_path or Path(settings.memory_storage_path) / "llm_cache.db"
+        self.memory_entries = memory_entries or settings.llm_cache_memory_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.llm_cache_ttl_seconds
+        self.max_disk_bytes = max_disk_bytes or settings.llm_cache_max_disk_mb * 1024 * 1024
+        
+        # In-memory LRU tier: key -> (response, created_at)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        
+        # On-disk tier shares a single connection guarded by a lock
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "expired": 0,
+            "evictions": 0
+        }
+        
+        self._init_database()
+    
+    def _init_database(self):
+        """Create the cache table and load the current disk usage"""
+        
+        try:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access
+                ON llm_cache(last_access)
+            """)
+            self._conn.commit()
+            
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            self._disk_bytes = row[0]
+            
+        except Exception as e:
+            logger.error(f"Failed to initialize LLM cache database, using memory only: {e}")
+            self._conn = None
+    
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """Build a stable cache key from the request payload"""
+        key_data = {
+            "model": payload.get("model"),
+            "messages": payload.get("messages"),
+            "temperature": payload.get("temperature"),
+            "max_tokens": payload.get("max_tokens")
+        }
+        encoded = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+    
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a cached response, checking memory before disk"""
+        
+        cached = self._memory.get(key)
+        if cached is not None:
+            response, created_at = cached
+            if not self._is_expired(created_at):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return response
+            
+            del self._memory[key]
+            self.stats["expired"] += 1
+        
+        if self._conn is not None:
+            cached = await asyncio.to_thread(self._disk_get, key)
+            if cached is not None:
+                response, created_at = cached
+                self._memory_put(key, response, created_at)
+                self.stats["disk_hits"] += 1
+                return response
+        
+        self.stats["misses"] += 1
+        return None
+    
+    async def set(self, key: str, response: str):
+        """Store a response in both tiers"""
+        
+        created_at = time.time()
+        self._memory_put(key, response, created_at)
+        self.stats["stores"] += 1
+        
+        if self._conn is not None:
+            await asyncio.to_thread(self._disk_set, key, response, created_at)
+    
+    def _memory_put(self, key: str, response: str, created_at: float):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+    
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        """Read an entry from SQLite, dropping it if expired"""
+        
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response, size, created_at FROM llm_cache WHERE cache_key = ?",
+                    (key,)
+                ).fetchone()
+                
+                if not row:
+                    return None
+                
+                response, size, created_at = row
+                
+                if self._is_expired(created_at):
+                    self._conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (key,))
+                    self._conn.commit()
+                    self._disk_bytes -= size
+                    self.stats["expired"] += 1
+                    return None
+                
+                self._conn.execute(
+                    "UPDATE llm_cache SET last_access = ? WHERE cache_key = ?",
+                    (time.time(), key)
+                )
+                self._conn.commit()
+                
+                return response, created_at
+                
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+    
+    def _disk_set(self, key: str, response: str, created_at: float):
+        """Write an entry to SQLite and evict least recently used rows if over budget"""
+        
+        size = len(response.encode("utf-8"))
+        
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT size FROM llm_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row:
+                    self._disk_bytes -= row[0]
+                
+                self._conn.execute("""
+                    INSERT OR REPLACE INTO llm_cache
+                    (cache_key, response, size, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (key, response, size, created_at, created_at))
+                self._disk_bytes += size
+                
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_locked()
+                
+                self._conn.commit()
+                
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+    
+    def _evict_locked(self):
+        """Evict expired entries, then least recently used ones until under the size budget"""
+        
+        if self.ttl_seconds > 0:
+            cutoff = time.time() - self.ttl_seconds
+            row = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache WHERE created_at < ?",
+                (cutoff,)
+            ).fetchone()
+            if row[0]:
+                self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (cutoff,))
+                self._disk_bytes -= row[1]
+                self.stats["expired"] += row[0]
+        
+        # Target 90% of the budget so we don't evict on every write
+        target = int(self.max_disk_bytes * 0.9)
+        
+        cursor = self._conn.execute(
+            "SELECT cache_key, size FROM llm_cache ORDER BY last_access ASC"
+        )
+        victims = []
+        for cache_key, size in cursor:
+            if self._disk_bytes <= target:
+                break
+            victims.append((cache_key,))
+            self._disk_bytes -= size
+        
+        if victims:
+            self._conn.executemany("DELETE FROM llm_cache WHERE cache_key = ?", victims)
+            self.stats["evictions"] += len(victims)
+    
+    def clear(self):
+        """Remove all cached responses"""
+        
+        self._memory.clear()
+        
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    self._conn.execute("DELETE FROM llm_cache")
+                    self._conn.commit()
+                    self._disk_bytes = 0
+            except Exception as e:
+                logger.error(f"Failed to clear LLM cache: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current cache size"""
+        
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        
+        return {
+            **self.stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes
+        }
+
+
+# Global cache instance, created on first use
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_response_cache() -> LLMResponseCache:
+    """Get the shared LLM response cache"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = LLMResponseCache()
+    return _response_cache
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RequestHedger:
+    """
+    Hedged requests for LLM calls.
+    
+    If a request hasn't finished by a percentile of recent latency for the
+    same model, a duplicate is started and whichever succeeds first wins;
+    the other is cancelled. Hedges are capped at a fraction of all
+    requests so a slow upstream doesn't get double the traffic.
+    """
+    
+    def __init__(self, percentile: Optional[float] = None, min_delay_ms: Optional[float] = None,
+                 max_hedge_rate: Optional[float] = None, min_samples: Optional[int] = None,
+                 window: Optional[int] = None):
+        self.percentile = percentile or settings.llm_hedge_percentile
+        self.min_delay = (min_delay_ms if min_delay_ms is not None else settings.llm_hedge_min_delay_ms) / 1000
+        self.max_hedge_rate = max_hedge_rate if max_hedge_rate is not None else settings.llm_hedge_max_rate
+        self.min_samples = min_samples or settings.llm_hedge_min_samples
+        self.window = window or settings.model_health_window
+        
+        # Successful request latencies in seconds, per model
+        self._latencies: Dict[str, deque] = {}
+        
+        self.stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "primary_wins": 0,
+            "budget_skipped": 0
+        }
+    
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there's too little history"""
+        latencies = self._latencies.get(key)
+        if not latencies or len(latencies) < self.min_samples:
+            return None
+        
+        ordered = sorted(latencies)
+        index = min(int(self.percentile / 100 * len(ordered)), len(ordered) - 1)
+        return max(ordered[index], self.min_delay)
+    
+    def _record(self, key: str, latency: float):
+        if key not in self._latencies:
+            self._latencies[key] = deque(maxlen=self.window)
+        self._latencies[key].append(latency)
+    
+    def _within_budget(self) -> bool:
+        return self.stats["hedged"] < self.max_hedge_rate * self.stats["requests"]
+    
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory(), hedging it with a second call if it is slow.
+        
+        Args:
+            key: Latency history to use, normally the model name
+            factory: Zero-argument callable starting one attempt
+        """
+        self.stats["requests"] += 1
+        start = time.monotonic()
+        primary = asyncio.ensure_future(factory())
+        tasks = {primary: start}
+        
+        try:
+            delay = self.hedge_delay(key)
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                
+                if not done:
+                    if self._within_budget():
+                        self.stats["hedged"] += 1
+                        tasks[asyncio.ensure_future(factory())] = time.monotonic()
+                    else:
+                        self.stats["budget_skipped"] += 1
+            
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    
+                    self._record(key, time.monotonic() - tasks[task])
+                    if len(tasks) > 1:
+                        self.stats["primary_wins" if task is primary else "hedge_wins"] += 1
+                    return task.result()
+            
+            raise error
+            
+        finally:
+            # Cancel whichever attempt lost, or both if the caller went away
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hedging counters and current hedge delays"""
+        hedged = self.stats["hedged"]
+        return {
+            **self.stats,
+            "hedge_rate": hedged / self.stats["requests"] if self.stats["requests"] else 0.0,
+            "hedge_win_rate": self.stats["hedge_wins"] / hedged if hedged else 0.0,
+            "hedge_delay_ms": {
+                key: round(delay * 1000, 1)
+                for key in self._latencies
+                if (delay := self.hedge_delay(key)) is not None
+            }
+        }
+
+
+# Global hedger shared by all agents
+_hedger: Optional[RequestHedger] = None
+
+
+def get_request_hedger() -> RequestHedger:
+    """Get the shared request hedger"""
+    global _hedger
+    if _hedger is None:
+        _hedger = RequestHedger()
+    return _hedger
@@ -0,0 +1,90 @@
+import asyncio
+from typing import Optional
+
+import httpx
+
+from config import settings
+from utils.logger import get_logger
+from .errors import LLMRequestError, parse_retry_after
+
+logger = get_logger(__name__)
+
+# Shared client and the event loop it is bound to
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    """Check whether the optional h2 package is installed"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared keep-alive HTTP client for the running event loop.
+    
+    All agents share one connection pool so concurrent requests reuse
+    TLS connections instead of opening a new one per call.
+    """
+    global _client, _client_loop
+    
+    loop = asyncio.get_running_loop()
+    
+    # httpx clients cannot be used across event loops, so rebuild when the loop changes
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        http2 = settings.http2_enabled and _http2_available()
+        
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                settings.http_read_timeout,
+                connect=settings.http_connect_timeout
+            ),
+            http2=http2
+        )
+        _client_loop = loop
+        
+        logger.debug(
+            f"HTTP client created (pool={settings.http_max_connections}, http2={http2})"
+        )
+    
+    return _client
+
+
+async def close_http_client():
+    """Close the shared HTTP client and release pooled connections"""
+    global _client, _client_loop
+    
+    if _client is not None and not _client.is_closed:
+        try:
+            await _client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing HTTP client: {e}")
+    
+    _client = None
+    _client_loop = None
+
+
+def check_llm_response(response: httpx.Response):
+    """Raise LLMRequestError for error statuses, keeping any Retry-After hint"""
+    if response.status_code < 400:
+        return
+    
+    try:
+        detail = response.text[:200]
+    except httpx.ResponseNotRead:
+        detail = ""
+    
+    raise LLMRequestError(
+        f"HTTP {response.status_code}: {detail}",
+        status_code=response.status_code,
+        retry_after=parse_retry_after(response.headers.get("Retry-After"))
+    )
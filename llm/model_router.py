@@ -0,0 +1,166 @@
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Kinds of LLM calls that can be served by different models
+CALL_CLASSES = ("intent", "answer")
+
+
+class ModelHealth:
+    """Rolling latency and error statistics for one model"""
+    
+    def __init__(self, window: int):
+        self._samples: deque = deque(maxlen=window)  # (latency_ms, ok)
+        self.unhealthy_since: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+    
+    def record(self, latency_ms: float, ok: bool):
+        self._samples.append((latency_ms, ok))
+        self.requests += 1
+        if not ok:
+            self.failures += 1
+    
+    def reset(self):
+        self._samples.clear()
+        self.unhealthy_since = None
+    
+    @property
+    def samples(self) -> int:
+        return len(self._samples)
+    
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        index = min(int(pct / 100 * len(latencies)), len(latencies) - 1)
+        return latencies[index]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "window_samples": self.samples,
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "healthy": self.unhealthy_since is None
+        }
+
+
+class ModelRouter:
+    """
+    Chooses which model serves each LLM call.
+    
+    Every call class has a preferred model (a small fast model for intent
+    prompts, the main model for answers) followed by the configured
+    fallback models. A model whose rolling error rate or p95 latency
+    crosses its threshold is moved behind the healthy ones until it has
+    rested for the recovery period, after which it gets a fresh window.
+    """
+    
+    def __init__(self, models: Optional[Dict[str, str]] = None, fallbacks: Optional[List[str]] = None,
+                 window: Optional[int] = None, min_samples: Optional[int] = None,
+                 max_error_rate: Optional[float] = None, max_p95_ms: Optional[float] = None,
+                 recovery_seconds: Optional[float] = None):
+        self.models = models or {
+            "intent": settings.intent_model_name or settings.model_name,
+            "answer": settings.model_name
+        }
+        self.fallbacks = fallbacks if fallbacks is not None else settings.fallback_models
+        self.window = window or settings.model_health_window
+        self.min_samples = min_samples or settings.model_health_min_samples
+        self.max_error_rate = max_error_rate if max_error_rate is not None else settings.model_max_error_rate
+        self.max_p95_ms = max_p95_ms or settings.model_max_p95_ms
+        self.recovery_seconds = (
+            recovery_seconds if recovery_seconds is not None else settings.model_recovery_seconds
+        )
+        
+        self._health: Dict[str, ModelHealth] = {}
+        self.stats = {
+            "failovers": 0,
+            "marked_unhealthy": 0,
+            "recovered": 0
+        }
+    
+    def _get_health(self, model: str) -> ModelHealth:
+        if model not in self._health:
+            self._health[model] = ModelHealth(self.window)
+        return self._health[model]
+    
+    def candidates(self, call_class: str = "answer") -> List[str]:
+        """Models to try for a call, best first"""
+        preferred = self.models.get(call_class, self.models["answer"])
+        
+        ordered = []
+        for model in [preferred] + list(self.fallbacks):
+            if model not in ordered:
+                ordered.append(model)
+        
+        # Stable sort keeps the configured preference among healthy models
+        return sorted(ordered, key=lambda model: not self.is_healthy(model))
+    
+    def is_healthy(self, model: str) -> bool:
+        health = self._get_health(model)
+        if health.unhealthy_since is None:
+            return True
+        
+        # Give a rested model a fresh window
+        if time.monotonic() - health.unhealthy_since >= self.recovery_seconds:
+            health.reset()
+            self.stats["recovered"] += 1
+            logger.info(f"Model {model} back in rotation")
+            return True
+        
+        return False
+    
+    def record(self, model: str, latency_ms: float, ok: bool):
+        """Record the outcome of one request to a model"""
+        health = self._get_health(model)
+        health.record(latency_ms, ok)
+        
+        if health.unhealthy_since is not None or health.samples < self.min_samples:
+            return
+        
+        p95 = health.percentile(95)
+        if health.error_rate > self.max_error_rate or (p95 is not None and p95 > self.max_p95_ms):
+            health.unhealthy_since = time.monotonic()
+            self.stats["marked_unhealthy"] += 1
+            p95_text = f"{p95:.0f} ms" if p95 is not None else "n/a"
+            logger.warning(f"Model {model} marked unhealthy (error rate {health.error_rate:.0%}, p95 {p95_text})")
+    
+    def record_failover(self, from_model: str, to_model: str, error: Exception):
+        self.stats["failovers"] += 1
+        logger.warning(f"Failing over from {from_model} to {to_model}: {error}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-model health and failover counters"""
+        return {
+            **self.stats,
+            "call_classes": dict(self.models),
+            "models": {model: health.to_dict() for model, health in self._health.items()}
+        }
+
+
+# Global model router shared by all agents
+_model_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Get the shared model router"""
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+from config import settings
+from utils.logger import get_logger
+from .errors import LLMRequestError
+
+logger = get_logger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """
+    Process-wide gate for LLM traffic.
+    
+    Combines a token bucket (requests per second with a burst allowance)
+    with an AIMD concurrency limit: the limit grows by roughly one slot per
+    window of healthy responses and is halved on 429/5xx responses. Rate
+    limit responses also pause dispatch until Retry-After has passed.
+    Waiting requests are served highest priority first.
+    """
+    
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None,
+                 min_concurrency: Optional[int] = None, max_concurrency: Optional[int] = None,
+                 initial_concurrency: Optional[int] = None, latency_target_ms: Optional[float] = None):
+        self.rate = rate or settings.llm_rate_limit_rps
+        self.burst = burst or settings.llm_rate_limit_burst
+        self.min_concurrency = min_concurrency or settings.llm_min_concurrency
+        self.max_concurrency = max_concurrency or settings.llm_max_concurrency
+        self.latency_target = (latency_target_ms or settings.llm_latency_target_ms) / 1000
+        
+        # Token bucket state
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        
+        # AIMD concurrency state
+        self._limit = float(initial_concurrency or settings.llm_initial_concurrency)
+        self._limit = min(max(self._limit, self.min_concurrency), self.max_concurrency)
+        self._in_flight = 0
+        self._consecutive_failures = 0
+        self._blocked_until = 0.0
+        
+        # Priority queue of (-priority, sequence, future)
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        
+        self.stats = {
+            "requests": 0,
+            "queued": 0,
+            "throttled": 0,
+            "backoffs": 0,
+            "limit_increases": 0,
+            "limit_decreases": 0
+        }
+    
+    @asynccontextmanager
+    async def slot(self, priority: int = 3, track_latency: bool = True):
+        """
+        Hold one concurrency slot for the duration of a request.
+        
+        Args:
+            priority: 1 (lowest) to 5 (highest), as produced by intent analysis
+            track_latency: Feed the request latency into the AIMD controller
+        """
+        await self._acquire(priority)
+        start = time.monotonic()
+        
+        try:
+            yield
+        except LLMRequestError as e:
+            if e.retryable:
+                self._on_congestion(e.retry_after)
+            raise
+        else:
+            if track_latency:
+                self._on_success(time.monotonic() - start)
+            else:
+                self._consecutive_failures = 0
+        finally:
+            self._release()
+            self._dispatch()
+    
+    async def _acquire(self, priority: int):
+        self.stats["requests"] += 1
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._sequence), future))
+        
+        self._dispatch()
+        
+        if not future.done():
+            self.stats["queued"] += 1
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            # If the slot was granted just before cancellation, hand it back
+            if future.done() and not future.cancelled():
+                self._release()
+                self._dispatch()
+            raise
+    
+    def _release(self):
+        self._in_flight = max(self._in_flight - 1, 0)
+    
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._tokens = min(self._tokens + elapsed * self.rate, float(self.burst))
+        self._last_refill = now
+    
+    def _dispatch(self):
+        """Grant slots to waiters while concurrency, tokens and backoff allow"""
+        
+        now = time.monotonic()
+        self._refill(now)
+        
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            
+            # Drop waiters that were cancelled while queued
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            
+            if self._in_flight >= int(self._limit):
+                return
+            
+            if now < self._blocked_until:
+                self._schedule_wakeup(self._blocked_until - now)
+                return
+            
+            if self._tokens < 1.0:
+                self.stats["throttled"] += 1
+                self._schedule_wakeup((1.0 - self._tokens) / self.rate)
+                return
+            
+            heapq.heappop(self._waiters)
+            self._tokens -= 1.0
+            self._in_flight += 1
+            future.set_result(None)
+    
+    def _schedule_wakeup(self, delay: float):
+        if self._wakeup is not None and not self._wakeup.cancelled():
+            self._wakeup.cancel()
+        
+        loop = asyncio.get_running_loop()
+        self._wakeup = loop.call_later(max(delay, 0.001), self._dispatch)
+    
+    def _on_success(self, latency: float):
+        """Additive increase while latency is healthy, gentle decrease when it degrades"""
+        self._consecutive_failures = 0
+        
+        if latency <= self.latency_target:
+            if self._limit < self.max_concurrency:
+                self._limit = min(self._limit + 1.0 / self._limit, float(self.max_concurrency))
+                self.stats["limit_increases"] += 1
+        elif latency > 2 * self.latency_target:
+            self._decrease(0.9)
+    
+    def _on_congestion(self, retry_after: Optional[float]):
+        """Multiplicative decrease and pause dispatch on 429/5xx"""
+        self._consecutive_failures += 1
+        self._decrease(0.5)
+        
+        if retry_after is None:
+            retry_after = min(
+                settings.llm_backoff_base_seconds * (2 ** (self._consecutive_failures - 1)),
+                settings.llm_backoff_max_seconds
+            )
+        
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self.stats["backoffs"] += 1
+        
+        logger.warning(
+            f"LLM backoff for {retry_after:.1f}s, concurrency limit now {int(self._limit)}"
+        )
+    
+    def _decrease(self, factor: float):
+        new_limit = max(self._limit * factor, float(self.min_concurrency))
+        if new_limit < self._limit:
+            self._limit = new_limit
+            self.stats["limit_decreases"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter counters and current state"""
+        return {
+            **self.stats,
+            "concurrency_limit": int(self._limit),
+            "in_flight": self._in_flight,
+            "waiting": sum(1 for _, _, future in self._waiters if not future.done()),
+            "backoff_remaining": max(self._blocked_until - time.monotonic(), 0.0)
+        }
+
+
+# Global limiter instance shared by all agents
+_rate_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """Get the shared LLM rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = AdaptiveRateLimiter()
+    return _rate_limiter
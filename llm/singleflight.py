@@ -0,0 +1,94 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+
+@dataclass
+class _Flight:
+    """An in-flight call and the number of callers waiting on it"""
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one.
+    
+    The first caller for a key starts the work; callers that arrive while
+    it is in flight await the same task. Each caller waits through a
+    shield, so cancelling one caller doesn't cancel the others. The shared
+    task is only cancelled once every caller waiting on it has gone.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+        
+        self.stats = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0,
+            "cancelled": 0
+        }
+    
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory() for key, or join the call already in flight for it.
+        
+        Args:
+            key: Identity of the call; equal keys must mean equal results
+            factory: Zero-argument callable returning the awaitable to run
+            
+        Returns:
+            The shared result; exceptions are raised to every caller
+        """
+        self.stats["calls"] += 1
+        
+        flight = self._flights.get(key)
+        if flight is None or flight.task.done():
+            flight = _Flight(task=asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            self.stats["executions"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller gave up, so nobody needs the result
+                flight.task.cancel()
+                self.stats["cancelled"] += 1
+    
+    def _forget(self, key: str, flight: _Flight):
+        # A newer flight may already own the key
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get call counters and the number of calls in flight"""
+        calls = self.stats["calls"]
+        return {
+            **self.stats,
+            "in_flight": len(self._flights),
+            "coalesce_rate": self.stats["coalesced"] / calls if calls else 0.0
+        }
+
+
+# Global single-flight groups, one per kind of call
+_groups: Dict[str, SingleFlight] = {}
+
+
+def get_singleflight(name: str) -> SingleFlight:
+    """Get the shared single-flight group with the given name"""
+    if name not in _groups:
+        _groups[name] = SingleFlight(name)
+    return _groups[name]
+
+
+def get_singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """Get stats for every single-flight group"""
+    return {name: group.get_stats() for name, group in _groups.items()}
@@ -1,7 +1,8 @@
 import asyncio
 import sys
 import os
-from typing import Optional
+import time
+from typing import Optional, Any, Callable
 
 import click
 from rich.console import Console
@@ -11,9 +12,11 @@ from rich.prompt import Prompt
 from rich.live import Live
 from rich.spinner import Spinner
 from rich.markdown import Markdown
+from rich.table import Table
 
 from config import Settings
 from orchestration.coordinator import AgentCoordinator
+from orchestration.router import AgentRouter
 from utils.logger import setup_logger
 from utils.cli_helpers import display_banner, display_agent_info, format_response
 
@@ -21,6 +24,13 @@ from utils.cli_helpers import display_banner, display_agent_info, format_respons
 console = Console()
 logger = setup_logger()
 
+# Redraw rate for streamed answers
+STREAM_REFRESH_PER_SECOND = 8
+
+# /history shows this many entries per page; "/history more" continues from the cursor
+HISTORY_PAGE_SIZE = 5
+history_cursor: Optional[str] = None
+
 
 @click.group()
 @click.option('--config', '-c', help='Path to configuration file')
@@ -40,7 +50,13 @@ def cli(ctx, config: Optional[str], verbose: bool):
         logger.setLevel("DEBUG")
     
     ctx.obj['settings'] = settings
-    ctx.obj['coordinator'] = AgentCoordinator(settings)
+
+
+def get_coordinator(ctx) -> AgentCoordinator:
+    """Build the coordinator the first time a command needs it"""
+    if 'coordinator' not in ctx.obj:
+        ctx.obj['coordinator'] = AgentCoordinator(ctx.obj['settings'])
+    return ctx.obj['coordinator']
 
 
 @cli.command()
@@ -48,7 +64,7 @@ def cli(ctx, config: Optional[str], verbose: bool):
 def interactive(ctx):
     """Start interactive multi-agent chat session"""
     settings = ctx.obj['settings']
-    coordinator = ctx.obj['coordinator']
+    coordinator = get_coordinator(ctx)
     
     display_banner()
     
@@ -66,8 +82,45 @@ def interactive(ctx):
         border_style="blue"
     ))
     
-    # Start interactive loop
-    asyncio.run(interactive_loop(coordinator))
+    # Start interactive loop; it handles Ctrl+C itself, after which asyncio.run re-raises it
+    try:
+        asyncio.run(interactive_loop(coordinator))
+    except KeyboardInterrupt:
+        pass
+
+
+async def ask_user(prompt: str) -> str:
+    """
+    Prompt for a line of input without blocking the event loop.
+    
+    On a terminal the loop waits for the line to arrive before reading
+    it, so write-behind flushes and retention keep running between turns
+    and Ctrl+C is handled straight away. Piped input never waits on the
+    user, so it is read directly.
+    """
+    if not sys.stdin.isatty():
+        return Prompt.ask(prompt)
+    
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    fd = sys.stdin.fileno()
+    try:
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+    except NotImplementedError:
+        # The Windows event loop can't watch the console, so wait on a worker thread
+        return await asyncio.to_thread(Prompt.ask, prompt)
+    
+    try:
+        console.print(prompt, end=": ")
+        await ready
+    finally:
+        loop.remove_reader(fd)
+    
+    # A terminal delivers one line per read, so this doesn't block
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip("\n")
 
 
 async def interactive_loop(coordinator: AgentCoordinator):
@@ -77,7 +130,7 @@ async def interactive_loop(coordinator: AgentCoordinator):
     while True:
         try:
             # Get user input
-            user_input = Prompt.ask("\n[bold cyan]You[/bold cyan]").strip()
+            user_input = (await ask_user("\n[bold cyan]You[/bold cyan]")).strip()
             
             if not user_input:
                 continue
@@ -89,32 +142,76 @@ async def interactive_loop(coordinator: AgentCoordinator):
                 continue
             
             # Process message with coordinator
-            with Live(Spinner("dots", text="Thinking..."), refresh_per_second=10):
-                response = await coordinator.process_message(user_input, current_agent)
-            
-            # Display response
-            if response.agent_used:
-                console.print(f"\n[bold magenta]{response.agent_used.title()} Agent[/bold magenta]:")
-                current_agent = response.agent_used
+            if coordinator.settings.enable_streaming:
+                response = await stream_response(
+                    coordinator, user_input, current_agent,
+                    header="\n[bold magenta]{agent} Agent[/bold magenta]:",
+                    render=lambda content: Panel(content, border_style="green", padding=(1, 2))
+                )
+                current_agent = response.agent_used or current_agent
+            else:
+                with Live(Spinner("dots", text="Thinking..."), refresh_per_second=10):
+                    response = await coordinator.process_message(user_input, current_agent)
                 
-            # Format and display the response
-            formatted_response = format_response(response.content)
-            console.print(Panel(
-                formatted_response,
-                border_style="green",
-                padding=(1, 2)
-            ))
+                # Display response
+                if response.agent_used:
+                    console.print(f"\n[bold magenta]{response.agent_used.title()} Agent[/bold magenta]:")
+                    current_agent = response.agent_used
+                    
+                # Format and display the response
+                formatted_response = format_response(response.content)
+                console.print(Panel(
+                    formatted_response,
+                    border_style="green",
+                    padding=(1, 2)
+                ))
             
             # Show any tool usage
             if response.tools_used:
                 console.print(f"\n[dim]Tools used: {', '.join(response.tools_used)}[/dim]")
                 
-        except KeyboardInterrupt:
+        except EOFError:
+            # Input closed, e.g. Ctrl+D or the end of piped input
+            break
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            # asyncio.run turns Ctrl+C into cancelling this task
             console.print("\n[yellow]Interrupted by user[/yellow]")
             break
         except Exception as e:
             logger.error(f"Error in interactive loop: {e}")
             console.print(f"[red]Error: {e}[/red]")
+    
+    await coordinator.shutdown()
+
+
+async def stream_response(coordinator: AgentCoordinator, message: str, agent: Optional[str],
+                          header: str, render: Callable[[Any], Any]):
+    """Render a streamed answer incrementally and return the final CoordinatorResponse"""
+    buffer = ""
+    response = None
+    last_render = 0.0
+    
+    # Re-rendering markdown on every token is expensive, so cap the redraw rate
+    min_interval = 1.0 / STREAM_REFRESH_PER_SECOND
+    
+    with Live(Spinner("dots", text="Thinking..."), console=console,
+              refresh_per_second=STREAM_REFRESH_PER_SECOND) as live:
+        async for event in coordinator.process_message_stream(message, agent):
+            if event.type == "routing":
+                console.print(header.format(agent=event.agent_name.title()))
+            elif event.type == "token":
+                buffer += event.content
+                now = time.monotonic()
+                if now - last_render >= min_interval:
+                    live.update(render(Markdown(buffer)))
+                    last_render = now
+            elif event.type == "done":
+                response = event.response
+        
+        # Show the final, agent-formatted answer
+        live.update(render(format_response(response.content)))
+    
+    return response
 
 
 async def handle_command(command: str, coordinator: AgentCoordinator, current_agent: Optional[str]) -> bool:
@@ -127,7 +224,7 @@ async def handle_command(command: str, coordinator: AgentCoordinator, current_ag
             "[bold]Available Commands:[/bold]\n\n"
             "• [cyan]/agents[/cyan] - List all available agents\n"
             "• [cyan]/switch <agent>[/cyan] - Switch to specific agent (research, code, creative, task)\n"
-            "• [cyan]/history[/cyan] - Show conversation history\n"
+            "• [cyan]/history[/cyan] - Show conversation history ([cyan]/history more[/cyan] for older)\n"
             "• [cyan]/clear[/cyan] - Clear conversation history\n"
             "• [cyan]/status[/cyan] - Show system status\n"
             "• [cyan]/exit[/cyan] - Exit the system",
@@ -152,19 +249,28 @@ async def handle_command(command: str, coordinator: AgentCoordinator, current_ag
                 console.print(f"[red]Unknown agent: {agent_name}[/red]")
                 
     elif cmd == "history":
-        history = coordinator.get_conversation_history()
+        global history_cursor
+        more = len(cmd_parts) > 1 and cmd_parts[1].lower() == "more"
+        if more and history_cursor is None:
+            console.print("[yellow]No older history[/yellow]")
+            return False
+        
+        page = coordinator.get_history_page(HISTORY_PAGE_SIZE, history_cursor if more else None)
+        history_cursor = page["next_cursor"]
+        history = page["entries"][::-1]
         if history:
             console.print(Panel(
                 "\n".join([f"[cyan]User:[/cyan] {h['user']}\n[green]Agent:[/green] {h['response'][:100]}..." 
-                          for h in history[-5:]]),
-                title="Recent History",
+                          for h in history]),
+                title="Earlier History" if more else "Recent History",
+                subtitle="/history more for older messages" if history_cursor else None,
                 border_style="blue"
             ))
         else:
             console.print("[yellow]No conversation history[/yellow]")
             
     elif cmd == "clear":
-        coordinator.clear_history()
+        await coordinator.clear_history()
         console.print("[green]Conversation history cleared[/green]")
         
     elif cmd == "status":
@@ -195,20 +301,29 @@ async def handle_command(command: str, coordinator: AgentCoordinator, current_ag
 @click.pass_context
 def ask(ctx, message: str, agent: Optional[str]):
     """Ask a single question to the agent system"""
-    coordinator = ctx.obj['coordinator']
+    coordinator = get_coordinator(ctx)
     
     async def single_ask():
-        with Live(Spinner("dots", text="Processing..."), refresh_per_second=10):
-            response = await coordinator.process_message(message, agent)
-        
-        if response.agent_used:
-            console.print(f"[bold magenta]{response.agent_used.title()} Agent:[/bold magenta]")
+        if coordinator.settings.enable_streaming:
+            response = await stream_response(
+                coordinator, message, agent,
+                header="[bold magenta]{agent} Agent:[/bold magenta]",
+                render=lambda content: content
+            )
+        else:
+            with Live(Spinner("dots", text="Processing..."), refresh_per_second=10):
+                response = await coordinator.process_message(message, agent)
             
-        formatted_response = format_response(response.content)
-        console.print(formatted_response)
+            if response.agent_used:
+                console.print(f"[bold magenta]{response.agent_used.title()} Agent:[/bold magenta]")
+                
+            formatted_response = format_response(response.content)
+            console.print(formatted_response)
         
         if response.tools_used:
             console.print(f"\n[dim]Tools used: {', '.join(response.tools_used)}[/dim]")
+        
+        await coordinator.shutdown()
     
     asyncio.run(single_ask())
 
@@ -217,8 +332,8 @@ def ask(ctx, message: str, agent: Optional[str]):
 @click.pass_context
 def list_agents(ctx):
     """List all available agents and their capabilities"""
-    coordinator = ctx.obj['coordinator']
-    agents_info = coordinator.get_available_agents()
+    # Agent metadata is static, so listing needs no coordinator or storage
+    agents_info = AgentRouter.get_available_agents()
     
     console.print(Panel(
         "[bold]Available Agents:[/bold]",
@@ -230,9 +345,52 @@ def list_agents(ctx):
         display_agent_info(agent_name, agent_info)
 
 
+@cli.command()
+@click.pass_context
+def train_router(ctx):
+    """Train the learned router from stored conversation history"""
+    coordinator = get_coordinator(ctx)
+    
+    if not coordinator.router.learned_router.available:
+        console.print("[red]NumPy is required to train the router (install the learned-router extra)[/red]")
+        return
+    
+    counts = coordinator.router.train_learned_router(coordinator.storage)
+    
+    if not counts:
+        console.print("[yellow]No stored conversations to train on[/yellow]")
+        return
+    
+    table = Table(title="Router Training Data")
+    table.add_column("Agent", style="cyan")
+    table.add_column("Conversations", justify="right")
+    for agent_name, count in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+        table.add_row(agent_name.title(), str(count))
+    console.print(table)
+    
+    stats = coordinator.router.learned_router.get_stats()
+    status = "active" if stats["trained"] else f"inactive until {coordinator.settings.learned_router_min_examples} weighted examples"
+    console.print(f"Router model saved ({stats['examples']} weighted examples, {status})")
+
+
+@cli.command()
+@click.pass_context
+def compact_storage(ctx):
+    """Switch conversation storage to incremental vacuum and release free space"""
+    coordinator = get_coordinator(ctx)
+    
+    console.print("[yellow]Rewriting the conversation database; writes wait until this finishes[/yellow]")
+    freed = coordinator.retention.enable_incremental_vacuum()
+    if freed:
+        console.print(f"[green]Released {freed} pages; retention will now free space incrementally[/green]")
+    else:
+        console.print("[green]Storage already uses incremental vacuum[/green]")
+    coordinator.storage.close()
+
+
 if __name__ == "__main__":
-    # Ensure API key is set
-    if not os.getenv("OPENROUTER_API_KEY"):
+    # Ensure API key is set unless running against the offline backend
+    if os.getenv("LLM_BACKEND", "openrouter") == "openrouter" and not os.getenv("OPENROUTER_API_KEY"):
         console.print("[red]Error: OPENROUTER_API_KEY environment variable must be set[/red]")
         sys.exit(1)
         
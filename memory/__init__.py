@@ -1,4 +1,5 @@
 from .storage import ConversationStorage
 from .context import ConversationContext
+from .sessions import SessionStore, SessionState, current_session
 
-__all__ = ["ConversationStorage", "ConversationContext"]
+__all__ = ["ConversationStorage", "ConversationContext", "SessionStore", "SessionState", "current_session"]
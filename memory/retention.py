@@ -0,0 +1,294 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RetentionEngine:
+    """
+    Archives and deletes sessions that have been idle past the retention period.
+    
+    Stale sessions are found on the last_activity_ts index and handled
+    batch_size at a time: each batch is first written to gzipped NDJSON
+    archives partitioned by the day of the session's last activity
+    (archive/YYYY-MM/YYYY-MM-DD.ndjson.gz, one line per session), then
+    removed from every table in a single transaction. Freed pages are
+    returned to the filesystem with incremental VACUUM afterwards, a few
+    pages per transaction so writers aren't held up.
+    
+    run() does one pass; ensure_scheduled() repeats it every interval on
+    the event loop, with the SQLite work in a worker thread. get_stats()
+    reports totals and the progress of the pass in flight.
+    """
+    
+    def __init__(self, storage_provider: Callable[[], Any], retention_days: Optional[int] = None,
+                 batch_size: Optional[int] = None, archive: Optional[bool] = None,
+                 interval: Optional[float] = None, vacuum_pages: Optional[int] = None):
+        self._storage_provider = storage_provider
+        self.retention_days = retention_days if retention_days is not None else settings.retention_days
+        self.batch_size = batch_size or settings.retention_batch_size
+        self.archive = archive if archive is not None else settings.retention_archive
+        self.interval = interval or settings.retention_interval_seconds
+        self.vacuum_pages = vacuum_pages or settings.retention_vacuum_pages
+        
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        
+        self.stats = {
+            "runs": 0,
+            "sessions_archived": 0,
+            "sessions_deleted": 0,
+            "conversations_deleted": 0,
+            "batches": 0,
+            "pages_freed": 0,
+            "errors": 0
+        }
+        self.progress: Dict[str, Any] = {}
+        self.last_run: Dict[str, Any] = {}
+    
+    def ensure_scheduled(self):
+        """Start the periodic task if it isn't running; needs a running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._schedule())
+    
+    async def _schedule(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run)
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}")
+            await asyncio.sleep(self.interval)
+    
+    async def close(self):
+        """Stop the periodic task; a pass already in its worker thread finishes its current batch"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    def run(self, days_old: Optional[int] = None) -> Dict[str, Any]:
+        """Archive and delete every session idle for more than days_old days, then vacuum"""
+        
+        if self._running:
+            logger.warning("Retention run already in progress, skipping")
+            return self.progress
+        
+        self._running = True
+        storage = self._storage_provider()
+        days_old = days_old if days_old is not None else self.retention_days
+        cutoff = int((datetime.now() - timedelta(days=days_old)).timestamp() * 1000)
+        started = time.monotonic()
+        
+        self.progress = {
+            "started_at": datetime.now().isoformat(),
+            "cutoff_days": days_old,
+            "sessions_total": 0,
+            "sessions_done": 0,
+            "conversations_deleted": 0,
+            "pages_freed": 0,
+            "phase": "scanning"
+        }
+        
+        try:
+            with storage.db.read() as conn:
+                self.progress["sessions_total"] = conn.execute(
+                    "SELECT COUNT(*) FROM session_metadata WHERE last_activity_ts < ?", (cutoff,)
+                ).fetchone()[0]
+            
+            self.progress["phase"] = "deleting"
+            while True:
+                # Deleted sessions drop out of the index, so each batch starts again from the oldest
+                with storage.db.read() as conn:
+                    sessions = conn.execute("""
+                        SELECT session_id, created_at, last_activity, message_count, metadata
+                        FROM session_metadata
+                        WHERE last_activity_ts < ?
+                        ORDER BY last_activity_ts
+                        LIMIT ?
+                    """, (cutoff, self.batch_size)).fetchall()
+                
+                if not sessions:
+                    break
+                
+                self._process_batch(storage, sessions)
+            
+            self.progress["phase"] = "vacuuming"
+            self._vacuum(storage)
+            
+            self.progress["phase"] = "done"
+            self.stats["runs"] += 1
+        
+        except Exception as e:
+            self.progress["phase"] = "failed"
+            self.progress["error"] = str(e)
+            self.stats["errors"] += 1
+            logger.error(f"Retention run failed: {e}")
+        
+        finally:
+            self.progress["duration_seconds"] = time.monotonic() - started
+            self.last_run = dict(self.progress)
+            self._running = False
+        
+        logger.info(f"Retention removed {self.progress['sessions_done']} sessions "
+                    f"({self.progress['conversations_deleted']} conversations) older than {days_old} days")
+        return self.last_run
+    
+    def _process_batch(self, storage, sessions: List[tuple]):
+        session_ids = [row[0] for row in sessions]
+        session_ids_json = json.dumps(session_ids)
+        
+        if self.archive:
+            self._archive(storage, sessions, session_ids_json)
+        
+        with storage.db.write() as conn:
+            deleted = conn.execute(
+                "DELETE FROM conversations WHERE session_id IN (SELECT value FROM json_each(?))",
+                (session_ids_json,)
+            ).rowcount
+            conn.execute(
+                "DELETE FROM session_metadata WHERE session_id IN (SELECT value FROM json_each(?))",
+                (session_ids_json,)
+            )
+            conn.execute(
+                "DELETE FROM session_state WHERE session_id IN (SELECT value FROM json_each(?))",
+                (session_ids_json,)
+            )
+        
+        for session_id in session_ids:
+            storage.session_log.remove(session_id)
+        
+        self.progress["sessions_done"] += len(session_ids)
+        self.progress["conversations_deleted"] += deleted
+        self.stats["sessions_deleted"] += len(session_ids)
+        self.stats["conversations_deleted"] += deleted
+        self.stats["batches"] += 1
+    
+    def _archive(self, storage, sessions: List[tuple], session_ids_json: str):
+        """Append the batch's sessions to their day's archive file, synced before anything is deleted"""
+        
+        with storage.db.read() as conn:
+            conversations = defaultdict(list)
+            cursor = conn.execute("""
+                SELECT session_id, timestamp, user_message, agent_response, agent_used,
+                       tools_used, confidence, routing_confidence, metadata
+                FROM conversations
+                WHERE session_id IN (SELECT value FROM json_each(?))
+                ORDER BY session_id, ts, id
+            """, (session_ids_json,))
+            for row in cursor:
+                conversations[row[0]].append({
+                    "timestamp": row[1],
+                    "user_message": row[2],
+                    "agent_response": row[3],
+                    "agent_used": row[4],
+                    "tools_used": json.loads(row[5]) if row[5] else [],
+                    "confidence": row[6] or 0.0,
+                    "routing_confidence": row[7] or 0.0,
+                    "metadata": json.loads(row[8]) if row[8] else {}
+                })
+            
+            states = dict(conn.execute(
+                "SELECT session_id, state FROM session_state WHERE session_id IN (SELECT value FROM json_each(?))",
+                (session_ids_json,)
+            ).fetchall())
+        
+        archived_at = datetime.now().isoformat()
+        partitions = defaultdict(list)
+        for session_id, created_at, last_activity, message_count, metadata in sessions:
+            record = {
+                "session_id": session_id,
+                "created_at": created_at,
+                "last_activity": last_activity,
+                "message_count": message_count,
+                "metadata": json.loads(metadata) if metadata else {},
+                "state": json.loads(states[session_id]) if session_id in states else None,
+                "conversations": conversations.get(session_id, []),
+                "archived_at": archived_at
+            }
+            partitions[last_activity[:10]].append(json.dumps(record, ensure_ascii=False))
+        
+        for day, lines in partitions.items():
+            archive_dir = storage.storage_path / "archive" / day[:7]
+            archive_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Each append is its own gzip member; readers see one continuous stream
+            archive_file = archive_dir / f"{day}.ndjson.gz"
+            with gzip.open(archive_file, "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            
+            with open(archive_file, "rb") as f:
+                os.fsync(f.fileno())
+        
+        self.stats["sessions_archived"] += len(sessions)
+    
+    def _vacuum(self, storage):
+        """Release free pages in steps of vacuum_pages, counting what the freelist actually lost"""
+        
+        with storage.db.read() as conn:
+            incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        
+        if not incremental:
+            if not settings.retention_convert_vacuum:
+                logger.info("Database isn't in incremental auto-vacuum mode; run the compact-storage "
+                            "command to switch it, freed pages are reused in the meantime")
+                return
+            self.enable_incremental_vacuum()
+            return
+        
+        while True:
+            with storage.db.write() as conn:
+                free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free_pages:
+                    return
+                
+                # executescript steps the pragma to completion; a single execute() frees just one page
+                conn.executescript(f"PRAGMA incremental_vacuum({min(free_pages, self.vacuum_pages)});")
+                freed = free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            
+            self.progress["pages_freed"] += freed
+            self.stats["pages_freed"] += freed
+            if freed <= 0:
+                return
+    
+    def enable_incremental_vacuum(self) -> int:
+        """
+        Switch the database to incremental auto-vacuum with a full VACUUM.
+        
+        The rewrite holds the writer connection, blocking every conversation
+        write until it finishes, so this is a maintenance step: it runs
+        from the compact-storage command, or from retention passes only
+        when retention_convert_vacuum is set. Returns the pages released.
+        """
+        
+        storage = self._storage_provider()
+        with storage.db.write() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return 0
+            
+            logger.info("Enabling incremental auto-vacuum with a full VACUUM")
+            before = conn.execute("PRAGMA page_count").fetchone()[0]
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            freed = before - conn.execute("PRAGMA page_count").fetchone()[0]
+        
+        self.progress["pages_freed"] = self.progress.get("pages_freed", 0) + freed
+        self.stats["pages_freed"] += freed
+        return freed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get totals across runs, the current run's progress and the last completed run"""
+        return {
+            **self.stats,
+            "running": self._running,
+            "retention_days": self.retention_days,
+            "progress": dict(self.progress) if self._running else None,
+            "last_run": self.last_run or None
+        }
@@ -0,0 +1,135 @@
+import math
+from bisect import bisect_left
+import re
+import unicodedata
+from typing import List, Sequence, Tuple
+
+# Same token boundaries as the FTS index's unicode61 tokenizer: runs of letters and digits
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Okapi BM25 parameters, as used by FTS5's bm25()
+K1 = 1.2
+B = 0.75
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics, like the index's remove_diacritics option"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+class Term:
+    """A folded query term, optionally matching longer words that start with it"""
+    
+    def __init__(self, text: str, prefix: bool):
+        self.text = text
+        self.prefix = prefix
+        # Bounded by token edges, so "data" doesn't match inside "metadata"; the literal comes
+        # first, with the leading edge checked by a lookbehind, so the regex engine can skip ahead to it
+        literal = re.escape(text)
+        self.pattern = re.compile(rf"{literal}(?<![^\W_]{literal})" + ("" if prefix else r"(?![^\W_])"))
+    
+    def count(self, folded: str) -> int:
+        # The substring test is far cheaper than the regex and rules out most texts
+        return len(self.pattern.findall(folded)) if self.text in folded else 0
+
+
+def parse_terms(query: str, prefix: bool) -> List[Term]:
+    """Query terms, parsed the same way as for the FTS MATCH; a trailing * asks for prefix matching"""
+    terms = []
+    for word, star in re.findall(r"(\w+)(\*?)", query):
+        terms.extend(Term(token, prefix or bool(star)) for token in TOKEN_PATTERN.findall(fold(word)))
+    return terms
+
+
+def rank(documents: Sequence[Sequence[str]], terms: List[Term],
+         weights: Sequence[float]) -> List[Tuple[int, float]]:
+    """
+    BM25-rank documents made of several text columns.
+    
+    Only documents matching every term are returned, as (index, score)
+    pairs with the best match first. Column weights scale the term
+    frequencies as in FTS5's bm25(). The statistics come from the
+    documents given, so a session's rows are ranked against each other,
+    and document length is measured in characters rather than tokens,
+    which only BM25's length ratio sees.
+    """
+    if not terms or not documents:
+        return []
+    
+    frequencies, lengths = [], []
+    for document in documents:
+        folded = [fold(text or "") for text in document]
+        frequencies.append([
+            sum(weight * term.count(text) for weight, text in zip(weights, folded))
+            for term in terms
+        ])
+        lengths.append(sum(len(text) for text in folded))
+    
+    total = len(documents)
+    average_length = (sum(lengths) / total) or 1.0
+    idf = []
+    for index in range(len(terms)):
+        containing = sum(1 for document in frequencies if document[index] > 0)
+        idf.append(max(math.log((total - containing + 0.5) / (containing + 0.5)), 1e-6))
+    
+    ranked = []
+    for index, (document, length) in enumerate(zip(frequencies, lengths)):
+        if not all(document):
+            continue
+        norm = K1 * (1 - B + B * length / average_length)
+        score = sum(weight * (frequency * (K1 + 1)) / (frequency + norm)
+                    for weight, frequency in zip(idf, document))
+        ranked.append((index, score))
+    
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return ranked
+
+
+def snippet(columns: Sequence[str], terms: List[Term], size: int, start_mark: str, end_mark: str) -> str:
+    """
+    A window of about size tokens around the matches, like FTS5's snippet().
+    
+    The column with the most matches is used, the window is placed to
+    cover as many matches as it can, matches are wrapped in the marks and
+    cut-off ends are shown with "...".
+    """
+    text, folded = max(((text or "", fold(text or "")) for text in columns),
+                       key=lambda texts: sum(term.count(texts[1]) for term in terms))
+    
+    spans = [match.span() for match in TOKEN_PATTERN.finditer(text)]
+    if not spans:
+        return ""
+    
+    if len(folded) == len(text):
+        # Match offsets in the folded text are offsets in the original, so look them up among the token starts
+        starts = [start for start, _ in spans]
+        offsets = {match.start() for term in terms if term.text in folded for match in term.pattern.finditer(folded)}
+        hits = sorted(bisect_left(starts, offset) for offset in offsets)
+    else:
+        # Folding changed the length, so fold and test each token
+        hits = [index for index, (start, end) in enumerate(spans)
+                if any(term.pattern.match(fold(text[start:end])) for term in terms)]
+    
+    first = 0
+    if hits:
+        # The window covering the most matches, centered on the ones it covers
+        begin = max(range(len(hits)), key=lambda index: bisect_left(hits, hits[index] + size) - index)
+        window = hits[begin:bisect_left(hits, hits[begin] + size)]
+        first = max(window[0] - (size - (window[-1] - window[0] + 1)) // 2, 0)
+        first = max(min(first, len(spans) - size), 0)
+    last = min(first + size, len(spans))
+    
+    hit_set = set(hits)
+    parts = ["..." if first > 0 else ""]
+    position = spans[first][0]
+    for index in range(first, last):
+        start, end = spans[index]
+        parts.append(text[position:start])
+        parts.append(f"{start_mark}{text[start:end]}{end_mark}" if index in hit_set else text[start:end])
+        position = end
+    parts.append("..." if last < len(spans) else "")
+    
+    return "".join(parts)
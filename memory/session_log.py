@@ -0,0 +1,217 @@
+import json
+import os
+import struct
+import threading
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Each index record is the byte offset of one line in the log
+_OFFSET = struct.Struct("<Q")
+
+
+class SessionLog:
+    """
+    Append-only per-session conversation logs.
+    
+    Each session has an NDJSON log (`<id>.ndjson`), one entry per line,
+    and an offset index (`<id>.idx`) holding the byte offset where every
+    line starts. Appending writes one line and one index record, so the
+    cost doesn't grow with the history. Tail reads take the last offsets
+    from the end of the index, seek the log there and parse only those
+    lines.
+    
+    The history cap is enforced by compaction: once a log holds
+    compact_factor times max_entries lines it is rewritten with just the
+    newest max_entries, so the cost is spread over many appends.
+    
+    Session files from the old whole-file JSON format are converted the
+    first time the session is touched.
+    """
+    
+    def __init__(self, sessions_path: Union[str, Path], max_entries: Optional[int] = None,
+                 compact_factor: Optional[float] = None):
+        self.sessions_path = Path(sessions_path)
+        self.max_entries = max_entries or settings.max_conversation_history
+        self.compact_factor = max(compact_factor or settings.session_log_compact_factor, 1.0)
+        
+        # Appends come from the write-behind worker thread, reads from the event loop
+        self._lock = threading.Lock()
+    
+    def _log_file(self, session_id: str) -> Path:
+        return self.sessions_path / f"{session_id}.ndjson"
+    
+    def _index_file(self, session_id: str) -> Path:
+        return self.sessions_path / f"{session_id}.idx"
+    
+    def _legacy_file(self, session_id: str) -> Path:
+        return self.sessions_path / f"{session_id}.json"
+    
+    def exists(self, session_id: str) -> bool:
+        return self._log_file(session_id).exists() or self._legacy_file(session_id).exists()
+    
+    def append(self, session_id: str, entries: List[Any]):
+        """Append conversation entries (dataclasses or dicts) to a session's log"""
+        
+        lines = [self._encode(entry if isinstance(entry, dict) else asdict(entry)) for entry in entries]
+        if not lines:
+            return
+        
+        with self._lock:
+            self._migrate_legacy(session_id)
+            log_file = self._log_file(session_id)
+            
+            with open(log_file, "a+b") as log:
+                offset = log.seek(0, os.SEEK_END)
+                if offset:
+                    # Close off a line left partial by a crash so the new ones start clean
+                    log.seek(offset - 1)
+                    if log.read(1) != b"\n":
+                        log.write(b"\n")
+                        offset += 1
+                log.write(b"".join(lines))
+            
+            offsets = []
+            for line in lines:
+                offsets.append(_OFFSET.pack(offset))
+                offset += len(line)
+            
+            index_file = self._index_file(session_id)
+            if not index_file.exists() and offsets and _OFFSET.unpack(offsets[0])[0] > 0:
+                # The log predates its index, so index the earlier lines as well
+                self._rebuild_index(session_id)
+            else:
+                with open(index_file, "ab") as index:
+                    index.write(b"".join(offsets))
+            
+            if self._count(session_id) > self.max_entries * self.compact_factor:
+                self._compact(session_id)
+    
+    def tail(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Return the last `limit` entries of a session, oldest first, up to the history cap"""
+        
+        # Lines past the cap are only waiting for compaction
+        limit = min(limit, self.max_entries)
+        if limit <= 0:
+            return []
+        
+        with self._lock:
+            self._migrate_legacy(session_id)
+            log_file = self._log_file(session_id)
+            if not log_file.exists():
+                return []
+            
+            start = self._tail_offset(session_id, limit)
+            with open(log_file, "rb") as log:
+                log.seek(start)
+                data = log.read()
+        
+        entries = []
+        for line in data.splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A line cut short by a crash mid-append
+                continue
+        
+        return entries[-limit:]
+    
+    def remove(self, session_id: str):
+        """Delete a session's log, index and any legacy JSON file"""
+        
+        with self._lock:
+            for path in (self._log_file(session_id), self._index_file(session_id), self._legacy_file(session_id)):
+                if path.exists():
+                    path.unlink()
+    
+    def _count(self, session_id: str) -> int:
+        index_file = self._index_file(session_id)
+        return index_file.stat().st_size // _OFFSET.size if index_file.exists() else 0
+    
+    def _tail_offset(self, session_id: str, limit: int) -> int:
+        """Byte offset of the line `limit` lines from the end, read from the back of the index"""
+        
+        index_file = self._index_file(session_id)
+        if not index_file.exists() or index_file.stat().st_size % _OFFSET.size:
+            self._rebuild_index(session_id)
+        
+        count = self._count(session_id)
+        if count <= limit:
+            return 0
+        
+        with open(index_file, "rb") as index:
+            index.seek(-limit * _OFFSET.size, os.SEEK_END)
+            return _OFFSET.unpack(index.read(_OFFSET.size))[0]
+    
+    def _rebuild_index(self, session_id: str):
+        """Recreate the offset index by scanning the log"""
+        
+        offsets = []
+        offset = 0
+        log_file = self._log_file(session_id)
+        if log_file.exists():
+            with open(log_file, "rb") as log:
+                for line in log:
+                    offsets.append(_OFFSET.pack(offset))
+                    offset += len(line)
+        
+        self._write_atomic(self._index_file(session_id), b"".join(offsets))
+    
+    def _compact(self, session_id: str):
+        """Rewrite the log keeping only the newest max_entries lines"""
+        
+        log_file = self._log_file(session_id)
+        with open(log_file, "rb") as log:
+            log.seek(self._tail_offset(session_id, self.max_entries))
+            lines = log.read().splitlines(keepends=True)[-self.max_entries:]
+        
+        offsets = []
+        offset = 0
+        for line in lines:
+            offsets.append(_OFFSET.pack(offset))
+            offset += len(line)
+        
+        self._write_atomic(log_file, b"".join(lines))
+        self._write_atomic(self._index_file(session_id), b"".join(offsets))
+        
+        logger.debug(f"Compacted session log {session_id} to {len(lines)} entries")
+    
+    def _migrate_legacy(self, session_id: str):
+        """Convert an old whole-file JSON session into a log and index"""
+        
+        legacy_file = self._legacy_file(session_id)
+        if not legacy_file.exists():
+            return
+        
+        if self._log_file(session_id).exists():
+            # Already converted; the JSON file is a leftover
+            legacy_file.unlink()
+            return
+        
+        try:
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                session_data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable session file {legacy_file}: {e}")
+            session_data = []
+        
+        lines = [self._encode(entry) for entry in session_data[-self.max_entries:]]
+        self._write_atomic(self._log_file(session_id), b"".join(lines))
+        self._rebuild_index(session_id)
+        legacy_file.unlink()
+    
+    @staticmethod
+    def _encode(entry: Dict[str, Any]) -> bytes:
+        return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+    
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
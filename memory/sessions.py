@@ -0,0 +1,217 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Tuple
+
+from config import settings
+from utils.logger import get_logger
+from .context import ConversationContext
+
+logger = get_logger(__name__)
+
+# Session whose conversation state agents read and write in the current task
+_current_session: ContextVar[Optional["SessionState"]] = ContextVar("current_session", default=None)
+
+
+class SessionState:
+    """Conversation contexts for one session, one per agent plus the coordinator's"""
+    
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.contexts: Dict[str, ConversationContext] = {}
+        self.last_used = time.monotonic()
+        
+        # Requests currently running against this session; active sessions are never evicted
+        self.active = 0
+    
+    def context_for(self, agent_name: str) -> ConversationContext:
+        """Get the conversation context an agent keeps for this session"""
+        context = self.contexts.get(agent_name)
+        if context is None:
+            context = ConversationContext(agent_name=agent_name)
+            self.contexts[agent_name] = context
+        return context
+    
+    def export_state(self) -> Dict[str, Dict[str, Any]]:
+        """Export every non-empty context for persistence"""
+        return {
+            name: context.export_context()
+            for name, context in self.contexts.items()
+            if context.recent_memory
+        }
+    
+    @classmethod
+    def from_state(cls, session_id: str, state: Dict[str, Dict[str, Any]]) -> "SessionState":
+        """Rebuild a session from exported context data"""
+        session = cls(session_id)
+        for name, context_data in state.items():
+            session.context_for(name).import_context(context_data)
+        return session
+
+
+def current_session() -> Optional[SessionState]:
+    """Get the session bound to the running task, if any"""
+    return _current_session.get()
+
+
+class SessionStore:
+    """
+    Keeps per-session conversation state in memory, bounded by an LRU.
+    
+    Sessions idle for longer than the idle timeout, or pushed out when the
+    store is full, are spilled to ConversationStorage and reloaded the next
+    time a message arrives for them. Sessions with a request in flight are
+    skipped by eviction, so state is never spilled while it is being written.
+    
+    Reloads and spills run SQLite in a worker thread so the event loop
+    keeps serving other sessions. A session that comes back while its
+    spill is still being written is picked up from memory, not storage.
+    """
+    
+    def __init__(self, storage_provider: Callable[[], Any], max_sessions: Optional[int] = None,
+                 idle_seconds: Optional[float] = None):
+        # Storage is resolved on first spill or reload so the store is free to construct
+        self._storage_provider = storage_provider
+        self.max_sessions = max_sessions or settings.session_cache_size
+        self.idle_seconds = idle_seconds if idle_seconds is not None else settings.session_idle_seconds
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        
+        # Evicted sessions whose state is still being written
+        self._spilling: Dict[str, SessionState] = {}
+        self._spill_lock = asyncio.Lock()
+        
+        self.stats = {
+            "hits": 0,
+            "reloads": 0,
+            "created": 0,
+            "evicted": 0
+        }
+    
+    def get(self, session_id: str) -> SessionState:
+        """Get a session's state, reloading it on the calling thread if it isn't in memory"""
+        session = self._resident(session_id)
+        if session is None:
+            session = self._from_state(session_id, self._load_state(session_id))
+        return self._touch(session)
+    
+    async def acquire(self, session_id: str) -> SessionState:
+        """Get a session's state, reloading it in a worker thread, then evict around it"""
+        session = self._resident(session_id)
+        if session is None:
+            state = await asyncio.to_thread(self._load_state, session_id)
+            # Another request for the session may have loaded it in the meantime
+            session = self._resident(session_id) or self._from_state(session_id, state)
+        
+        self._touch(session)
+        await self._evict(keep=session_id)
+        return session
+    
+    @asynccontextmanager
+    async def bind(self, session_id: str) -> AsyncIterator[SessionState]:
+        """Make a session current for agents while a request runs"""
+        session = await self.acquire(session_id)
+        session.active += 1
+        previous = _current_session.get()
+        _current_session.set(session)
+        try:
+            yield session
+        finally:
+            # set() rather than reset() so a generator closed from another context still unwinds
+            _current_session.set(previous)
+            session.active -= 1
+            session.last_used = time.monotonic()
+    
+    def _resident(self, session_id: str) -> Optional[SessionState]:
+        session = self._sessions.get(session_id) or self._spilling.get(session_id)
+        if session is not None:
+            self.stats["hits"] += 1
+        return session
+    
+    def _touch(self, session: SessionState) -> SessionState:
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        session.last_used = time.monotonic()
+        return session
+    
+    def _load_state(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        try:
+            return self._storage_provider().load_session_state(session_id)
+        except Exception as e:
+            logger.error(f"Failed to reload session {session_id}: {e}")
+            return {}
+    
+    def _from_state(self, session_id: str, state: Dict[str, Dict[str, Any]]) -> SessionState:
+        if state:
+            self.stats["reloads"] += 1
+            return SessionState.from_state(session_id, state)
+        
+        self.stats["created"] += 1
+        return SessionState(session_id)
+    
+    async def _evict(self, keep: Optional[str] = None):
+        """Spill idle sessions and the least recently used ones beyond capacity"""
+        now = time.monotonic()
+        evicted = []
+        
+        for session_id, session in list(self._sessions.items()):
+            over_capacity = len(self._sessions) > self.max_sessions
+            idle = now - session.last_used > self.idle_seconds
+            
+            # Sessions are in LRU order, so once one is neither idle nor over capacity the rest aren't
+            if not over_capacity and not idle:
+                break
+            if session.active or session_id == keep:
+                continue
+            
+            del self._sessions[session_id]
+            self._spilling[session_id] = session
+            evicted.append(session)
+            self.stats["evicted"] += 1
+        
+        if evicted:
+            await self._spill(evicted)
+    
+    async def _spill(self, sessions: List[SessionState]):
+        # Export on the loop so the worker thread never reads a context that is being written
+        states = [(session.session_id, session.export_state()) for session in sessions]
+        try:
+            # One spill at a time, so an older state never lands after a newer one
+            async with self._spill_lock:
+                await asyncio.to_thread(self._save_states, states)
+        finally:
+            for session in sessions:
+                if self._spilling.get(session.session_id) is session:
+                    del self._spilling[session.session_id]
+    
+    def _save_states(self, states: List[Tuple[str, Dict[str, Dict[str, Any]]]]):
+        for session_id, state in states:
+            if not state:
+                continue
+            try:
+                self._storage_provider().save_session_state(session_id, state)
+            except Exception as e:
+                logger.error(f"Failed to spill session {session_id}: {e}")
+    
+    def discard(self, session_id: str):
+        """Drop a session's in-memory state without spilling it"""
+        self._sessions.pop(session_id, None)
+        self._spilling.pop(session_id, None)
+    
+    async def flush(self):
+        """Spill every in-memory session, e.g. before shutdown"""
+        await self._spill(list(self._sessions.values()))
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session counts and LRU counters"""
+        return {
+            **self.stats,
+            "in_memory": len(self._sessions),
+            "spilling": len(self._spilling),
+            "active": sum(1 for session in self._sessions.values() if session.active),
+            "max_sessions": self.max_sessions
+        }
@@ -0,0 +1,111 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SQLiteConnectionManager:
+    """
+    Long-lived SQLite connections: one writer and a pool of readers.
+    
+    The database runs in WAL mode, so readers don't block the writer or
+    each other. Writes are serialized on the single writer connection and
+    committed when the block exits. Connections are opened once and keep
+    their prepared statement cache across calls instead of reconnecting,
+    re-reading the schema and re-preparing every query each time.
+    """
+    
+    def __init__(self, db_path: Union[str, Path], read_pool_size: Optional[int] = None):
+        self.db_path = str(db_path)
+        self.read_pool_size = read_pool_size or settings.sqlite_read_pool_size
+        
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        
+        # Lets the retention engine hand freed pages back with incremental VACUUM; only applies to new databases
+        self._writer.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        
+        # WAL is a property of the database file, so setting it once on the writer covers every connection
+        journal_mode = self._writer.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        if journal_mode.lower() != "wal":
+            logger.warning(f"SQLite journal mode is {journal_mode}, readers may block the writer")
+        
+        # Readers are opened on demand up to the pool size
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._all_readers: List[sqlite3.Connection] = []
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,  # Access is serialized by the write lock and the reader pool
+            timeout=settings.sqlite_busy_timeout_ms / 1000,
+            cached_statements=settings.sqlite_statement_cache
+        )
+        conn.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}")
+        conn.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size_mb * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Use the writer connection; the block is committed on success and rolled back on error"""
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+    
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a reader connection from the pool"""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            # End any implicit read transaction so the WAL can be checkpointed
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+    
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._reader_lock:
+            if self._reader_count < self.read_pool_size:
+                self._reader_count += 1
+                conn = self._connect()
+                self._all_readers.append(conn)
+                return conn
+        
+        # Pool is exhausted, so wait for a reader to come back
+        return self._readers.get()
+    
+    def close(self):
+        """Checkpoint the WAL and close every connection"""
+        with self._write_lock:
+            try:
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                logger.warning(f"WAL checkpoint failed: {e}")
+            self._writer.close()
+        
+        with self._reader_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+            self._reader_count = 0
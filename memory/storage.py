@@ -1,18 +1,34 @@
 import asyncio
 import json
 import os
+import re
+import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-import sqlite3
-import threading
-from dataclasses import dataclass, asdict
+from typing import Dict, Iterator, List, Any, Optional
+from dataclasses import dataclass
 
 from config import settings
 from utils.logger import get_logger
+from . import search
+from .sqlite_pool import SQLiteConnectionManager
+from .session_log import SessionLog
 
 logger = get_logger(__name__)
 
+# Column order matches ConversationStorage._database_row
+INSERT_CONVERSATION = """
+    INSERT INTO conversations 
+    (session_id, timestamp, ts, user_message, agent_response, 
+     agent_used, tools_used, confidence, routing_confidence, metadata)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def epoch_ms(timestamp: str) -> int:
+    """Milliseconds since the epoch for an ISO timestamp; naive times are local, like datetime.now()"""
+    return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+
 
 @dataclass
 class ConversationEntry:
@@ -29,7 +45,7 @@ class ConversationEntry:
 
 
 class ConversationStorage:
-    """Handles persistent storage of conversation data using SQLite and JSON files"""
+    """Handles persistent storage of conversation data using SQLite and per-session logs"""
     
     def __init__(self):
         self.storage_path = Path(settings.memory_storage_path)
@@ -38,14 +54,16 @@ class ConversationStorage:
         # SQLite database for structured queries
         self.db_path = self.storage_path / "conversations.db"
         
-        # JSON files for session-based storage
+        # Append-only NDJSON logs for session-based storage
         self.sessions_path = self.storage_path / "sessions"
         self.sessions_path.mkdir(exist_ok=True)
+        self.session_log = SessionLog(self.sessions_path)
         
-        # Thread lock for database operations
-        self._db_lock = threading.Lock()
+        # Long-lived writer and reader connections in WAL mode
+        self.db = SQLiteConnectionManager(self.db_path)
         
         # Initialize database
+        self.fts_enabled = False
         self._init_database()
         
         logger.info(f"Conversation storage initialized at {self.storage_path}")
@@ -54,12 +72,13 @@ class ConversationStorage:
         """Initialize SQLite database with required tables"""
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db.write() as conn:
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS conversations (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         session_id TEXT NOT NULL,
                         timestamp TEXT NOT NULL,
+                        ts INTEGER,  -- timestamp as epoch milliseconds, for sorting and ranges
                         user_message TEXT NOT NULL,
                         agent_response TEXT NOT NULL,
                         agent_used TEXT NOT NULL,
@@ -70,47 +89,362 @@ class ConversationStorage:
                     )
                 """)
                 
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_session_id 
-                    ON conversations(session_id)
-                """)
-                
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_timestamp 
-                    ON conversations(timestamp)
-                """)
-                
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS session_metadata (
                         session_id TEXT PRIMARY KEY,
                         created_at TEXT NOT NULL,
                         last_activity TEXT NOT NULL,
+                        last_activity_ts INTEGER,
                         message_count INTEGER DEFAULT 0,
                         metadata TEXT  -- JSON object
                     )
                 """)
                 
-                conn.commit()
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS session_state (
+                        session_id TEXT PRIMARY KEY,
+                        updated_at TEXT NOT NULL,
+                        state TEXT NOT NULL  -- JSON object of exported contexts by agent
+                    )
+                """)
+                
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS storage_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    )
+                """)
+                
+            self._migrate_epoch_columns()
+            self._init_usage_tables()
+            self.fts_enabled = self._init_search_index()
                 
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
     
+    def _migrate_epoch_columns(self):
+        """
+        Add the epoch columns and their indexes to databases created before them.
+        
+        conversations.ts and session_metadata.last_activity_ts hold the ISO
+        timestamps as epoch milliseconds. The composite (session_id, ts, id)
+        index serves per-session history, date ranges and keyset paging, and
+        replaces the old single-column session and timestamp indexes. Rows
+        without a value are filled in batches, one transaction each, so an
+        interrupted migration picks up where it stopped.
+        """
+        
+        with self.db.write() as conn:
+            conversation_columns = {row[1] for row in conn.execute("PRAGMA table_info(conversations)")}
+            if "ts" not in conversation_columns:
+                conn.execute("ALTER TABLE conversations ADD COLUMN ts INTEGER")
+            
+            metadata_columns = {row[1] for row in conn.execute("PRAGMA table_info(session_metadata)")}
+            if "last_activity_ts" not in metadata_columns:
+                conn.execute("ALTER TABLE session_metadata ADD COLUMN last_activity_ts INTEGER")
+            
+            conn.execute("DROP INDEX IF EXISTS idx_session_id")
+            conn.execute("DROP INDEX IF EXISTS idx_timestamp")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_conversations_session_ts 
+                ON conversations(session_id, ts, id)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_session_metadata_activity 
+                ON session_metadata(last_activity_ts)
+            """)
+        
+        batch_size = settings.storage_backfill_batch_size
+        for table, key, source, target in (
+            ("conversations", "id", "timestamp", "ts"),
+            ("session_metadata", "session_id", "last_activity", "last_activity_ts")
+        ):
+            while True:
+                with self.db.write() as conn:
+                    rows = conn.execute(
+                        f"SELECT {key}, {source} FROM {table} WHERE {target} IS NULL LIMIT ?",
+                        (batch_size,)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    
+                    updates = []
+                    for row_key, timestamp in rows:
+                        try:
+                            updates.append((epoch_ms(timestamp), row_key))
+                        except (TypeError, ValueError):
+                            # Unparseable timestamps sort first rather than blocking the migration
+                            updates.append((0, row_key))
+                    
+                    conn.executemany(f"UPDATE {table} SET {target} = ? WHERE {key} = ?", updates)
+                
+                logger.info(f"Backfilled {target} for {len(rows)} {table} rows")
+    
+    def _init_usage_tables(self):
+        """
+        Create the normalized tool table and the usage rollups.
+        
+        conversation_tools has one row per tool use. The rollup tables keep
+        running counts per session and per day (keyed on the first ten
+        characters of the ISO timestamp), so statistics are read from a few
+        indexed rows instead of scanning conversations. Triggers on
+        conversations keep all of them up to date on every insert and
+        delete. The first time the tables are created they are filled from
+        the existing rows in the same transaction.
+        """
+        
+        with self.db.write() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversation_tools'"
+            ).fetchone()
+            if exists:
+                return
+            
+            conn.execute("""
+                CREATE TABLE conversation_tools (
+                    conversation_id INTEGER NOT NULL,
+                    session_id TEXT NOT NULL,
+                    tool TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX idx_conversation_tools_conversation ON conversation_tools(conversation_id)")
+            conn.execute("CREATE INDEX idx_conversation_tools_session ON conversation_tools(session_id, tool)")
+            conn.execute("CREATE INDEX idx_conversation_tools_tool ON conversation_tools(tool)")
+            
+            conn.execute("""
+                CREATE TABLE session_agent_usage (
+                    session_id TEXT NOT NULL,
+                    agent_used TEXT NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    confidence_sum REAL NOT NULL,
+                    first_message TEXT,
+                    last_message TEXT,
+                    PRIMARY KEY (session_id, agent_used)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE session_tool_usage (
+                    session_id TEXT NOT NULL,
+                    tool TEXT NOT NULL,
+                    use_count INTEGER NOT NULL,
+                    PRIMARY KEY (session_id, tool)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE daily_agent_usage (
+                    day TEXT NOT NULL,
+                    agent_used TEXT NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    confidence_sum REAL NOT NULL,
+                    PRIMARY KEY (day, agent_used)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE daily_tool_usage (
+                    day TEXT NOT NULL,
+                    tool TEXT NOT NULL,
+                    use_count INTEGER NOT NULL,
+                    PRIMARY KEY (day, tool)
+                ) WITHOUT ROWID
+            """)
+            
+            conn.execute("""
+                CREATE TRIGGER conversations_usage_insert AFTER INSERT ON conversations BEGIN
+                    INSERT INTO conversation_tools (conversation_id, session_id, tool)
+                    SELECT new.id, new.session_id, value FROM json_each(CASE WHEN json_valid(new.tools_used) THEN new.tools_used ELSE '[]' END);
+                    
+                    INSERT INTO session_agent_usage 
+                    (session_id, agent_used, message_count, confidence_sum, first_message, last_message)
+                    VALUES (new.session_id, new.agent_used, 1, COALESCE(new.confidence, 0), new.timestamp, new.timestamp)
+                    ON CONFLICT(session_id, agent_used) DO UPDATE SET
+                        message_count = message_count + 1,
+                        confidence_sum = confidence_sum + excluded.confidence_sum,
+                        first_message = MIN(first_message, excluded.first_message),
+                        last_message = MAX(last_message, excluded.last_message);
+                    
+                    INSERT INTO daily_agent_usage (day, agent_used, message_count, confidence_sum)
+                    VALUES (substr(new.timestamp, 1, 10), new.agent_used, 1, COALESCE(new.confidence, 0))
+                    ON CONFLICT(day, agent_used) DO UPDATE SET
+                        message_count = message_count + 1,
+                        confidence_sum = confidence_sum + excluded.confidence_sum;
+                    
+                    INSERT INTO session_tool_usage (session_id, tool, use_count)
+                    SELECT new.session_id, value, COUNT(*) FROM json_each(CASE WHEN json_valid(new.tools_used) THEN new.tools_used ELSE '[]' END) 
+                    WHERE true GROUP BY value
+                    ON CONFLICT(session_id, tool) DO UPDATE SET use_count = use_count + excluded.use_count;
+                    
+                    INSERT INTO daily_tool_usage (day, tool, use_count)
+                    SELECT substr(new.timestamp, 1, 10), value, COUNT(*) FROM json_each(CASE WHEN json_valid(new.tools_used) THEN new.tools_used ELSE '[]' END) 
+                    WHERE true GROUP BY value
+                    ON CONFLICT(day, tool) DO UPDATE SET use_count = use_count + excluded.use_count;
+                END
+            """)
+            
+            conn.execute("""
+                CREATE TRIGGER conversations_usage_delete AFTER DELETE ON conversations BEGIN
+                    UPDATE session_tool_usage SET use_count = use_count - (
+                        SELECT COUNT(*) FROM conversation_tools t 
+                        WHERE t.conversation_id = old.id AND t.tool = session_tool_usage.tool
+                    )
+                    WHERE session_id = old.session_id 
+                      AND tool IN (SELECT tool FROM conversation_tools WHERE conversation_id = old.id);
+                    
+                    UPDATE daily_tool_usage SET use_count = use_count - (
+                        SELECT COUNT(*) FROM conversation_tools t 
+                        WHERE t.conversation_id = old.id AND t.tool = daily_tool_usage.tool
+                    )
+                    WHERE day = substr(old.timestamp, 1, 10) 
+                      AND tool IN (SELECT tool FROM conversation_tools WHERE conversation_id = old.id);
+                    
+                    DELETE FROM conversation_tools WHERE conversation_id = old.id;
+                    
+                    UPDATE session_agent_usage 
+                    SET message_count = message_count - 1, confidence_sum = confidence_sum - COALESCE(old.confidence, 0)
+                    WHERE session_id = old.session_id AND agent_used = old.agent_used;
+                    
+                    UPDATE daily_agent_usage 
+                    SET message_count = message_count - 1, confidence_sum = confidence_sum - COALESCE(old.confidence, 0)
+                    WHERE day = substr(old.timestamp, 1, 10) AND agent_used = old.agent_used;
+                    
+                    DELETE FROM session_agent_usage WHERE session_id = old.session_id AND message_count <= 0;
+                    DELETE FROM session_tool_usage WHERE session_id = old.session_id AND use_count <= 0;
+                    DELETE FROM daily_agent_usage WHERE day = substr(old.timestamp, 1, 10) AND message_count <= 0;
+                    DELETE FROM daily_tool_usage WHERE day = substr(old.timestamp, 1, 10) AND use_count <= 0;
+                END
+            """)
+            
+            # Fill everything from the rows already stored
+            conn.execute("""
+                INSERT INTO conversation_tools (conversation_id, session_id, tool)
+                SELECT c.id, c.session_id, j.value 
+                FROM conversations c, json_each(CASE WHEN json_valid(c.tools_used) THEN c.tools_used ELSE '[]' END) j
+            """)
+            conn.execute("""
+                INSERT INTO session_agent_usage 
+                (session_id, agent_used, message_count, confidence_sum, first_message, last_message)
+                SELECT session_id, agent_used, COUNT(*), TOTAL(confidence), MIN(timestamp), MAX(timestamp)
+                FROM conversations GROUP BY session_id, agent_used
+            """)
+            conn.execute("""
+                INSERT INTO daily_agent_usage (day, agent_used, message_count, confidence_sum)
+                SELECT substr(timestamp, 1, 10), agent_used, COUNT(*), TOTAL(confidence)
+                FROM conversations GROUP BY substr(timestamp, 1, 10), agent_used
+            """)
+            conn.execute("""
+                INSERT INTO session_tool_usage (session_id, tool, use_count)
+                SELECT session_id, tool, COUNT(*) FROM conversation_tools GROUP BY session_id, tool
+            """)
+            conn.execute("""
+                INSERT INTO daily_tool_usage (day, tool, use_count)
+                SELECT substr(c.timestamp, 1, 10), t.tool, COUNT(*)
+                FROM conversation_tools t JOIN conversations c ON c.id = t.conversation_id
+                GROUP BY substr(c.timestamp, 1, 10), t.tool
+            """)
+    
+    def _init_search_index(self) -> bool:
+        """
+        Create the FTS5 index over conversation text and backfill existing rows.
+        
+        conversations_fts is an external-content table over conversations,
+        kept in sync by triggers, so the text isn't stored twice. Rows that
+        existed before the index was created are backfilled in batches, one
+        transaction each; progress is kept in storage_meta so an interrupted
+        backfill resumes where it stopped. Returns False if this SQLite
+        build has no FTS5, in which case search falls back to LIKE.
+        """
+        
+        try:
+            with self.db.write() as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations_fts'"
+                ).fetchone()
+                
+                if not exists:
+                    conn.execute("""
+                        CREATE VIRTUAL TABLE conversations_fts USING fts5(
+                            user_message, agent_response,
+                            content='conversations', content_rowid='id',
+                            tokenize='unicode61 remove_diacritics 2',
+                            prefix='2 3'
+                        )
+                    """)
+                    
+                    conn.execute("""
+                        CREATE TRIGGER conversations_fts_insert AFTER INSERT ON conversations BEGIN
+                            INSERT INTO conversations_fts (rowid, user_message, agent_response)
+                            VALUES (new.id, new.user_message, new.agent_response);
+                        END
+                    """)
+                    
+                    conn.execute("""
+                        CREATE TRIGGER conversations_fts_delete AFTER DELETE ON conversations BEGIN
+                            INSERT INTO conversations_fts (conversations_fts, rowid, user_message, agent_response)
+                            VALUES ('delete', old.id, old.user_message, old.agent_response);
+                        END
+                    """)
+                    
+                    conn.execute("""
+                        CREATE TRIGGER conversations_fts_update AFTER UPDATE OF user_message, agent_response ON conversations BEGIN
+                            INSERT INTO conversations_fts (conversations_fts, rowid, user_message, agent_response)
+                            VALUES ('delete', old.id, old.user_message, old.agent_response);
+                            INSERT INTO conversations_fts (rowid, user_message, agent_response)
+                            VALUES (new.id, new.user_message, new.agent_response);
+                        END
+                    """)
+                    
+                    # Rows up to here predate the triggers and still need indexing
+                    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM conversations").fetchone()[0]
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO storage_meta (key, value) VALUES (?, ?)",
+                        [("fts_backfill_until", str(last_id)), ("fts_backfill_done", "0")]
+                    )
+            
+            self._backfill_search_index()
+            return True
+            
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Full-text search unavailable, falling back to LIKE: {e}")
+            return False
+    
+    def _backfill_search_index(self):
+        """Index pre-existing conversation rows in batches"""
+        
+        with self.db.read() as conn:
+            meta = dict(conn.execute(
+                "SELECT key, value FROM storage_meta WHERE key IN ('fts_backfill_until', 'fts_backfill_done')"
+            ).fetchall())
+        
+        until = int(meta.get("fts_backfill_until", 0))
+        done = int(meta.get("fts_backfill_done", 0))
+        if done >= until:
+            return
+        
+        batch_size = settings.storage_backfill_batch_size
+        logger.info(f"Backfilling full-text index for conversations {done + 1}..{until}")
+        
+        while done < until:
+            batch_end = min(done + batch_size, until)
+            with self.db.write() as conn:
+                conn.execute("""
+                    INSERT INTO conversations_fts (rowid, user_message, agent_response)
+                    SELECT id, user_message, agent_response
+                    FROM conversations 
+                    WHERE id > ? AND id <= ?
+                """, (done, batch_end))
+                conn.execute(
+                    "UPDATE storage_meta SET value = ? WHERE key = 'fts_backfill_done'",
+                    (str(batch_end),)
+                )
+            done = batch_end
+        
+        logger.info("Full-text index backfill complete")
+    
     async def store_conversation(self, conversation_entry: Dict[str, Any]):
         """Store a conversation entry"""
         
         try:
             # Convert to ConversationEntry for validation
-            entry = ConversationEntry(
-                session_id=conversation_entry["session_id"],
-                timestamp=conversation_entry["timestamp"],
-                user_message=conversation_entry["user_message"],
-                agent_response=conversation_entry["agent_response"],
-                agent_used=conversation_entry["agent_used"],
-                tools_used=conversation_entry.get("tools_used", []),
-                confidence=conversation_entry.get("confidence", 0.0),
-                routing_confidence=conversation_entry.get("routing_confidence", 0.0),
-                metadata=conversation_entry.get("metadata", {})
-            )
+            entry = self._to_entry(conversation_entry)
             
             # Store in database
             await self._store_in_database(entry)
@@ -126,59 +460,92 @@ class ConversationStorage:
         except Exception as e:
             logger.error(f"Failed to store conversation: {e}")
     
+    def store_conversation_batch(self, conversation_entries: List[Dict[str, Any]]):
+        """
+        Store many conversation entries in one group commit.
+        
+        All rows go in through a single connection and transaction, each
+        session log gets one append, and session metadata is updated once
+        per session rather than once per entry. Raises if the database
+        write fails, in which case none of the batch is committed.
+        """
+        
+        entries = [self._to_entry(conversation_entry) for conversation_entry in conversation_entries]
+        if not entries:
+            return
+        
+        sessions: Dict[str, List[ConversationEntry]] = {}
+        for entry in entries:
+            sessions.setdefault(entry.session_id, []).append(entry)
+        
+        now = datetime.now()
+        now_iso, now_ms = now.isoformat(), int(now.timestamp() * 1000)
+        
+        with self.db.write() as conn:
+            conn.executemany(INSERT_CONVERSATION, [self._database_row(entry) for entry in entries])
+            
+            for session_id, session_entries in sessions.items():
+                conn.execute("""
+                    INSERT INTO session_metadata 
+                    (session_id, created_at, last_activity, last_activity_ts, message_count)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(session_id) DO UPDATE SET
+                        last_activity = excluded.last_activity,
+                        last_activity_ts = excluded.last_activity_ts,
+                        message_count = message_count + excluded.message_count
+                """, (session_id, now_iso, now_iso, now_ms, len(session_entries)))
+        
+        for session_id, session_entries in sessions.items():
+            self._append_to_session_file(session_id, session_entries)
+        
+        logger.debug(f"Stored {len(entries)} conversation entries for {len(sessions)} sessions")
+    
+    def _to_entry(self, conversation_entry: Dict[str, Any]) -> ConversationEntry:
+        return ConversationEntry(
+            session_id=conversation_entry["session_id"],
+            timestamp=conversation_entry["timestamp"],
+            user_message=conversation_entry["user_message"],
+            agent_response=conversation_entry["agent_response"],
+            agent_used=conversation_entry["agent_used"],
+            tools_used=conversation_entry.get("tools_used", []),
+            confidence=conversation_entry.get("confidence", 0.0),
+            routing_confidence=conversation_entry.get("routing_confidence", 0.0),
+            metadata=conversation_entry.get("metadata", {})
+        )
+    
+    def _database_row(self, entry: ConversationEntry) -> tuple:
+        return (
+            entry.session_id,
+            entry.timestamp,
+            epoch_ms(entry.timestamp),
+            entry.user_message,
+            entry.agent_response,
+            entry.agent_used,
+            json.dumps(entry.tools_used),
+            entry.confidence,
+            entry.routing_confidence,
+            json.dumps(entry.metadata)
+        )
+    
     async def _store_in_database(self, entry: ConversationEntry):
         """Store entry in SQLite database"""
         
         try:
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute("""
-                        INSERT INTO conversations 
-                        (session_id, timestamp, user_message, agent_response, 
-                         agent_used, tools_used, confidence, routing_confidence, metadata)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        entry.session_id,
-                        entry.timestamp,
-                        entry.user_message,
-                        entry.agent_response,
-                        entry.agent_used,
-                        json.dumps(entry.tools_used),
-                        entry.confidence,
-                        entry.routing_confidence,
-                        json.dumps(entry.metadata)
-                    ))
-                    conn.commit()
-                    
+            with self.db.write() as conn:
+                conn.execute(INSERT_CONVERSATION, self._database_row(entry))
+                
         except Exception as e:
             logger.error(f"Database storage failed: {e}")
     
     async def _store_in_session_file(self, entry: ConversationEntry):
-        """Store entry in session-specific JSON file"""
+        """Store entry in the session's append-only log"""
+        self._append_to_session_file(entry.session_id, [entry])
+    
+    def _append_to_session_file(self, session_id: str, entries: List[ConversationEntry]):
+        """Append entries to the session's log; the history cap is applied when it compacts"""
         
         try:
-            session_file = self.sessions_path / f"{entry.session_id}.json"
-            
-            # Load existing session data
-            session_data = []
-            if session_file.exists():
-                try:
-                    with open(session_file, 'r', encoding='utf-8') as f:
-                        session_data = json.load(f)
-                except:
-                    session_data = []
-            
-            # Add new entry
-            session_data.append(asdict(entry))
-            
-            # Keep only last N entries to prevent files from growing too large
-            max_entries = settings.max_conversation_history
-            if len(session_data) > max_entries:
-                session_data = session_data[-max_entries:]
-            
-            # Save updated session data
-            with open(session_file, 'w', encoding='utf-8') as f:
-                json.dump(session_data, f, indent=2, ensure_ascii=False)
+            self.session_log.append(session_id, entries)
                 
         except Exception as e:
             logger.error(f"Session file storage failed: {e}")
@@ -187,276 +554,514 @@ class ConversationStorage:
         """Update session metadata"""
         
         try:
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    # Check if session exists
-                    cursor = conn.execute(
-                        "SELECT session_id FROM session_metadata WHERE session_id = ?",
-                        (session_id,)
-                    )
-                    
-                    now = datetime.now().isoformat()
-                    
-                    if cursor.fetchone():
-                        # Update existing session
-                        conn.execute("""
-                            UPDATE session_metadata 
-                            SET last_activity = ?, message_count = message_count + 1
-                            WHERE session_id = ?
-                        """, (now, session_id))
-                    else:
-                        # Create new session
-                        conn.execute("""
-                            INSERT INTO session_metadata 
-                            (session_id, created_at, last_activity, message_count)
-                            VALUES (?, ?, ?, 1)
-                        """, (session_id, now, now))
-                    
-                    conn.commit()
-                    
+            with self.db.write() as conn:
+                # Check if session exists
+                cursor = conn.execute(
+                    "SELECT session_id FROM session_metadata WHERE session_id = ?",
+                    (session_id,)
+                )
+                
+                now = datetime.now()
+                now_iso, now_ms = now.isoformat(), int(now.timestamp() * 1000)
+                
+                if cursor.fetchone():
+                    # Update existing session
+                    conn.execute("""
+                        UPDATE session_metadata 
+                        SET last_activity = ?, last_activity_ts = ?, message_count = message_count + 1
+                        WHERE session_id = ?
+                    """, (now_iso, now_ms, session_id))
+                else:
+                    # Create new session
+                    conn.execute("""
+                        INSERT INTO session_metadata 
+                        (session_id, created_at, last_activity, last_activity_ts, message_count)
+                        VALUES (?, ?, ?, ?, 1)
+                    """, (session_id, now_iso, now_iso, now_ms))
+                
         except Exception as e:
             logger.error(f"Session metadata update failed: {e}")
     
+    def save_session_state(self, session_id: str, state: Dict[str, Any]):
+        """Persist a session's in-memory conversation contexts so they can be reloaded later"""
+        
+        try:
+            with self.db.write() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO session_state (session_id, updated_at, state)
+                    VALUES (?, ?, ?)
+                """, (session_id, datetime.now().isoformat(), json.dumps(state, ensure_ascii=False)))
+                
+        except Exception as e:
+            logger.error(f"Session state save failed: {e}")
+    
+    def load_session_state(self, session_id: str) -> Dict[str, Any]:
+        """Load the conversation contexts saved for a session, or an empty dict"""
+        
+        try:
+            with self.db.read() as conn:
+                cursor = conn.execute(
+                    "SELECT state FROM session_state WHERE session_id = ?",
+                    (session_id,)
+                )
+                row = cursor.fetchone()
+                
+            return json.loads(row[0]) if row else {}
+            
+        except Exception as e:
+            logger.error(f"Session state load failed: {e}")
+            return {}
+    
     def get_recent_conversations(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent conversations for a session"""
         
         try:
-            # First try to get from session file (faster)
-            session_file = self.sessions_path / f"{session_id}.json"
-            
-            if session_file.exists():
+            # First try the session log, which only reads the tail (faster)
+            if self.session_log.exists(session_id):
                 try:
-                    with open(session_file, 'r', encoding='utf-8') as f:
-                        session_data = json.load(f)
-                    
-                    # Return most recent entries
-                    recent_data = session_data[-limit:] if session_data else []
+                    recent_data = self.session_log.tail(session_id, limit)
                     
                     # Convert to expected format
-                    result = []
-                    for entry in recent_data:
-                        result.append({
-                            "user": entry["user_message"],
-                            "response": entry["agent_response"],
-                            "agent_used": entry["agent_used"],
-                            "timestamp": entry["timestamp"],
-                            "tools_used": entry.get("tools_used", []),
-                            "confidence": entry.get("confidence", 0.0)
-                        })
-                    
-                    return result
+                    return [self.format_recent_entry(entry) for entry in recent_data]
                     
                 except Exception as e:
                     logger.warning(f"Failed to read session file, falling back to database: {e}")
             
             # Fallback to database
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute("""
-                        SELECT user_message, agent_response, agent_used, timestamp, 
-                               tools_used, confidence
-                        FROM conversations 
-                        WHERE session_id = ? 
-                        ORDER BY timestamp DESC 
-                        LIMIT ?
-                    """, (session_id, limit))
-                    
-                    result = []
-                    for row in cursor.fetchall():
-                        result.append({
-                            "user": row[0],
-                            "response": row[1],
-                            "agent_used": row[2],
-                            "timestamp": row[3],
-                            "tools_used": json.loads(row[4]) if row[4] else [],
-                            "confidence": row[5] or 0.0
-                        })
-                    
-                    # Reverse to get chronological order
-                    return list(reversed(result))
-                    
+            with self.db.read() as conn:
+                cursor = conn.execute("""
+                    SELECT user_message, agent_response, agent_used, timestamp, 
+                           tools_used, confidence
+                    FROM conversations 
+                    WHERE session_id = ? 
+                    ORDER BY ts DESC, id DESC 
+                    LIMIT ?
+                """, (session_id, limit))
+                
+                result = []
+                for row in cursor.fetchall():
+                    result.append({
+                        "user": row[0],
+                        "response": row[1],
+                        "agent_used": row[2],
+                        "timestamp": row[3],
+                        "tools_used": json.loads(row[4]) if row[4] else [],
+                        "confidence": row[5] or 0.0
+                    })
+                
+                # Reverse to get chronological order
+                return list(reversed(result))
+                
         except Exception as e:
             logger.error(f"Failed to get recent conversations: {e}")
             return []
     
+    @staticmethod
+    def format_recent_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a stored conversation entry the way get_recent_conversations returns it"""
+        return {
+            "user": entry["user_message"],
+            "response": entry["agent_response"],
+            "agent_used": entry["agent_used"],
+            "timestamp": entry["timestamp"],
+            "tools_used": entry.get("tools_used", []),
+            "confidence": entry.get("confidence", 0.0)
+        }
+    
     def get_conversation_by_date(self, session_id: str, start_date: str, 
                                end_date: str) -> List[Dict[str, Any]]:
         """Get conversations within a date range"""
         
         try:
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute("""
-                        SELECT user_message, agent_response, agent_used, timestamp, 
-                               tools_used, confidence, metadata
-                        FROM conversations 
-                        WHERE session_id = ? AND timestamp BETWEEN ? AND ?
-                        ORDER BY timestamp ASC
-                    """, (session_id, start_date, end_date))
-                    
-                    result = []
-                    for row in cursor.fetchall():
-                        result.append({
-                            "user_message": row[0],
-                            "agent_response": row[1],
-                            "agent_used": row[2],
-                            "timestamp": row[3],
-                            "tools_used": json.loads(row[4]) if row[4] else [],
-                            "confidence": row[5] or 0.0,
-                            "metadata": json.loads(row[6]) if row[6] else {}
-                        })
-                    
-                    return result
-                    
+            with self.db.read() as conn:
+                cursor = conn.execute("""
+                    SELECT user_message, agent_response, agent_used, timestamp, 
+                           tools_used, confidence, metadata
+                    FROM conversations 
+                    WHERE session_id = ? AND ts BETWEEN ? AND ?
+                    ORDER BY ts ASC, id ASC
+                """, (session_id, epoch_ms(start_date), epoch_ms(end_date)))
+                
+                result = []
+                for row in cursor.fetchall():
+                    result.append({
+                        "user_message": row[0],
+                        "agent_response": row[1],
+                        "agent_used": row[2],
+                        "timestamp": row[3],
+                        "tools_used": json.loads(row[4]) if row[4] else [],
+                        "confidence": row[5] or 0.0,
+                        "metadata": json.loads(row[6]) if row[6] else {}
+                    })
+                
+                return result
+                
         except Exception as e:
             logger.error(f"Failed to get conversations by date: {e}")
             return []
     
-    def search_conversations(self, session_id: str, query: str, 
-                           limit: int = 20) -> List[Dict[str, Any]]:
-        """Search conversations by content"""
+    def get_history_page(self, session_id: str, page_size: int = 20,
+                         cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one page of a session's history, newest first.
+        
+        Pages are found by keyset on the (session_id, ts, id) index rather
+        than OFFSET, so every page costs the same however far back it is.
+        Pass the returned next_cursor to get the page before this one; it is
+        None once the start of the session is reached.
+        """
         
         try:
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
+            if cursor is None:
+                keyset, params = "", (session_id, page_size)
+            else:
+                before_ts, before_id = (int(part) for part in cursor.split(":"))
+                keyset, params = "AND (ts, id) < (?, ?)", (session_id, before_ts, before_id, page_size)
+            
+            with self.db.read() as conn:
+                rows = conn.execute(f"""
+                    SELECT id, ts, user_message, agent_response, agent_used, timestamp, 
+                           tools_used, confidence
+                    FROM conversations 
+                    WHERE session_id = ? {keyset}
+                    ORDER BY ts DESC, id DESC 
+                    LIMIT ?
+                """, params).fetchall()
+            
+            entries = [
+                {
+                    "user": row[2],
+                    "response": row[3],
+                    "agent_used": row[4],
+                    "timestamp": row[5],
+                    "tools_used": json.loads(row[6]) if row[6] else [],
+                    "confidence": row[7] or 0.0
+                }
+                for row in rows
+            ]
+            
+            next_cursor = f"{rows[-1][1]}:{rows[-1][0]}" if len(rows) == page_size else None
+            return {"entries": entries, "next_cursor": next_cursor}
+            
+        except Exception as e:
+            logger.error(f"Failed to get history page: {e}")
+            return {"entries": [], "next_cursor": None}
+    
+    def iter_history(self, session_id: str, before: Optional[str] = None,
+                     page_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over a session's history from newest to oldest, one page at a time.
+        
+        before is an ISO timestamp; only entries older than it are returned.
+        Only one page is held at a time, so long sessions can be walked
+        without loading them whole.
+        """
+        
+        cursor = f"{epoch_ms(before)}:0" if before is not None else None
+        while True:
+            page = self.get_history_page(session_id, page_size, cursor)
+            yield from page["entries"]
+            
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+    
+    def search_conversations(self, session_id: Optional[str], query: str, 
+                           limit: int = 20, offset: int = 0,
+                           prefix: bool = True) -> List[Dict[str, Any]]:
+        """
+        Search conversations by content.
+        
+        Results are ranked by BM25 over the user message and the response,
+        best match first, and carry a snippet with the matching terms
+        highlighted. Every term must match; with prefix set, each term also
+        matches longer words that start with it ("late" finds "latency"),
+        and a trailing * asks for that on a single term. Use offset to page
+        through results, and a session_id of None to search every session.
+        
+        Searches across every session go through the FTS5 index. Within one
+        session, reading its rows off the (session_id, ts) index and ranking
+        them here is far cheaper than a MATCH, which visits every session's
+        matches before the session filter applies.
+        """
+        
+        if session_id is not None:
+            return self._search_session(session_id, query, limit, offset, prefix)
+        
+        if self.fts_enabled:
+            match = self._fts_query(query, prefix)
+            if not match:
+                return []
+            
+            try:
+                with self.db.read() as conn:
+                    # Matches in the user's own words count double
                     cursor = conn.execute("""
-                        SELECT user_message, agent_response, agent_used, timestamp, 
-                               tools_used, confidence
-                        FROM conversations 
-                        WHERE session_id = ? AND 
-                              (user_message LIKE ? OR agent_response LIKE ?)
-                        ORDER BY timestamp DESC 
-                        LIMIT ?
-                    """, (session_id, f"%{query}%", f"%{query}%", limit))
+                        SELECT c.session_id, c.user_message, c.agent_response, c.agent_used, c.timestamp, 
+                               c.tools_used, c.confidence,
+                               bm25(conversations_fts, 2.0, 1.0) AS score,
+                               snippet(conversations_fts, -1, ?, ?, '...', ?) AS snippet
+                        FROM conversations_fts 
+                        JOIN conversations c ON c.id = conversations_fts.rowid
+                        WHERE conversations_fts MATCH ?
+                        ORDER BY score 
+                        LIMIT ? OFFSET ?
+                    """, (settings.search_highlight_start, settings.search_highlight_end,
+                          settings.search_snippet_tokens, match, limit, offset))
                     
                     result = []
                     for row in cursor.fetchall():
                         result.append({
-                            "user_message": row[0],
-                            "agent_response": row[1],
-                            "agent_used": row[2],
-                            "timestamp": row[3],
-                            "tools_used": json.loads(row[4]) if row[4] else [],
-                            "confidence": row[5] or 0.0
+                            "session_id": row[0],
+                            "user_message": row[1],
+                            "agent_response": row[2],
+                            "agent_used": row[3],
+                            "timestamp": row[4],
+                            "tools_used": json.loads(row[5]) if row[5] else [],
+                            "confidence": row[6] or 0.0,
+                            # bm25() is lower for better matches; flip it so higher is better
+                            "score": -row[7],
+                            "snippet": row[8]
                         })
                     
                     return result
                     
+            except Exception as e:
+                logger.error(f"Failed to search conversations: {e}")
+                return []
+        
+        # Without FTS5, fall back to a substring scan, newest first
+        try:
+            with self.db.read() as conn:
+                cursor = conn.execute("""
+                    SELECT session_id, user_message, agent_response, agent_used, timestamp, 
+                           tools_used, confidence
+                    FROM conversations 
+                    WHERE user_message LIKE ? OR agent_response LIKE ?
+                    ORDER BY ts DESC 
+                    LIMIT ? OFFSET ?
+                """, (f"%{query}%", f"%{query}%", limit, offset))
+                
+                result = []
+                for row in cursor.fetchall():
+                    result.append({
+                        "session_id": row[0],
+                        "user_message": row[1],
+                        "agent_response": row[2],
+                        "agent_used": row[3],
+                        "timestamp": row[4],
+                        "tools_used": json.loads(row[5]) if row[5] else [],
+                        "confidence": row[6] or 0.0
+                    })
+                
+                return result
+                
         except Exception as e:
             logger.error(f"Failed to search conversations: {e}")
             return []
     
-    def get_session_statistics(self, session_id: str) -> Dict[str, Any]:
-        """Get statistics for a session"""
+    def _search_session(self, session_id: str, query: str, limit: int, offset: int,
+                        prefix: bool) -> List[Dict[str, Any]]:
+        """Search one session's rows, ranked and snippeted like the FTS path but against the session alone"""
+        
+        terms = search.parse_terms(query, prefix)
+        if not terms:
+            return []
         
         try:
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    # Get basic stats
-                    cursor = conn.execute("""
-                        SELECT COUNT(*) as total_messages,
-                               MIN(timestamp) as first_message,
-                               MAX(timestamp) as last_message,
-                               AVG(confidence) as avg_confidence
-                        FROM conversations 
-                        WHERE session_id = ?
-                    """, (session_id,))
-                    
-                    row = cursor.fetchone()
-                    
-                    # Get agent usage stats
-                    cursor = conn.execute("""
-                        SELECT agent_used, COUNT(*) as count
-                        FROM conversations 
-                        WHERE session_id = ?
-                        GROUP BY agent_used
-                        ORDER BY count DESC
-                    """, (session_id,))
-                    
-                    agent_usage = {row[0]: row[1] for row in cursor.fetchall()}
-                    
-                    # Get tool usage stats
-                    cursor = conn.execute("""
-                        SELECT tools_used
-                        FROM conversations 
-                        WHERE session_id = ? AND tools_used IS NOT NULL
-                    """, (session_id,))
-                    
-                    tool_usage = {}
-                    for (tools_json,) in cursor.fetchall():
-                        try:
-                            tools = json.loads(tools_json)
-                            for tool in tools:
-                                tool_usage[tool] = tool_usage.get(tool, 0) + 1
-                        except:
-                            continue
-                    
-                    return {
-                        "session_id": session_id,
-                        "total_messages": row[0] if row else 0,
-                        "first_message": row[1] if row and row[1] else None,
-                        "last_message": row[2] if row and row[2] else None,
-                        "average_confidence": row[3] if row and row[3] else 0.0,
-                        "agent_usage": agent_usage,
-                        "tool_usage": tool_usage
+            with self.db.read() as conn:
+                texts = conn.execute("""
+                    SELECT id, user_message, agent_response
+                    FROM conversations 
+                    WHERE session_id = ?
+                    ORDER BY ts DESC, id DESC
+                """, (session_id,)).fetchall()
+                
+                # Matches in the user's own words count double; equal scores keep newest first
+                ranked = search.rank([(row[1], row[2]) for row in texts], terms, (2.0, 1.0))[offset:offset + limit]
+                if not ranked:
+                    return []
+                
+                page_ids = json.dumps([texts[index][0] for index, _ in ranked])
+                rows = {row[0]: row[1:] for row in conn.execute("""
+                    SELECT id, session_id, user_message, agent_response, agent_used, timestamp, 
+                           tools_used, confidence
+                    FROM conversations 
+                    WHERE id IN (SELECT value FROM json_each(?))
+                """, (page_ids,))}
+        except Exception as e:
+            logger.error(f"Failed to search conversations: {e}")
+            return []
+        
+        result = []
+        for index, score in ranked:
+            row = rows[texts[index][0]]
+            result.append({
+                "session_id": row[0],
+                "user_message": row[1],
+                "agent_response": row[2],
+                "agent_used": row[3],
+                "timestamp": row[4],
+                "tools_used": json.loads(row[5]) if row[5] else [],
+                "confidence": row[6] or 0.0,
+                "score": score,
+                "snippet": search.snippet((row[1], row[2]), terms, settings.search_snippet_tokens,
+                                          settings.search_highlight_start, settings.search_highlight_end)
+            })
+        
+        return result
+    
+    @staticmethod
+    def _fts_query(query: str, prefix: bool) -> str:
+        """Turn free text into an FTS5 query of quoted terms, so user input can't inject FTS syntax"""
+        
+        terms = []
+        for word, star in re.findall(r"(\w+)(\*?)", query):
+            terms.append(f'"{word}"*' if prefix or star else f'"{word}"')
+        
+        return " ".join(terms)
+    
+    def get_routing_examples(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get user messages with the agent that answered them, for training the router"""
+        
+        try:
+            with self.db.read() as conn:
+                cursor = conn.execute("""
+                    SELECT user_message, agent_used, confidence, routing_confidence
+                    FROM conversations 
+                    ORDER BY id DESC 
+                    LIMIT ?
+                """, (limit if limit is not None else -1,))
+                
+                return [
+                    {
+                        "user_message": row[0],
+                        "agent_used": row[1],
+                        "confidence": row[2] or 0.0,
+                        "routing_confidence": row[3] or 0.0
                     }
-                    
+                    for row in cursor.fetchall()
+                ]
+                
+        except Exception as e:
+            logger.error(f"Failed to get routing examples: {e}")
+            return []
+    
+    def get_session_statistics(self, session_id: str) -> Dict[str, Any]:
+        """Get statistics for a session from its usage rollups"""
+        
+        try:
+            with self.db.read() as conn:
+                cursor = conn.execute("""
+                    SELECT agent_used, message_count, confidence_sum, first_message, last_message
+                    FROM session_agent_usage 
+                    WHERE session_id = ?
+                    ORDER BY message_count DESC
+                """, (session_id,))
+                
+                agent_rows = cursor.fetchall()
+                
+                cursor = conn.execute("""
+                    SELECT tool, use_count
+                    FROM session_tool_usage 
+                    WHERE session_id = ?
+                    ORDER BY use_count DESC
+                """, (session_id,))
+                
+                tool_usage = {row[0]: row[1] for row in cursor.fetchall()}
+            
+            total_messages = sum(row[1] for row in agent_rows)
+            
+            return {
+                "session_id": session_id,
+                "total_messages": total_messages,
+                "first_message": min((row[3] for row in agent_rows if row[3]), default=None),
+                "last_message": max((row[4] for row in agent_rows if row[4]), default=None),
+                "average_confidence": sum(row[2] for row in agent_rows) / total_messages if total_messages else 0.0,
+                "agent_usage": {row[0]: row[1] for row in agent_rows},
+                "tool_usage": tool_usage
+            }
+                
         except Exception as e:
             logger.error(f"Failed to get session statistics: {e}")
             return {"session_id": session_id, "error": str(e)}
     
+    def get_daily_usage(self, start_day: str, end_day: str) -> List[Dict[str, Any]]:
+        """Get message, agent and tool counts per day for days between YYYY-MM-DD dates, inclusive"""
+        
+        try:
+            with self.db.read() as conn:
+                days: Dict[str, Dict[str, Any]] = {}
+                
+                cursor = conn.execute("""
+                    SELECT day, agent_used, message_count, confidence_sum
+                    FROM daily_agent_usage 
+                    WHERE day BETWEEN ? AND ?
+                """, (start_day, end_day))
+                
+                for day, agent, count, confidence_sum in cursor.fetchall():
+                    stats = days.setdefault(day, {"day": day, "total_messages": 0, "confidence_sum": 0.0,
+                                                  "agent_usage": {}, "tool_usage": {}})
+                    stats["total_messages"] += count
+                    stats["confidence_sum"] += confidence_sum
+                    stats["agent_usage"][agent] = count
+                
+                cursor = conn.execute("""
+                    SELECT day, tool, use_count
+                    FROM daily_tool_usage 
+                    WHERE day BETWEEN ? AND ?
+                """, (start_day, end_day))
+                
+                for day, tool, count in cursor.fetchall():
+                    stats = days.setdefault(day, {"day": day, "total_messages": 0, "confidence_sum": 0.0,
+                                                  "agent_usage": {}, "tool_usage": {}})
+                    stats["tool_usage"][tool] = count
+            
+            result = []
+            for day in sorted(days):
+                stats = days[day]
+                confidence_sum = stats.pop("confidence_sum")
+                stats["average_confidence"] = confidence_sum / stats["total_messages"] if stats["total_messages"] else 0.0
+                result.append(stats)
+            
+            return result
+                
+        except Exception as e:
+            logger.error(f"Failed to get daily usage: {e}")
+            return []
+    
     def clear_session(self, session_id: str):
         """Clear all data for a session"""
         
         try:
-            # Remove session file
-            session_file = self.sessions_path / f"{session_id}.json"
-            if session_file.exists():
-                session_file.unlink()
+            # Remove session log
+            self.session_log.remove(session_id)
             
             # Remove from database
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
-                    conn.execute("DELETE FROM session_metadata WHERE session_id = ?", (session_id,))
-                    conn.commit()
+            with self.db.write() as conn:
+                conn.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM session_metadata WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
             
             logger.info(f"Cleared session {session_id}")
             
         except Exception as e:
             logger.error(f"Failed to clear session: {e}")
     
-    def cleanup_old_sessions(self, days_old: int = 30):
-        """Clean up sessions older than specified days"""
+    def cleanup_old_sessions(self, days_old: int = 30) -> Dict[str, Any]:
+        """Archive and delete sessions older than specified days, in bulk"""
         
-        try:
-            cutoff_date = (datetime.now() - timedelta(days=days_old)).isoformat()
-            
-            # Get old sessions
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute("""
-                        SELECT session_id FROM session_metadata 
-                        WHERE last_activity < ?
-                    """, (cutoff_date,))
-                    
-                    old_sessions = [row[0] for row in cursor.fetchall()]
-            
-            # Remove old sessions
-            for session_id in old_sessions:
-                self.clear_session(session_id)
-            
-            logger.info(f"Cleaned up {len(old_sessions)} old sessions")
-            
-        except Exception as e:
-            logger.error(f"Failed to cleanup old sessions: {e}")
+        from .retention import RetentionEngine
+        
+        return RetentionEngine(lambda: self).run(days_old)
     
     def export_session(self, session_id: str, format: str = "json") -> Dict[str, Any]:
         """Export session data"""
         
         try:
-            # Get all conversations for session
-            conversations = self.get_recent_conversations(session_id, limit=1000)
+            # Get all conversations for session, walking back a page at a time
+            conversations = list(self.iter_history(session_id, page_size=500))
+            conversations.reverse()
             stats = self.get_session_statistics(session_id)
             
             export_data = {
@@ -479,26 +1084,29 @@ class ConversationStorage:
         """Get list of all sessions"""
         
         try:
-            with self._db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.execute("""
-                        SELECT session_id, created_at, last_activity, message_count
-                        FROM session_metadata 
-                        ORDER BY last_activity DESC 
-                        LIMIT ?
-                    """, (limit,))
-                    
-                    sessions = []
-                    for row in cursor.fetchall():
-                        sessions.append({
-                            "session_id": row[0],
-                            "created_at": row[1],
-                            "last_activity": row[2],
-                            "message_count": row[3]
-                        })
-                    
-                    return sessions
-                    
+            with self.db.read() as conn:
+                cursor = conn.execute("""
+                    SELECT session_id, created_at, last_activity, message_count
+                    FROM session_metadata 
+                    ORDER BY last_activity DESC 
+                    LIMIT ?
+                """, (limit,))
+                
+                sessions = []
+                for row in cursor.fetchall():
+                    sessions.append({
+                        "session_id": row[0],
+                        "created_at": row[1],
+                        "last_activity": row[2],
+                        "message_count": row[3]
+                    })
+                
+                return sessions
+                
         except Exception as e:
             logger.error(f"Failed to get sessions: {e}")
             return []
+    
+    def close(self):
+        """Close the database connections"""
+        self.db.close()
@@ -0,0 +1,216 @@
+import asyncio
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DURABILITY_MODES = ("async", "batch", "sync")
+
+
+class StorageWriteError(Exception):
+    """Raised to callers waiting on a commit that failed after every retry"""
+
+
+class _Pending:
+    """A queued conversation entry, or a flush marker when entry is None"""
+    
+    __slots__ = ("entry", "future")
+    
+    def __init__(self, entry: Optional[Dict[str, Any]], future: asyncio.Future):
+        self.entry = entry
+        self.future = future
+
+
+class WriteBehindQueue:
+    """
+    Persists conversation entries in the background with group commits.
+    
+    Entries are queued and a single worker writes them through
+    ConversationStorage.store_conversation_batch in a thread, so SQLite and
+    the session files stay off the event loop and out of response latency.
+    The queue is bounded; when it is full, callers wait for room.
+    
+    Durability modes:
+        async: return immediately; the worker commits whatever is queued as
+               soon as it can
+        batch: return immediately; the worker waits until flush_every
+               entries are queued or flush_interval has passed
+        sync:  wait until the entry has been committed
+    
+    A failed commit is retried up to retry_attempts times with exponential
+    backoff. If it still fails, the entries stay uncommitted (reads keep
+    seeing them) and are written again ahead of the next batch, or after
+    retry_interval if nothing else arrives. Sync-mode callers and flushes
+    waiting on that batch get a StorageWriteError.
+    
+    Entries that haven't been committed yet are lost if the process dies,
+    except in sync mode.
+    """
+    
+    def __init__(self, storage_provider: Callable[[], Any], durability: Optional[str] = None,
+                 max_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 flush_every: Optional[int] = None, flush_interval: Optional[float] = None,
+                 retry_attempts: Optional[int] = None, retry_backoff: Optional[float] = None,
+                 retry_interval: Optional[float] = None):
+        self._storage_provider = storage_provider
+        self.durability = durability or settings.storage_durability
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown storage durability mode: {self.durability}")
+        
+        self.max_size = max_size or settings.storage_queue_size
+        self.batch_size = batch_size or settings.storage_batch_size
+        self.flush_every = flush_every or settings.storage_flush_every
+        self.flush_interval = flush_interval if flush_interval is not None else settings.storage_flush_interval_seconds
+        self.retry_attempts = max(retry_attempts or settings.storage_retry_attempts, 1)
+        self.retry_backoff = retry_backoff if retry_backoff is not None else settings.storage_retry_backoff_seconds
+        self.retry_interval = retry_interval if retry_interval is not None else settings.storage_retry_interval_seconds
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        
+        # Entries queued or being written, so reads can include them
+        self._uncommitted: List[Dict[str, Any]] = []
+        
+        # Entries from commits that failed every retry, written again ahead of the next batch
+        self._failed: List[Dict[str, Any]] = []
+        
+        self.stats = {
+            "enqueued": 0,
+            "committed": 0,
+            "batches": 0,
+            "flushes": 0,
+            "failed_attempts": 0,
+            "failed_batches": 0
+        }
+    
+    def _ensure_worker(self):
+        # The queue and worker belong to the running loop, so they are created on first use
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._worker = asyncio.create_task(self._run())
+    
+    async def put(self, entry: Dict[str, Any]):
+        """Queue an entry for storage, waiting for its commit in sync mode"""
+        self._ensure_worker()
+        
+        pending = _Pending(entry, asyncio.get_running_loop().create_future())
+        self._uncommitted.append(entry)
+        await self._queue.put(pending)
+        self.stats["enqueued"] += 1
+        
+        if self.durability == "sync":
+            await pending.future
+    
+    async def flush(self):
+        """Wait until every entry queued so far has been committed"""
+        if self._worker is None or self._worker.done():
+            return
+        
+        marker = _Pending(None, asyncio.get_running_loop().create_future())
+        await self._queue.put(marker)
+        await marker.future
+        self.stats["flushes"] += 1
+    
+    async def close(self):
+        """Flush outstanding entries and stop the worker"""
+        try:
+            await self.flush()
+        except StorageWriteError as e:
+            logger.error(f"Closing with {len(self._failed)} conversation entries not stored: {e}")
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+    
+    def uncommitted(self, session_id: str) -> List[Dict[str, Any]]:
+        """Entries for a session that are queued but not yet in storage, oldest first"""
+        return [entry for entry in self._uncommitted if entry["session_id"] == session_id]
+    
+    async def _run(self):
+        while True:
+            if self._failed:
+                # Don't wait indefinitely for new work while failed entries are outstanding
+                try:
+                    batch = [await asyncio.wait_for(self._queue.get(), self.retry_interval)]
+                except asyncio.TimeoutError:
+                    await self._commit([])
+                    continue
+            else:
+                batch = [await self._queue.get()]
+            
+            if self.durability == "batch" and batch[0].entry is not None:
+                await self._collect(batch)
+            
+            # Group whatever else is already waiting into the same commit
+            while len(batch) < self.batch_size and not self._queue.empty() and batch[-1].entry is not None:
+                batch.append(self._queue.get_nowait())
+            
+            await self._commit(batch)
+    
+    async def _collect(self, batch: List[_Pending]):
+        """Hold a batch open until flush_every entries arrive, the interval passes or a flush is requested"""
+        deadline = time.monotonic() + self.flush_interval
+        
+        while len(batch) < self.flush_every and batch[-1].entry is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+    
+    async def _commit(self, batch: List[_Pending]):
+        entries = self._failed + [pending.entry for pending in batch if pending.entry is not None]
+        error: Optional[Exception] = None
+        
+        if entries:
+            for attempt in range(self.retry_attempts):
+                try:
+                    await asyncio.to_thread(self._storage_provider().store_conversation_batch, entries)
+                    error = None
+                    break
+                except Exception as e:
+                    error = e
+                    self.stats["failed_attempts"] += 1
+                    if attempt + 1 < self.retry_attempts:
+                        delay = self.retry_backoff * 2 ** attempt
+                        logger.warning(f"Write-behind commit failed ({e}), retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+            
+            if error is None:
+                committed = set(map(id, entries))
+                self._uncommitted = [entry for entry in self._uncommitted if id(entry) not in committed]
+                self._failed = []
+                self.stats["committed"] += len(entries)
+                self.stats["batches"] += 1
+            else:
+                # Still uncommitted, so reads keep returning them; the worker tries again later
+                self._failed = entries
+                self.stats["failed_batches"] += 1
+                logger.error(f"Write-behind commit of {len(entries)} entries failed after "
+                             f"{self.retry_attempts} attempts: {error}")
+        
+        for pending in batch:
+            if pending.future.done():
+                continue
+            if error is None:
+                pending.future.set_result(None)
+            elif pending.entry is None or self.durability == "sync":
+                pending.future.set_exception(StorageWriteError(str(error)))
+            else:
+                # Nobody waits on async and batch mode entries
+                pending.future.cancel()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and commit counters"""
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "durability": self.durability,
+            "queued": len(self._uncommitted),
+            "awaiting_retry": len(self._failed),
+            "average_batch": self.stats["committed"] / batches if batches else 0.0
+        }
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, List, Awaitable, Callable, Optional
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class StepOutcome:
+    """Result of one collaboration step, or why it produced none"""
+    step_id: str
+    result: Any = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def order_steps(steps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Topologically sort plan steps by their "depends_on" lists.
+    
+    Raises ValueError for unknown dependencies, duplicate ids or cycles.
+    """
+    by_id = {}
+    for step in steps:
+        if step["id"] in by_id:
+            raise ValueError(f"Duplicate collaboration step id: {step['id']}")
+        by_id[step["id"]] = step
+    
+    ordered, visiting, done = [], set(), set()
+    
+    def visit(step_id: str):
+        if step_id in done:
+            return
+        if step_id in visiting:
+            raise ValueError(f"Collaboration plan has a cycle through step: {step_id}")
+        visiting.add(step_id)
+        for dependency in by_id[step_id].get("depends_on", []):
+            if dependency not in by_id:
+                raise ValueError(f"Step {step_id} depends on unknown step: {dependency}")
+            visit(dependency)
+        visiting.discard(step_id)
+        done.add(step_id)
+        ordered.append(by_id[step_id])
+    
+    for step in steps:
+        visit(step["id"])
+    
+    return ordered
+
+
+class PlanExecutor:
+    """
+    Runs a collaboration plan as a dependency DAG.
+    
+    Every step starts as soon as the steps it depends on have finished,
+    with at most max_concurrency steps running at once. A step that fails
+    or runs past the step timeout is recorded as an error rather than
+    raised; steps depending on it still run with the inputs that did
+    arrive, so one slow agent only costs its own contribution.
+    """
+    
+    def __init__(self, max_concurrency: Optional[int] = None, step_timeout: Optional[float] = None):
+        self.max_concurrency = max_concurrency or settings.collaboration_max_concurrency
+        self.step_timeout = step_timeout if step_timeout is not None else settings.collaboration_step_timeout_seconds
+    
+    async def run(self, steps: List[Dict[str, Any]],
+                  run_step: Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Any]]) -> Dict[str, StepOutcome]:
+        """
+        Execute the plan.
+        
+        Args:
+            steps: Plan steps, each with an "id" and optional "depends_on" list
+            run_step: Called with a step and the results of its successful dependencies
+        
+        Returns:
+            Outcome of every step by id, in plan order
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks: Dict[str, asyncio.Task] = {}
+        
+        async def execute(step: Dict[str, Any]) -> StepOutcome:
+            dependencies = [tasks[dep] for dep in step.get("depends_on", [])]
+            outcomes = await asyncio.gather(*dependencies) if dependencies else []
+            inputs = {outcome.step_id: outcome.result for outcome in outcomes if outcome.ok}
+            
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(run_step(step, inputs), self.step_timeout)
+                    return StepOutcome(step["id"], result=result, elapsed_ms=(time.perf_counter() - start) * 1000)
+                except asyncio.TimeoutError:
+                    error = f"timed out after {self.step_timeout:g}s"
+                except Exception as e:
+                    error = str(e)
+                
+                logger.warning(f"Collaboration step {step['id']} failed: {error}")
+                return StepOutcome(step["id"], error=error, elapsed_ms=(time.perf_counter() - start) * 1000)
+        
+        # Dependencies come first, so each step's inputs already have tasks when it is scheduled
+        for step in order_steps(steps):
+            tasks[step["id"]] = asyncio.create_task(execute(step))
+        
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        
+        return {step["id"]: tasks[step["id"]].result() for step in steps}
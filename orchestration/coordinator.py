@@ -2,14 +2,23 @@ import asyncio
 import json
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, AsyncGenerator
 from dataclasses import dataclass
 
 from .router import AgentRouter, RoutingDecision
+from .collaboration import PlanExecutor
+from .speculation import SpeculativeExecutor
 from memory.storage import ConversationStorage
-from memory.context import ConversationContext
+from memory.sessions import SessionStore
+from memory.write_behind import WriteBehindQueue
+from memory.retention import RetentionEngine
 from agents.base import AgentResponse
 from config import settings
+from llm import (
+    close_http_client, get_response_cache, get_rate_limiter, get_singleflight_stats, get_model_router,
+    get_request_hedger
+)
+from utils.keyword_matcher import MessageFeatures, extract_features, register_keyword_groups
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -28,6 +37,15 @@ class CoordinatorResponse:
     timestamp: datetime
 
 
+@dataclass
+class CoordinatorStreamEvent:
+    """Incremental event emitted by AgentCoordinator.process_message_stream"""
+    type: str  # "routing", "token" or "done"
+    content: str = ""
+    agent_name: Optional[str] = None
+    response: Optional[CoordinatorResponse] = None
+
+
 class AgentCoordinator:
     """
     Coordinates interactions between multiple agents and manages conversation flow.
@@ -36,20 +54,36 @@ class AgentCoordinator:
     def __init__(self, settings_instance=None):
         self.settings = settings_instance or settings
         self.router = AgentRouter()
-        self.storage = ConversationStorage()
+        self._storage = None
         
-        # Session management
+        # Session management; session_id is the default session for single-user callers like the CLI
         self.session_id = str(uuid.uuid4())
-        self.conversation_context = ConversationContext(agent_name="coordinator")
+        self.sessions = SessionStore(lambda: self.storage)
+        
+        # Conversations are written in the background so storage stays out of response latency
+        self.persistence = WriteBehindQueue(lambda: self.storage)
+        self.retention = RetentionEngine(lambda: self.storage)
         
         # Inter-agent communication
         self.agent_handoffs = {}
         self.multi_agent_tasks = {}
+        self.plan_executor = PlanExecutor()
+        self.speculator = SpeculativeExecutor()
+        
+        register_keyword_groups(self._collaboration_keyword_groups())
         
         logger.info(f"Agent Coordinator initialized with session: {self.session_id}")
     
+    @property
+    def storage(self) -> ConversationStorage:
+        # Opened on first use so commands that never touch history skip SQLite setup
+        if self._storage is None:
+            self._storage = ConversationStorage()
+        return self._storage
+    
     async def process_message(self, message: str, preferred_agent: Optional[str] = None, 
-                            context: Optional[Dict[str, Any]] = None) -> CoordinatorResponse:
+                            context: Optional[Dict[str, Any]] = None,
+                            session_id: Optional[str] = None) -> CoordinatorResponse:
         """
         Process a user message through the multi-agent system.
         
@@ -57,108 +91,218 @@ class AgentCoordinator:
             message: User message to process
             preferred_agent: Optional specific agent to use
             context: Optional additional context
+            session_id: Session the message belongs to, defaults to the coordinator's own session
             
         Returns:
             CoordinatorResponse with agent response and metadata
         """
         timestamp = datetime.now()
+        session_id = session_id or self.session_id
+        
+        async with self.sessions.bind(session_id):
+            try:
+                logger.info(f"Processing message: {message[:100]}...")
+                
+                features = extract_features(message)
+                routing_decision, agent = await self._route(message, preferred_agent, context, features)
+                
+                # Check if this requires multi-agent collaboration
+                collaboration_needed = await self._check_collaboration_need(message, context, features)
+                
+                if collaboration_needed:
+                    # Handle multi-agent collaboration
+                    response = await self._handle_collaboration(message, routing_decision, context, features)
+                else:
+                    # Single agent processing, or the top two agents at once when routing is unsure
+                    alternative = self._speculative_alternative(message, routing_decision)
+                    if alternative:
+                        response = await self.speculator.run(message, context, [agent, alternative])
+                    else:
+                        response = await agent.process_message(message, context)
+                
+                return await self._complete_interaction(
+                    message, response, routing_decision, collaboration_needed, timestamp, session_id
+                )
+                
+            except Exception as e:
+                logger.error(f"Error processing message: {e}")
+                return self._error_response(e, timestamp, session_id)
+    
+    async def process_message_stream(self, message: str, preferred_agent: Optional[str] = None,
+                                     context: Optional[Dict[str, Any]] = None,
+                                     session_id: Optional[str] = None) -> AsyncGenerator[CoordinatorStreamEvent, None]:
+        """
+        Process a user message, yielding the answer token by token.
+        
+        Yields a "routing" event once the agent is chosen, "token" events
+        while the answer is generated, and a final "done" event with the
+        complete CoordinatorResponse.
+        """
+        session_id = session_id or self.session_id
+        
+        async with self.sessions.bind(session_id):
+            async for event in self._stream_in_session(message, preferred_agent, context, session_id):
+                yield event
+    
+    async def _stream_in_session(self, message: str, preferred_agent: Optional[str],
+                                 context: Optional[Dict[str, Any]],
+                                 session_id: str) -> AsyncGenerator[CoordinatorStreamEvent, None]:
+        """Stream a message for a session that is already bound"""
+        timestamp = datetime.now()
         
         try:
-            logger.info(f"Processing message: {message[:100]}...")
-            
-            # Route message to appropriate agent
-            routing_decision = await self.router.route_message(
-                message, context, preferred_agent
-            )
+            logger.info(f"Streaming message: {message[:100]}...")
             
-            logger.info(f"Routed to {routing_decision.agent_name} agent (confidence: {routing_decision.confidence})")
+            features = extract_features(message)
+            routing_decision, agent = await self._route(message, preferred_agent, context, features)
             
-            # Get the selected agent
-            agent = self.router.get_agent(routing_decision.agent_name)
-            if not agent:
-                raise Exception(f"Agent {routing_decision.agent_name} not available")
+            yield CoordinatorStreamEvent(type="routing", agent_name=routing_decision.agent_name)
             
-            # Check if this requires multi-agent collaboration
-            collaboration_needed = await self._check_collaboration_need(message, context)
+            collaboration_needed = await self._check_collaboration_need(message, context, features)
             
             if collaboration_needed:
-                # Handle multi-agent collaboration
-                response = await self._handle_collaboration(message, routing_decision, context)
+                # Collaboration synthesizes several answers, so it arrives in one piece
+                response = await self._handle_collaboration(message, routing_decision, context, features)
+                yield CoordinatorStreamEvent(
+                    type="token", content=response.content, agent_name=response.agent_name
+                )
             else:
-                # Single agent processing
-                response = await agent.process_message(message, context)
-            
-            # Store conversation
-            await self._store_conversation(message, response, routing_decision)
-            
-            # Update conversation context
-            self.conversation_context.add_interaction(message, response.content)
-            
-            return CoordinatorResponse(
-                content=response.content,
-                agent_used=response.agent_name,
-                tools_used=response.tools_used,
-                confidence=response.confidence,
-                reasoning=response.reasoning or routing_decision.reasoning,
-                metadata={
-                    **response.metadata,
-                    "routing_decision": {
-                        "selected_agent": routing_decision.agent_name,
-                        "confidence": routing_decision.confidence,
-                        "alternatives": routing_decision.alternative_agents
-                    },
-                    "collaboration_used": collaboration_needed,
-                    "session_id": self.session_id
-                },
-                session_id=self.session_id,
-                timestamp=timestamp
+                response = None
+                async for event in agent.process_message_stream(message, context):
+                    if event.type == "token":
+                        yield CoordinatorStreamEvent(
+                            type="token", content=event.content, agent_name=agent.name
+                        )
+                    else:
+                        response = event.response
+            
+            coordinator_response = await self._complete_interaction(
+                message, response, routing_decision, collaboration_needed, timestamp, session_id
             )
             
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            
-            # Return error response
-            return CoordinatorResponse(
-                content=f"I apologize, but I encountered an error while processing your request: {str(e)}",
-                agent_used="coordinator",
-                tools_used=[],
-                confidence=0.1,
-                reasoning="Error during message processing",
-                metadata={"error": str(e)},
-                session_id=self.session_id,
-                timestamp=timestamp
-            )
+            logger.error(f"Error streaming message: {e}")
+            coordinator_response = self._error_response(e, timestamp, session_id)
+        
+        yield CoordinatorStreamEvent(
+            type="done", agent_name=coordinator_response.agent_used, response=coordinator_response
+        )
     
-    async def _check_collaboration_need(self, message: str, context: Optional[Dict]) -> bool:
-        """Check if the message requires multi-agent collaboration"""
+    async def _route(self, message: str, preferred_agent: Optional[str],
+                     context: Optional[Dict[str, Any]], features: Optional[MessageFeatures] = None):
+        """Route a message and return the decision with the selected agent"""
+        
+        # Route message to appropriate agent
+        routing_decision = await self.router.route_message(
+            message, context, preferred_agent, features
+        )
+        
+        logger.info(f"Routed to {routing_decision.agent_name} agent (confidence: {routing_decision.confidence})")
         
-        # Simple heuristics for collaboration detection
-        collaboration_indicators = [
-            "research and write", "analyze and create", "plan and implement",
-            "compare and design", "investigate and report", "study and develop"
-        ]
+        # Get the selected agent
+        agent = self.router.get_agent(routing_decision.agent_name)
+        if not agent:
+            raise Exception(f"Agent {routing_decision.agent_name} not available")
         
-        message_lower = message.lower()
+        return routing_decision, agent
+    
+    def _speculative_alternative(self, message: str, routing_decision: RoutingDecision):
+        """Get the runner-up agent to run alongside the chosen one, if speculation applies"""
+        if not self.settings.speculative_routing_enabled:
+            return None
+        
+        alternative = self.speculator.candidate(message, routing_decision)
+        return self.router.get_agent(alternative) if alternative else None
+    
+    async def _complete_interaction(self, message: str, response: AgentResponse,
+                                    routing_decision: RoutingDecision, collaboration_needed: bool,
+                                    timestamp: datetime, session_id: str) -> CoordinatorResponse:
+        """Store an answered message and build the coordinator response"""
+        
+        # Store conversation
+        await self._store_conversation(message, response, routing_decision, session_id)
+        
+        # Update conversation context
+        self.sessions.get(session_id).context_for("coordinator").add_interaction(message, response.content)
+        
+        # Learn from the outcome, weighted like the offline training data; failed answers teach nothing
+        if self.settings.learned_router_online and "error" not in response.metadata:
+            self.router.update_routing_weights(message, response.agent_name, response.confidence)
+        
+        return CoordinatorResponse(
+            content=response.content,
+            agent_used=response.agent_name,
+            tools_used=response.tools_used,
+            confidence=response.confidence,
+            reasoning=response.reasoning or routing_decision.reasoning,
+            metadata={
+                **response.metadata,
+                "routing_decision": {
+                    "selected_agent": routing_decision.agent_name,
+                    "confidence": routing_decision.confidence,
+                    "alternatives": routing_decision.alternative_agents
+                },
+                "collaboration_used": collaboration_needed,
+                "session_id": session_id
+            },
+            session_id=session_id,
+            timestamp=timestamp
+        )
+    
+    def _error_response(self, error: Exception, timestamp: datetime,
+                        session_id: Optional[str] = None) -> CoordinatorResponse:
+        return CoordinatorResponse(
+            content=f"I apologize, but I encountered an error while processing your request: {str(error)}",
+            agent_used="coordinator",
+            tools_used=[],
+            confidence=0.1,
+            reasoning="Error during message processing",
+            metadata={"error": str(error)},
+            session_id=session_id or self.session_id,
+            timestamp=timestamp
+        )
+    
+    def _collaboration_keyword_groups(self) -> Dict[str, List[str]]:
+        """Keyword groups used to detect and plan multi-agent collaboration"""
+        return {
+            # Simple heuristics for collaboration detection
+            "collaboration.indicators": [
+                "research and write", "analyze and create", "plan and implement",
+                "compare and design", "investigate and report", "study and develop"
+            ],
+            "collaboration.domains": [
+                "research", "code", "creative", "task", "plan", "write", "analyze", "implement"
+            ],
+            
+            # Agent capability mapping for secondary agents
+            "collaboration.research": ["research", "find", "information", "data", "facts", "search"],
+            "collaboration.code": ["code", "program", "implement", "development", "software"],
+            "collaboration.creative": ["create", "write", "design", "creative", "content", "idea"],
+            "collaboration.task": ["plan", "organize", "manage", "schedule", "coordinate"]
+        }
+    
+    async def _check_collaboration_need(self, message: str, context: Optional[Dict],
+                                        features: Optional[MessageFeatures] = None) -> bool:
+        """Check if the message requires multi-agent collaboration"""
+        features = features or extract_features(message)
         
         # Check for explicit collaboration requests
-        if any(indicator in message_lower for indicator in collaboration_indicators):
+        if features.any("collaboration.indicators"):
             return True
         
         # Check for multi-domain requests
-        domains = ["research", "code", "creative", "task", "plan", "write", "analyze", "implement"]
-        domain_count = sum(1 for domain in domains if domain in message_lower)
-        
-        if domain_count >= 2:
+        if features.count("collaboration.domains") >= 2:
             return True
         
         # Check message complexity (longer messages more likely to need collaboration)
-        if len(message.split()) > 50:
+        if features.word_count > 50:
             return True
         
         return False
     
     async def _handle_collaboration(self, message: str, primary_routing: RoutingDecision, 
-                                  context: Optional[Dict]) -> AgentResponse:
+                                  context: Optional[Dict],
+                                  features: Optional[MessageFeatures] = None) -> AgentResponse:
         """Handle multi-agent collaboration for complex requests"""
         
         logger.info("Initiating multi-agent collaboration")
@@ -168,7 +312,9 @@ class AgentCoordinator:
             primary_agent = self.router.get_agent(primary_routing.agent_name)
             
             # Identify secondary agents based on message content
-            secondary_agents = await self._identify_secondary_agents(message, primary_routing.agent_name)
+            secondary_agents = await self._identify_secondary_agents(
+                message, primary_routing.agent_name, features
+            )
             
             # Create collaboration plan
             collaboration_plan = await self._create_collaboration_plan(
@@ -177,24 +323,40 @@ class AgentCoordinator:
             
             logger.info(f"Collaboration plan: {collaboration_plan}")
             
-            # Execute collaboration steps
-            collaboration_results = {}
-            
-            for step in collaboration_plan.get("steps", []):
-                agent_name = step.get("agent")
-                task = step.get("task")
+            async def run_step(step: Dict[str, Any], inputs: Dict[str, AgentResponse]) -> AgentResponse:
+                agent = self.router.get_agent(step["agent"])
+                if not agent:
+                    raise Exception(f"Agent {step['agent']} not available")
                 
-                if agent_name and task:
-                    agent = self.router.get_agent(agent_name)
-                    if agent:
-                        step_result = await agent.process_message(task, context)
-                        collaboration_results[agent_name] = step_result
-                        logger.info(f"Completed step with {agent_name} agent")
-            
-            # Synthesize results
+                task = step["task"]
+                for input_id, result in inputs.items():
+                    task += f"\n\nInput from the {input_id} step:\n{result.content}"
+                
+                result = await agent.process_message(task, context)
+                logger.info(f"Completed step with {step['agent']} agent")
+                return result
+            
+            # Independent steps run concurrently; each waits only for the steps it depends on
+            outcomes = await self.plan_executor.run(collaboration_plan["steps"], run_step)
+            
+            collaboration_results = {
+                step["agent"]: outcomes[step["id"]].result
+                for step in collaboration_plan["steps"] if outcomes[step["id"]].ok
+            }
+            failed_steps = {step_id: outcome.error for step_id, outcome in outcomes.items() if not outcome.ok}
+            
+            if not collaboration_results:
+                raise Exception(f"Every collaboration step failed: {failed_steps}")
+            
+            # Synthesize whatever arrived; missing contributions are reported, not waited for
             synthesis_response = await self._synthesize_collaboration_results(
                 message, collaboration_results, primary_agent
             )
+            synthesis_response.metadata["collaboration_step_ms"] = {
+                step_id: round(outcome.elapsed_ms, 2) for step_id, outcome in outcomes.items()
+            }
+            if failed_steps:
+                synthesis_response.metadata["collaboration_failed_steps"] = failed_steps
             
             return synthesis_response
             
@@ -205,23 +367,15 @@ class AgentCoordinator:
             primary_agent = self.router.get_agent(primary_routing.agent_name)
             return await primary_agent.process_message(message, context)
     
-    async def _identify_secondary_agents(self, message: str, primary_agent: str) -> List[str]:
+    async def _identify_secondary_agents(self, message: str, primary_agent: str,
+                                         features: Optional[MessageFeatures] = None) -> List[str]:
         """Identify which secondary agents should be involved"""
-        
+        features = features or extract_features(message)
         secondary_agents = []
-        message_lower = message.lower()
-        
-        # Agent capability mapping
-        capability_keywords = {
-            "research": ["research", "find", "information", "data", "facts", "search"],
-            "code": ["code", "program", "implement", "development", "software"],
-            "creative": ["create", "write", "design", "creative", "content", "idea"],
-            "task": ["plan", "organize", "manage", "schedule", "coordinate"]
-        }
         
-        for agent_name, keywords in capability_keywords.items():
+        for agent_name in ["research", "code", "creative", "task"]:
             if agent_name != primary_agent:
-                if any(keyword in message_lower for keyword in keywords):
+                if features.any(f"collaboration.{agent_name}"):
                     secondary_agents.append(agent_name)
         
         # Limit to 2 secondary agents to avoid complexity
@@ -231,7 +385,9 @@ class AgentCoordinator:
                                        secondary_agents: List[str]) -> Dict[str, Any]:
         """Create a plan for multi-agent collaboration"""
         
-        # Simple collaboration plan based on agent types
+        # Simple collaboration plan based on agent types. Steps list the ids of
+        # the steps whose output they need in "depends_on"; none of these do,
+        # so they all run at once and only the final synthesis waits for them
         steps = []
         
         # Add secondary agent steps first (preparation)
@@ -240,39 +396,49 @@ class AgentCoordinator:
                 steps.append({
                     "agent": agent,
                     "task": f"Research background information related to: {message}",
-                    "order": i + 1
+                    "order": i + 1,
+                    "id": agent,
+                    "depends_on": []
                 })
             elif agent == "task":
                 steps.append({
                     "agent": agent,
                     "task": f"Create an implementation plan for: {message}",
-                    "order": i + 1
+                    "order": i + 1,
+                    "id": agent,
+                    "depends_on": []
                 })
             elif agent == "code":
                 steps.append({
                     "agent": agent,
                     "task": f"Analyze technical requirements for: {message}",
-                    "order": i + 1
+                    "order": i + 1,
+                    "id": agent,
+                    "depends_on": []
                 })
             elif agent == "creative":
                 steps.append({
                     "agent": agent,
                     "task": f"Generate creative concepts for: {message}",
-                    "order": i + 1
+                    "order": i + 1,
+                    "id": agent,
+                    "depends_on": []
                 })
         
         # Add primary agent step last (synthesis)
         steps.append({
             "agent": primary_agent,
             "task": f"Synthesize information and provide comprehensive response to: {message}",
-            "order": len(steps) + 1
+            "order": len(steps) + 1,
+            "id": primary_agent,
+            "depends_on": []
         })
         
         return {
             "primary_agent": primary_agent,
             "secondary_agents": secondary_agents,
             "steps": steps,
-            "collaboration_type": "sequential"
+            "collaboration_type": "parallel"
         }
     
     async def _synthesize_collaboration_results(self, original_message: str, 
@@ -342,12 +508,12 @@ class AgentCoordinator:
             )
     
     async def _store_conversation(self, message: str, response: AgentResponse, 
-                                routing_decision: RoutingDecision):
+                                routing_decision: RoutingDecision, session_id: str):
         """Store conversation in persistent storage"""
         
         try:
             conversation_entry = {
-                "session_id": self.session_id,
+                "session_id": session_id,
                 "timestamp": datetime.now().isoformat(),
                 "user_message": message,
                 "agent_response": response.content,
@@ -358,28 +524,73 @@ class AgentCoordinator:
                 "metadata": response.metadata
             }
             
-            await self.storage.store_conversation(conversation_entry)
+            await self.persistence.put(conversation_entry)
+            if self.settings.retention_enabled:
+                self.retention.ensure_scheduled()
             
         except Exception as e:
             logger.error(f"Error storing conversation: {e}")
     
-    def get_conversation_history(self, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_conversation_history(self, limit: int = 10, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get recent conversation history"""
+        session_id = session_id or self.session_id
         try:
-            return self.storage.get_recent_conversations(self.session_id, limit)
+            history = self.storage.get_recent_conversations(session_id, limit)
+            
+            # Include answers still waiting in the write-behind queue
+            pending = [ConversationStorage.format_recent_entry(entry) for entry in self.persistence.uncommitted(session_id)]
+            return (history + pending)[-limit:] if pending else history
         except Exception as e:
             logger.error(f"Error retrieving conversation history: {e}")
             return []
     
-    def clear_history(self):
-        """Clear conversation history for current session"""
+    def get_history_page(self, page_size: int = 20, cursor: Optional[str] = None,
+                         session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get a page of conversation history, newest first.
+        
+        Pass the returned next_cursor to get the older page after it. The
+        first page also includes answers still waiting in the write-behind
+        queue.
+        """
+        session_id = session_id or self.session_id
         try:
-            self.storage.clear_session(self.session_id)
-            self.conversation_context = ConversationContext(agent_name="coordinator")
-            logger.info(f"Cleared history for session {self.session_id}")
+            page = self.storage.get_history_page(session_id, page_size, cursor)
+            
+            if cursor is None:
+                pending = [ConversationStorage.format_recent_entry(entry) for entry in self.persistence.uncommitted(session_id)]
+                page["entries"] = pending[::-1] + page["entries"]
+            
+            return page
+        except Exception as e:
+            logger.error(f"Error retrieving conversation history page: {e}")
+            return {"entries": [], "next_cursor": None}
+    
+    async def clear_history(self, session_id: Optional[str] = None):
+        """Clear conversation history for a session, by default the current one"""
+        session_id = session_id or self.session_id
+        try:
+            # Queued writes would otherwise land after the delete
+            await self.persistence.flush()
+            self.storage.clear_session(session_id)
+            self.sessions.discard(session_id)
+            logger.info(f"Cleared history for session {session_id}")
         except Exception as e:
             logger.error(f"Error clearing history: {e}")
     
+    async def shutdown(self):
+        """Release shared resources such as pooled HTTP connections"""
+        await close_http_client()
+        await self.persistence.close()
+        await self.retention.close()
+        if len(self.sessions):
+            await self.sessions.flush()
+        if self._storage is not None:
+            self._storage.close()
+        if self.settings.learned_router_enabled:
+            self.router.learned_router.save()
+        logger.info(f"Agent Coordinator shut down for session: {self.session_id}")
+    
     def get_available_agents(self) -> Dict[str, Dict]:
         """Get information about all available agents"""
         return self.router.get_available_agents()
@@ -391,22 +602,40 @@ class AgentCoordinator:
     def get_system_status(self) -> Dict[str, Any]:
         """Get current system status"""
         try:
-            history = self.get_conversation_history(100)  # Get more for stats
+            # Committed counts come from the storage rollups; add what is still queued
+            stats = self.storage.get_session_statistics(self.session_id)
+            pending = self.persistence.uncommitted(self.session_id)
+            
+            agent_usage = dict(stats.get("agent_usage", {}))
+            for agent, count in self._calculate_agent_usage_stats(pending).items():
+                agent_usage[agent] = agent_usage.get(agent, 0) + count
             
             return {
                 "session_id": self.session_id,
-                "active_agents": list(self.router.agents.keys()),
-                "total_messages": len(history),
-                "memory_usage": len(self.conversation_context.get_recent_messages()),
-                "last_activity": history[0]["timestamp"] if history else None,
-                "agent_usage_stats": self._calculate_agent_usage_stats(history)
+                "active_agents": list(self.router.agent_names),
+                "total_messages": stats.get("total_messages", 0) + len(pending),
+                "memory_usage": len(self.sessions.get(self.session_id).context_for("coordinator").recent_memory),
+                "last_activity": pending[-1]["timestamp"] if pending else stats.get("last_message"),
+                "agent_usage_stats": agent_usage,
+                "tool_usage_stats": stats.get("tool_usage", {}),
+                "llm_cache": get_response_cache().get_stats(),
+                "llm_rate_limiter": get_rate_limiter().get_stats(),
+                "singleflight": get_singleflight_stats(),
+                "models": get_model_router().get_stats(),
+                "llm_hedging": get_request_hedger().get_stats(),
+                "learned_router": self.router.learned_router.get_stats(),
+                "routing_cache": self.router.get_cache_stats(),
+                "speculative_routing": self.speculator.get_stats(),
+                "sessions": self.sessions.get_stats(),
+                "persistence": self.persistence.get_stats(),
+                "retention": self.retention.get_stats()
             }
             
         except Exception as e:
             logger.error(f"Error getting system status: {e}")
             return {
                 "session_id": self.session_id,
-                "active_agents": list(self.router.agents.keys()),
+                "active_agents": list(self.router.agent_names),
                 "total_messages": 0,
                 "memory_usage": 0,
                 "error": str(e)
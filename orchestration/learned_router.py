@@ -0,0 +1,259 @@
+import importlib.util
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_+#]+")
+
+
+def tokenize(message: str) -> List[str]:
+    """Lowercase word unigrams and bigrams"""
+    words = TOKEN_PATTERN.findall(message.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def numpy_available() -> bool:
+    """Check whether the optional NumPy package is installed, without importing it"""
+    return importlib.util.find_spec("numpy") is not None
+
+
+class LearnedRouter:
+    """
+    Multinomial naive Bayes over hashed bag-of-words features.
+    
+    Tokens are hashed into a fixed number of buckets so the model size
+    doesn't grow with the vocabulary. Training examples are weighted, so
+    low-confidence answers count for less. A batch of messages is scored
+    with a single matrix multiply against the log-probability matrix.
+    Online updates are collected and applied together every save_every
+    examples, so cached routing decisions survive between them.
+    Requires NumPy (the learned-router extra); without it the router
+    stays untrained and keyword routing is used on its own. NumPy is only
+    imported once the model is trained, loaded or used, so it adds
+    nothing to startup when there is no saved model.
+    """
+    
+    def __init__(self, agents: Sequence[str], buckets: Optional[int] = None,
+                 alpha: Optional[float] = None, model_path: Optional[Path] = None):
+        self.agents = list(agents)
+        self.buckets = buckets or settings.learned_router_hash_buckets
+        self.alpha = alpha if alpha is not None else settings.learned_router_alpha
+        self.model_path = model_path or Path(settings.memory_storage_path) / "router_model.npz"
+        self.available = numpy_available()
+        
+        self.examples = 0.0
+        self.version = 0  # Bumped whenever the model changes so cached scores can be dropped
+        self._pending: List[tuple] = []  # Online examples not applied yet
+        self._log_probs = None
+        
+        # Weighted token counts per agent and weighted example counts per agent, allocated on first training
+        self._token_counts = None
+        self._class_weights = None
+    
+    @property
+    def trained(self) -> bool:
+        return self.available and self.examples >= settings.learned_router_min_examples
+    
+    def _bucket(self, token: str) -> int:
+        # crc32 is stable across runs, unlike the salted built-in hash
+        return zlib.crc32(token.encode('utf-8')) % self.buckets
+    
+    def _vectorize(self, messages: Sequence[str]):
+        """Hashed token counts, one row per message"""
+        import numpy as np
+        
+        rows, cols = [], []
+        for row, message in enumerate(messages):
+            for token in tokenize(message):
+                rows.append(row)
+                cols.append(self._bucket(token))
+        
+        matrix = np.zeros((len(messages), self.buckets), dtype=np.float64)
+        np.add.at(matrix, (rows, cols), 1.0)
+        return matrix
+    
+    def fit(self, messages: Sequence[str], agents: Sequence[str], weights: Optional[Sequence[float]] = None,
+            reset: bool = True):
+        """
+        Train on labelled messages.
+        
+        Args:
+            messages: User messages
+            agents: Agent that handled each message
+            weights: Per-example weight, e.g. the answer's confidence
+            reset: Start from an empty model instead of adding to the current one
+        """
+        if not self.available:
+            return
+        
+        import numpy as np
+        
+        was_trained = self.trained
+        if reset or self._token_counts is None:
+            if reset:
+                # Queued online examples are in storage too, so a full retrain already covers them
+                self._pending = []
+                self.examples = 0.0
+            self._token_counts = np.zeros((len(self.agents), self.buckets), dtype=np.float64)
+            self._class_weights = np.zeros(len(self.agents), dtype=np.float64)
+        
+        weights = list(weights) if weights is not None else [1.0] * len(messages)
+        known = [i for i, agent in enumerate(agents) if agent in self.agents and weights[i] > 0]
+        if not known:
+            if was_trained != self.trained:
+                self._log_probs = None
+                self.version += 1
+            return
+        
+        features = self._vectorize([messages[i] for i in known])
+        labels = np.array([self.agents.index(agents[i]) for i in known])
+        example_weights = np.array([weights[i] for i in known], dtype=np.float64)
+        
+        # Sum weighted token counts per agent: (agents x examples) @ (examples x buckets)
+        one_hot = np.zeros((len(self.agents), len(known)), dtype=np.float64)
+        one_hot[labels, np.arange(len(known))] = example_weights
+        self._token_counts += one_hot @ features
+        self._class_weights += one_hot.sum(axis=1)
+        self.examples += float(example_weights.sum())
+        
+        self._log_probs = None
+        if was_trained or self.trained:
+            # An untrained model scores nothing, so cached decisions are still valid
+            self.version += 1
+    
+    def partial_fit(self, message: str, agent: str, weight: float = 1.0):
+        """Queue one example; every few updates they are applied together and the model saved"""
+        if not self.available:
+            return
+        
+        self._pending.append((message, agent, weight))
+        if len(self._pending) >= settings.learned_router_save_every:
+            self.save()
+    
+    def _apply_pending(self):
+        if self._pending:
+            messages, agents, weights = zip(*self._pending)
+            self._pending = []
+            self.fit(messages, agents, weights, reset=False)
+    
+    def _parameters(self):
+        import numpy as np
+        
+        if self._log_probs is None:
+            smoothed = self._token_counts + self.alpha
+            self._log_probs = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+            self._log_priors = np.log((self._class_weights + 1.0) / (self._class_weights.sum() + len(self.agents)))
+        return self._log_probs, self._log_priors
+    
+    def predict_proba(self, messages: Sequence[str]):
+        """Agent probabilities for a batch of messages, shape (messages, agents)"""
+        import numpy as np
+        
+        log_probs, log_priors = self._parameters()
+        features = self._vectorize(messages)
+        
+        # Length-normalized log-likelihoods keep long messages from producing overconfident scores
+        token_totals = np.maximum(features.sum(axis=1, keepdims=True), 1.0)
+        scores = (features @ log_probs.T) / token_totals + log_priors / token_totals
+        
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+    
+    def score_batch(self, messages: Sequence[str]) -> List[Dict[str, float]]:
+        """Per-agent probabilities for each message"""
+        if not self.trained or not messages:
+            return [{} for _ in messages]
+        
+        probabilities = self.predict_proba(messages)
+        return [
+            {agent: float(row[index]) for index, agent in enumerate(self.agents)}
+            for row in probabilities
+        ]
+    
+    def score(self, message: str) -> Dict[str, float]:
+        """Per-agent probabilities for one message, empty while untrained"""
+        return self.score_batch([message])[0]
+    
+    def save(self):
+        """Apply queued online examples and persist the model next to the conversation database"""
+        if not self.available:
+            return
+        
+        self._apply_pending()
+        if self._token_counts is None:
+            return
+        
+        import numpy as np
+        
+        try:
+            np.savez(
+                self.model_path,
+                agents=np.array(self.agents),
+                token_counts=self._token_counts,
+                class_weights=self._class_weights,
+                examples=np.array(self.examples),
+                buckets=np.array(self.buckets)
+            )
+        except Exception as e:
+            logger.error(f"Failed to save router model: {e}")
+    
+    def load(self) -> bool:
+        """Load a saved model, ignoring files that don't match the current agents or bucket count"""
+        if not self.available or not self.model_path.exists():
+            return False
+        
+        import numpy as np
+        
+        try:
+            with np.load(self.model_path) as data:
+                if list(data["agents"]) != self.agents or int(data["buckets"]) != self.buckets:
+                    logger.warning("Saved router model doesn't match current agents or buckets, ignoring it")
+                    return False
+                
+                self._token_counts = data["token_counts"].astype(np.float64)
+                self._class_weights = data["class_weights"].astype(np.float64)
+                self.examples = float(data["examples"])
+            
+            self._log_probs = None
+            self.version += 1
+            logger.info(f"Loaded router model trained on {self.examples:.0f} weighted examples")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to load router model: {e}")
+            return False
+    
+    def get_stats(self) -> Dict[str, object]:
+        """Get training state and per-agent example weight"""
+        return {
+            "available": self.available,
+            "trained": self.trained,
+            "examples": round(self.examples, 2),
+            "pending_examples": len(self._pending),
+            "agent_weights": (
+                {agent: round(float(weight), 2) for agent, weight in zip(self.agents, self._class_weights)}
+                if self._class_weights is not None else {}
+            )
+        }
+    
+    def train_from_storage(self, storage) -> Dict[str, int]:
+        """Train from every stored conversation, weighting examples by answer confidence"""
+        examples = storage.get_routing_examples()
+        
+        self.fit(
+            [example["user_message"] for example in examples],
+            [example["agent_used"] for example in examples],
+            [example["confidence"] for example in examples]
+        )
+        
+        counts = {}
+        for example in examples:
+            counts[example["agent_used"]] = counts.get(example["agent_used"], 0) + 1
+        return counts
@@ -1,9 +1,16 @@
 import asyncio
+import re
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
-from agents import ResearchAgent, CodeAgent, CreativeAgent, TaskAgent
+from agents import BaseAgent, ResearchAgent, CodeAgent, CreativeAgent, TaskAgent
 from config import settings
+from utils.keyword_matcher import MessageFeatures, extract_features, register_keyword_groups
+from utils.logger import get_logger
+from .learned_router import LearnedRouter
+
+logger = get_logger(__name__)
 
 
 @dataclass
@@ -15,16 +22,33 @@ class RoutingDecision:
     alternative_agents: List[Tuple[str, float]] = None
 
 
+@dataclass
+class RoutingScores:
+    """Scores behind a routing decision, cached per normalized message"""
+    agent_scores: Dict[str, float]
+    keyword_scores: Dict[str, float]
+    learned_scores: Dict[str, float]
+    learned_version: int
+    decision: RoutingDecision
+
+
 class AgentRouter:
     """Routes user messages to the most appropriate agent"""
     
+    # Agent classes by name, built on first use
+    agent_classes = {
+        "research": ResearchAgent,
+        "code": CodeAgent,
+        "creative": CreativeAgent,
+        "task": TaskAgent
+    }
+    
     def __init__(self):
-        # Initialize all agents
-        self.agents = {
-            "research": ResearchAgent(),
-            "code": CodeAgent(),
-            "creative": CreativeAgent(),
-            "task": TaskAgent()
+        self._agents: Dict[str, BaseAgent] = {}
+        self.agent_names = list(self.agent_classes.keys())
+        self.agent_configs = {
+            name: settings.get_agent_config(agent_class.config_name)
+            for name, agent_class in self.agent_classes.items()
         }
         
         # Agent capability keywords for routing hints
@@ -51,11 +75,45 @@ class AgentRouter:
             ]
         }
         
+        # Words that pick a fallback agent when no agent is confident
+        self.fallback_keywords = {
+            "research": ["what", "how", "why", "explain"],
+            "creative": ["create", "write", "generate"],
+            "task": ["plan", "organize", "schedule"]
+        }
+        
         # Default fallback preferences
         self.fallback_order = ["research", "creative", "task", "code"]
+        
+        # Agent keyword groups are registered up front so features extracted
+        # before the agents are built still carry them
+        for name, agent_class in self.agent_classes.items():
+            register_keyword_groups(agent_class.routing_keyword_groups(self.agent_configs[name]))
+        
+        register_keyword_groups({
+            **{f"router.{name}": keywords for name, keywords in self.agent_keywords.items()},
+            **{f"router.fallback.{name}": keywords for name, keywords in self.fallback_keywords.items()}
+        })
+        
+        # Model trained on past routing outcomes, blended with the keyword scores
+        self.learned_router = LearnedRouter(self.agent_names)
+        if settings.learned_router_enabled and self.learned_router.model_path.exists():
+            self.learned_router.load()
+        
+        # LRU of routing scores and decisions by normalized message
+        self._routing_cache: "OrderedDict[str, RoutingScores]" = OrderedDict()
+        self.cache_stats = {"hits": 0, "misses": 0, "rescored": 0}
+    
+    @property
+    def agents(self) -> Dict[str, BaseAgent]:
+        """All agents, building any that haven't been used yet"""
+        for agent_name in self.agent_names:
+            self.get_agent(agent_name)
+        return self._agents
     
     async def route_message(self, message: str, context: Optional[Dict] = None, 
-                          preferred_agent: Optional[str] = None) -> RoutingDecision:
+                          preferred_agent: Optional[str] = None,
+                          features: Optional[MessageFeatures] = None) -> RoutingDecision:
         """
         Route a message to the most appropriate agent.
         
@@ -63,45 +121,124 @@ class AgentRouter:
             message: User message to route
             context: Optional context information
             preferred_agent: Optional specific agent preference
+            features: Keyword features of the message, extracted here if not given
             
         Returns:
             RoutingDecision with selected agent and confidence
         """
         
         # If a specific agent is preferred and available, use it
-        if preferred_agent and preferred_agent in self.agents:
+        if preferred_agent and preferred_agent in self.agent_classes:
             return RoutingDecision(
                 agent_name=preferred_agent,
                 confidence=1.0,
                 reasoning=f"User explicitly requested {preferred_agent} agent"
             )
         
-        # Get confidence scores from all agents
-        agent_scores = {}
-        for agent_name, agent in self.agents.items():
-            try:
-                score = agent.can_handle(message, context)
-                agent_scores[agent_name] = score
-            except Exception as e:
-                print(f"Error getting score from {agent_name}: {e}")
-                agent_scores[agent_name] = 0.0
+        return self._route_batch([message], context, [features])[0]
+    
+    async def route_messages(self, messages: List[str], context: Optional[Dict] = None) -> List[RoutingDecision]:
+        """
+        Route many messages at once.
         
-        # Add keyword-based scoring
-        keyword_scores = self._calculate_keyword_scores(message)
+        Repeated messages are normalized and scored once, cached decisions
+        are reused, and the learned model scores all remaining messages in
+        a single batch.
+        """
+        return self._route_batch(messages, context)
+    
+    def _normalize_message(self, message: str) -> str:
+        """Cache key under which near-identical messages share a decision"""
+        # Case is kept because the code agent's patterns are case sensitive,
+        # and context is left out because no scorer reads it
+        return re.sub(r"\s+", " ", message).strip().rstrip(".!?")
+    
+    def _route_batch(self, messages: List[str], context: Optional[Dict] = None,
+                     features_list: Optional[List[Optional[MessageFeatures]]] = None) -> List[RoutingDecision]:
+        return [replace(scores.decision) for scores in self._score_batch(messages, context, features_list)]
+    
+    def _score_batch(self, messages: List[str], context: Optional[Dict] = None,
+                     features_list: Optional[List[Optional[MessageFeatures]]] = None) -> List[RoutingScores]:
+        """Routing scores for each message, from the cache where they are still current"""
+        version = self.learned_router.version
+        results: List[Optional[RoutingScores]] = [None] * len(messages)
+        
+        # Group cache misses by normalized message so each is scored once
+        misses: Dict[str, List[int]] = {}
+        for index, message in enumerate(messages):
+            key = self._normalize_message(message)
+            cached = self._routing_cache.get(key)
+            
+            if cached is not None and cached.learned_version == version:
+                self._routing_cache.move_to_end(key)
+                self.cache_stats["hits"] += 1
+                results[index] = cached
+            else:
+                self.cache_stats["misses"] += 1
+                misses.setdefault(key, []).append(index)
+        
+        if misses:
+            firsts = [indices[0] for indices in misses.values()]
+            learned = self._learned_scores([messages[index] for index in firsts])
+            
+            for (key, indices), first, learned_scores in zip(misses.items(), firsts, learned):
+                features = features_list[first] if features_list and features_list[first] else None
+                scores = self._score_message(messages[first], context, features, learned_scores,
+                                             version, self._routing_cache.get(key))
+                self._cache_scores(key, scores)
+                
+                for index in indices:
+                    results[index] = scores
+        
+        return results
+    
+    def _cache_scores(self, key: str, scores: RoutingScores):
+        self._routing_cache[key] = scores
+        self._routing_cache.move_to_end(key)
+        while len(self._routing_cache) > settings.routing_cache_size:
+            self._routing_cache.popitem(last=False)
+    
+    def _score_message(self, message: str, context: Optional[Dict], features: Optional[MessageFeatures],
+                       learned_scores: Dict[str, float], version: int,
+                       stale: Optional[RoutingScores] = None) -> RoutingScores:
+        """Score a message for every agent and turn the scores into a decision"""
+        
+        # One keyword pass over the message feeds every scorer
+        features = features or extract_features(message)
+        
+        if stale is not None:
+            # Only the learned model changed, so the keyword scores still hold
+            agent_scores, keyword_scores = stale.agent_scores, stale.keyword_scores
+            self.cache_stats["rescored"] += 1
+        else:
+            # Get confidence scores for all agents
+            agent_scores = {}
+            for agent_name in self.agent_names:
+                try:
+                    score = self._agent_score(agent_name, message, context, features)
+                    agent_scores[agent_name] = score
+                except Exception as e:
+                    logger.warning(f"Error getting score from {agent_name}: {e}")
+                    agent_scores[agent_name] = 0.0
+            
+            # Add keyword-based scoring
+            keyword_scores = self._calculate_keyword_scores(message, features)
         
         # Combine scores (70% agent confidence, 30% keyword matching)
         combined_scores = {}
-        for agent_name in self.agents.keys():
+        for agent_name in self.agent_names:
             agent_score = agent_scores.get(agent_name, 0.0)
             keyword_score = keyword_scores.get(agent_name, 0.0)
             combined_scores[agent_name] = (agent_score * 0.7) + (keyword_score * 0.3)
         
+        combined_scores = self._blend_learned_scores(combined_scores, learned_scores)
+        
         # Sort by confidence score
         sorted_agents = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
         
         if not sorted_agents or sorted_agents[0][1] < 0.1:
             # No agent has confidence, use fallback
-            selected_agent = self._get_fallback_agent(message)
+            selected_agent = self._get_fallback_agent(message, features)
             confidence = 0.5
             reasoning = f"No agent showed strong confidence, using fallback: {selected_agent}"
         else:
@@ -112,70 +249,116 @@ class AgentRouter:
         # Prepare alternative agents
         alternatives = [(name, score) for name, score in sorted_agents[1:3] if score > 0.1]
         
-        return RoutingDecision(
-            agent_name=selected_agent,
-            confidence=confidence,
-            reasoning=reasoning,
-            alternative_agents=alternatives
+        return RoutingScores(
+            agent_scores=agent_scores,
+            keyword_scores=keyword_scores,
+            learned_scores=learned_scores,
+            learned_version=version,
+            decision=RoutingDecision(
+                agent_name=selected_agent,
+                confidence=confidence,
+                reasoning=reasoning,
+                alternative_agents=alternatives
+            )
         )
     
-    def _calculate_keyword_scores(self, message: str) -> Dict[str, float]:
+    def _agent_score(self, agent_name: str, message: str, context: Optional[Dict],
+                     features: MessageFeatures) -> float:
+        """An agent's confidence for the message, scored from its class unless it needs an instance"""
+        agent_class = self.agent_classes[agent_name]
+        if agent_class.scores_without_instance():
+            return agent_class.routing_score(message, context, features, self.agent_configs[agent_name])
+        return self.get_agent(agent_name).can_handle(message, context, features)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get routing cache counters"""
+        lookups = self.cache_stats["hits"] + self.cache_stats["misses"]
+        return {
+            **self.cache_stats,
+            "size": len(self._routing_cache),
+            "hit_rate": self.cache_stats["hits"] / lookups if lookups else 0.0
+        }
+    
+    def _calculate_keyword_scores(self, message: str,
+                                  features: Optional[MessageFeatures] = None) -> Dict[str, float]:
         """Calculate keyword-based routing scores"""
-        message_lower = message.lower()
+        features = features or extract_features(message)
         scores = {}
         
-        for agent_name, keywords in self.agent_keywords.items():
-            score = 0.0
-            for keyword in keywords:
-                if keyword in message_lower:
-                    score += 0.1
-            
+        for agent_name in self.agent_keywords:
             # Normalize score (max 1.0)
-            scores[agent_name] = min(score, 1.0)
+            scores[agent_name] = min(features.count(f"router.{agent_name}") * 0.1, 1.0)
         
         return scores
     
-    def _get_fallback_agent(self, message: str) -> str:
+    def _learned_scores(self, messages: List[str]) -> List[Dict[str, float]]:
+        """Learned-model probabilities for a batch of messages, empty while untrained"""
+        if not settings.learned_router_enabled:
+            return [{} for _ in messages]
+        return self.learned_router.score_batch(messages)
+    
+    def _blend_learned_scores(self, combined_scores: Dict[str, float],
+                              learned_scores: Dict[str, float]) -> Dict[str, float]:
+        """Mix the learned model's probabilities into the hand-tuned scores"""
+        if not learned_scores:
+            return combined_scores
+        
+        weight = settings.learned_router_weight
+        return {
+            agent_name: score * (1 - weight) + learned_scores.get(agent_name, 0.0) * weight
+            for agent_name, score in combined_scores.items()
+        }
+    
+    def _get_fallback_agent(self, message: str, features: Optional[MessageFeatures] = None) -> str:
         """Get fallback agent when no clear routing decision can be made"""
-        message_lower = message.lower()
-        
-        # Simple heuristics for fallback
-        if any(word in message_lower for word in ["what", "how", "why", "explain"]):
-            return "research"
-        elif any(word in message_lower for word in ["create", "write", "generate"]):
-            return "creative"
-        elif any(word in message_lower for word in ["plan", "organize", "schedule"]):
-            return "task"
-        else:
-            return self.fallback_order[0]  # Default to research
+        features = features or extract_features(message)
+        
+        # Simple heuristics for fallback, checked in order
+        for agent_name in self.fallback_keywords:
+            if features.any(f"router.fallback.{agent_name}"):
+                return agent_name
+        
+        return self.fallback_order[0]  # Default to research
     
     def get_agent(self, agent_name: str):
-        """Get agent instance by name"""
-        return self.agents.get(agent_name)
+        """Get agent instance by name, building it on first use"""
+        agent = self._agents.get(agent_name)
+        if agent is None and agent_name in self.agent_classes:
+            agent = self._agents[agent_name] = self.agent_classes[agent_name]()
+            logger.debug(f"Built {agent_name} agent")
+        return agent
     
-    def get_available_agents(self) -> Dict[str, Dict]:
-        """Get information about all available agents"""
+    @classmethod
+    def get_available_agents(cls) -> Dict[str, Dict]:
+        """Get information about all available agents without building them"""
         agent_info = {}
-        for name, agent in self.agents.items():
-            agent_info[name] = agent.get_info()
+        for name, agent_class in cls.agent_classes.items():
+            agent_info[name] = agent_class.describe()
         return agent_info
     
     def has_agent(self, agent_name: str) -> bool:
         """Check if an agent exists"""
-        return agent_name in self.agents
+        return agent_name in self.agent_classes
     
-    async def analyze_routing_patterns(self, conversation_history: List[Dict]) -> Dict:
-        """Analyze routing patterns from conversation history"""
-        if not conversation_history:
-            return {"analysis": "No conversation history available"}
+    async def analyze_routing_patterns(self, conversation_history: Optional[List[Dict]] = None,
+                                       agent_usage: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Analyze routing patterns from conversation history.
         
-        # Simple analysis of which agents were used
-        agent_usage = {}
-        for entry in conversation_history:
-            agent_used = entry.get("agent_used", "unknown")
-            agent_usage[agent_used] = agent_usage.get(agent_used, 0) + 1
+        Pass agent_usage, such as the agent_usage of
+        ConversationStorage.get_session_statistics, to use counts that are
+        already aggregated instead of counting a history list.
+        """
+        if agent_usage is None:
+            # Simple analysis of which agents were used
+            agent_usage = {}
+            for entry in conversation_history or []:
+                agent_used = entry.get("agent_used", "unknown")
+                agent_usage[agent_used] = agent_usage.get(agent_used, 0) + 1
         
-        total_messages = len(conversation_history)
+        total_messages = sum(agent_usage.values())
+        if not total_messages:
+            return {"analysis": "No conversation history available"}
         usage_percentages = {
             agent: (count / total_messages) * 100 
             for agent, count in agent_usage.items()
@@ -191,7 +374,7 @@ class AgentRouter:
             "usage_percentages": usage_percentages,
             "most_used_agent": most_used[0],
             "least_used_agent": least_used[0],
-            "routing_diversity": len(agent_usage) / len(self.agents) * 100
+            "routing_diversity": len(agent_usage) / len(self.agent_names) * 100
         }
     
     async def suggest_better_routing(self, message: str, current_agent: str, 
@@ -217,45 +400,42 @@ class AgentRouter:
     
     def update_routing_weights(self, message: str, chosen_agent: str, 
                              user_satisfaction: float):
-        """Update routing weights based on user satisfaction (future enhancement)"""
-        # This would be implemented to learn from user feedback
-        # For now, it's a placeholder for future machine learning integration
-        pass
+        """Teach the learned router that chosen_agent suited this message, weighted by satisfaction"""
+        if not settings.learned_router_enabled or user_satisfaction <= 0:
+            return
+        
+        self.learned_router.partial_fit(message, chosen_agent, min(user_satisfaction, 1.0))
+    
+    def train_learned_router(self, storage) -> Dict[str, int]:
+        """Retrain the learned router from stored conversations and save it"""
+        counts = self.learned_router.train_from_storage(storage)
+        self.learned_router.save()
+        
+        logger.info(f"Trained router model on {sum(counts.values())} conversations")
+        return counts
     
     def get_routing_explanation(self, message: str) -> Dict[str, Any]:
         """Get detailed explanation of routing decision"""
         
-        # Get scores from all agents
-        agent_scores = {}
-        explanations = {}
+        # Reuse the scores cached when the message was routed
+        scores = self._score_batch([message])[0]
+        agent_scores = dict(scores.agent_scores)
         
-        for agent_name, agent in self.agents.items():
-            try:
-                score = agent.can_handle(message)
-                agent_scores[agent_name] = score
-                
-                # Generate explanation based on agent capabilities
-                capabilities = agent.capabilities
-                explanations[agent_name] = {
-                    "score": score,
-                    "capabilities": capabilities,
-                    "reasoning": f"Score based on {len(capabilities)} relevant capabilities"
-                }
-                
-            except Exception as e:
-                agent_scores[agent_name] = 0.0
-                explanations[agent_name] = {
-                    "score": 0.0,
-                    "error": str(e)
-                }
-        
-        # Add keyword analysis
-        keyword_scores = self._calculate_keyword_scores(message)
+        explanations = {}
+        for agent_name, config in self.agent_configs.items():
+            # Generate explanation based on agent capabilities
+            capabilities = config.capabilities
+            explanations[agent_name] = {
+                "score": agent_scores.get(agent_name, 0.0),
+                "capabilities": capabilities,
+                "reasoning": f"Score based on {len(capabilities)} relevant capabilities"
+            }
         
         return {
             "message": message,
             "agent_scores": agent_scores,
-            "keyword_scores": keyword_scores,
+            "keyword_scores": dict(scores.keyword_scores),
+            "learned_scores": dict(scores.learned_scores),
             "detailed_explanations": explanations,
             "recommended_agent": max(agent_scores.items(), key=lambda x: x[1])[0] if agent_scores else "research"
         }
@@ -0,0 +1,172 @@
+import asyncio
+import re
+from typing import Dict, Any, List, Optional
+
+from agents.base import AgentResponse, BaseAgent
+from agents.prompt_builder import estimate_tokens
+from config import settings
+from utils.logger import get_logger
+from .router import RoutingDecision
+
+logger = get_logger(__name__)
+
+WORD_PATTERN = re.compile(r"[a-z0-9_+#]+")
+
+# Openings of answers that decline rather than answer
+REFUSAL_PREFIXES = (
+    "i apologize", "i'm sorry", "i am sorry", "sorry,", "i can't", "i cannot", "i'm unable", "i am unable"
+)
+
+
+class SpeculativeExecutor:
+    """
+    Runs the top two routing candidates side by side when routing is unsure.
+    
+    A message is speculated on when the chosen agent's confidence is low or
+    the runner-up scored within a small margin of it. Both agents answer
+    concurrently without touching their conversation context; the first
+    acceptable answer wins, the other agent is cancelled, and only the
+    winner's exchange is recorded. An answer is acceptable when it isn't
+    an error or a refusal and covers enough of the message's content
+    words. The second agent's estimated token cost must fit a
+    per-request budget, and speculation is capped at a fraction of all
+    requests so ambiguous traffic can't double the LLM bill.
+    """
+    
+    def __init__(self, confidence_threshold: Optional[float] = None, margin: Optional[float] = None,
+                 max_extra_tokens: Optional[int] = None, max_rate: Optional[float] = None,
+                 min_relevance: Optional[float] = None):
+        self.confidence_threshold = (confidence_threshold if confidence_threshold is not None
+                                     else settings.speculative_confidence_threshold)
+        self.margin = margin if margin is not None else settings.speculative_margin
+        self.max_extra_tokens = max_extra_tokens or settings.speculative_max_extra_tokens
+        self.max_rate = max_rate if max_rate is not None else settings.speculative_max_rate
+        self.min_relevance = min_relevance if min_relevance is not None else settings.speculative_min_relevance
+        
+        self.stats = {
+            "requests": 0,
+            "speculated": 0,
+            "primary_wins": 0,
+            "alternative_wins": 0,
+            "budget_skipped": 0
+        }
+    
+    def candidate(self, message: str, decision: RoutingDecision) -> Optional[str]:
+        """
+        Decide whether to speculate on a message.
+        
+        Returns:
+            The alternative agent to run next to the chosen one, or None
+        """
+        self.stats["requests"] += 1
+        
+        alternatives = decision.alternative_agents or []
+        if not alternatives:
+            return None
+        
+        alternative, alternative_score = alternatives[0]
+        low_confidence = decision.confidence < self.confidence_threshold
+        close_call = decision.confidence - alternative_score <= self.margin
+        if not (low_confidence or close_call):
+            return None
+        
+        if not self._within_budget(message, alternative):
+            self.stats["budget_skipped"] += 1
+            return None
+        
+        return alternative
+    
+    def _within_budget(self, message: str, agent_name: str) -> bool:
+        if self.stats["speculated"] >= self.max_rate * self.stats["requests"]:
+            return False
+        
+        # The second agent pays for its system prompt, the message and a full reply
+        config = settings.get_agent_config(agent_name)
+        extra_tokens = estimate_tokens(config.system_prompt) + estimate_tokens(message) + config.max_tokens
+        return extra_tokens <= self.max_extra_tokens
+    
+    def _acceptable(self, message: str, response: AgentResponse) -> bool:
+        if "error" in response.metadata or not response.content.strip():
+            return False
+        return self.relevance(message, response.content) >= self.min_relevance
+    
+    @staticmethod
+    def relevance(message: str, answer: str) -> float:
+        """Share of the message's content words the answer mentions, 0 for a refusal"""
+        answer = answer.lower()
+        if any(answer.lstrip().startswith(prefix) for prefix in REFUSAL_PREFIXES):
+            return 0.0
+        
+        words = {word for word in WORD_PATTERN.findall(message.lower()) if len(word) > 3}
+        if not words:
+            return 1.0
+        
+        answer_words = set(WORD_PATTERN.findall(answer))
+        return len(words & answer_words) / len(words)
+    
+    async def run(self, message: str, context: Optional[Dict[str, Any]],
+                  agents: List[BaseAgent]) -> AgentResponse:
+        """
+        Ask every agent concurrently and return the first acceptable answer.
+        
+        Args:
+            message: User message
+            context: Optional additional context passed to each agent
+            agents: Candidates in routing order, the chosen agent first
+        
+        Returns:
+            The winning response, or the chosen agent's if none was acceptable
+        """
+        self.stats["speculated"] += 1
+        tasks = {
+            asyncio.ensure_future(agent.process_message(message, context, record=False)): agent
+            for agent in agents
+        }
+        primary = next(iter(tasks))
+        responses: Dict[asyncio.Task, AgentResponse] = {}
+        
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                # Prefer the chosen agent when both finish in the same tick
+                for task in sorted(done, key=lambda task: task is not primary):
+                    responses[task] = task.result()
+                    if self._acceptable(message, responses[task]):
+                        return self._commit(message, responses[task], task is primary, tasks, winner=tasks[task])
+            
+            # Nothing acceptable, so fall back to the agent routing chose
+            return self._commit(message, responses[primary], True, tasks, winner=None)
+        
+        finally:
+            # Cancel whichever agent lost, or both if the caller went away
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def _commit(self, message: str, response: AgentResponse, primary_won: bool,
+                tasks: Dict[asyncio.Task, BaseAgent], winner: Optional[BaseAgent]) -> AgentResponse:
+        """Record the answer that is returned in its agent's context and note the outcome"""
+        if winner is not None:
+            self.stats["primary_wins" if primary_won else "alternative_wins"] += 1
+        
+        agent = winner or next(iter(tasks.values()))
+        if "error" not in response.metadata:
+            agent.add_to_context(message, response.content)
+        
+        response.metadata["speculation"] = {
+            "candidates": [agent.name for agent in tasks.values()],
+            "winner": winner.name if winner else None
+        }
+        logger.info(f"Speculative routing picked {winner.name if winner else 'no acceptable answer'}")
+        return response
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get speculation counters"""
+        speculated = self.stats["speculated"]
+        return {
+            **self.stats,
+            "speculation_rate": speculated / self.stats["requests"] if self.stats["requests"] else 0.0,
+            "alternative_win_rate": self.stats["alternative_wins"] / speculated if speculated else 0.0
+        }
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so point them at an offline backend and a scratch directory first
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("MEMORY_STORAGE_PATH", tempfile.mkdtemp(prefix="tests_memory_"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from config import settings
+from memory.storage import ConversationStorage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "memory_storage_path", str(tmp_path))
+    conversation_storage = ConversationStorage()
+    yield conversation_storage
+    conversation_storage.close()
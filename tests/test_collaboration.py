@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from orchestration.collaboration import PlanExecutor, order_steps
+
+
+def test_steps_receive_their_dependencies_results():
+    steps = [
+        {"id": "synthesis", "depends_on": ["research", "code"]},
+        {"id": "research"},
+        {"id": "code", "depends_on": ["research"]}
+    ]
+    seen = {}
+
+    async def run_step(step, inputs):
+        seen[step["id"]] = dict(inputs)
+        return step["id"].upper()
+
+    outcomes = asyncio.run(PlanExecutor(max_concurrency=3, step_timeout=1).run(steps, run_step))
+
+    assert list(outcomes) == ["synthesis", "research", "code"]
+    assert seen["code"] == {"research": "RESEARCH"}
+    assert seen["synthesis"] == {"research": "RESEARCH", "code": "CODE"}
+    assert all(outcome.ok for outcome in outcomes.values())
+
+
+def test_failed_and_slow_steps_dont_stop_their_dependents():
+    steps = [
+        {"id": "slow"},
+        {"id": "broken"},
+        {"id": "fine"},
+        {"id": "final", "depends_on": ["slow", "broken", "fine"]}
+    ]
+
+    async def run_step(step, inputs):
+        if step["id"] == "slow":
+            await asyncio.sleep(1)
+        if step["id"] == "broken":
+            raise RuntimeError("agent failed")
+        return inputs if step["id"] == "final" else step["id"]
+
+    outcomes = asyncio.run(PlanExecutor(max_concurrency=4, step_timeout=0.05).run(steps, run_step))
+
+    assert outcomes["slow"].error == "timed out after 0.05s"
+    assert outcomes["broken"].error == "agent failed"
+    assert outcomes["final"].result == {"fine": "fine"}
+
+
+def test_independent_steps_run_concurrently_up_to_the_limit():
+    running = peak = 0
+
+    async def run_step(step, inputs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    steps = [{"id": str(index)} for index in range(5)]
+    asyncio.run(PlanExecutor(max_concurrency=2, step_timeout=1).run(steps, run_step))
+
+    assert peak == 2
+
+
+def test_invalid_plans_are_rejected():
+    with pytest.raises(ValueError):
+        order_steps([{"id": "a", "depends_on": ["b"]}, {"id": "b", "depends_on": ["a"]}])
+    with pytest.raises(ValueError):
+        order_steps([{"id": "a", "depends_on": ["missing"]}])
+    with pytest.raises(ValueError):
+        order_steps([{"id": "a"}, {"id": "a"}])
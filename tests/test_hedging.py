@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from llm.hedging import RequestHedger
+
+
+def make_hedger(**kwargs):
+    options = dict(percentile=50, min_delay_ms=0, max_hedge_rate=1.0, min_samples=2, window=10)
+    options.update(kwargs)
+    return RequestHedger(**options)
+
+
+def attempts(*delays):
+    """A factory whose nth call sleeps delays[n] and returns n"""
+    calls = []
+
+    async def attempt(index):
+        await asyncio.sleep(delays[index])
+        return index
+
+    def factory():
+        calls.append(len(calls))
+        return attempt(calls[-1])
+
+    return factory, calls
+
+
+def test_no_hedge_without_latency_history():
+    hedger = make_hedger()
+    factory, calls = attempts(0.02)
+
+    assert asyncio.run(hedger.run("model", factory)) == 0
+    assert calls == [0]
+    assert hedger.stats["hedged"] == 0
+
+
+def test_slow_request_is_hedged_and_the_hedge_wins():
+    hedger = make_hedger()
+    for _ in range(2):
+        hedger._record("model", 0.01)
+    factory, calls = attempts(0.5, 0.01)
+
+    assert asyncio.run(hedger.run("model", factory)) == 1
+    assert calls == [0, 1]
+    assert hedger.stats["hedge_wins"] == 1
+
+
+def test_hedges_are_capped_by_rate():
+    hedger = make_hedger(max_hedge_rate=0.0)
+    for _ in range(2):
+        hedger._record("model", 0.01)
+    factory, calls = attempts(0.05, 0.01)
+
+    assert asyncio.run(hedger.run("model", factory)) == 0
+    assert calls == [0]
+    assert hedger.stats["budget_skipped"] == 1
+
+
+def test_failed_primary_falls_back_to_hedge():
+    hedger = make_hedger()
+    for _ in range(2):
+        hedger._record("model", 0.01)
+    calls = []
+
+    async def attempt(index):
+        await asyncio.sleep(0.05)
+        if index == 0:
+            raise RuntimeError("primary failed")
+        return index
+
+    def factory():
+        calls.append(len(calls))
+        return attempt(calls[-1])
+
+    assert asyncio.run(hedger.run("model", factory)) == 1
+
+
+def test_error_is_raised_when_every_attempt_fails():
+    hedger = make_hedger()
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(hedger.run("model", fail))
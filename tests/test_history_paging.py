@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+
+def entry(index: int, timestamp: datetime):
+    return {
+        "session_id": "s",
+        "timestamp": timestamp.isoformat(),
+        "user_message": f"message {index}",
+        "agent_response": f"answer {index}",
+        "agent_used": "research"
+    }
+
+
+def test_pages_are_stable_when_timestamps_are_equal(storage):
+    same_time = datetime(2026, 5, 1, 12, 0)
+    storage.store_conversation_batch([entry(index, same_time) for index in range(25)])
+
+    seen, cursor = [], None
+    while True:
+        page = storage.get_history_page("s", page_size=10, cursor=cursor)
+        seen.extend(item["user"] for item in page["entries"])
+        # Rows added while paging are newer than the cursor and don't shift later pages
+        storage.store_conversation_batch([entry(100 + len(seen), same_time)])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [f"message {index}" for index in reversed(range(25))]
+
+
+def test_iter_history_walks_every_entry_once(storage):
+    start = datetime(2026, 5, 1, 12, 0)
+    # Pairs of entries share a timestamp, so page boundaries fall between equal timestamps
+    storage.store_conversation_batch([entry(index, start + timedelta(seconds=index // 2)) for index in range(15)])
+
+    walked = [item["user"] for item in storage.iter_history("s", page_size=4)]
+    assert walked == [f"message {index}" for index in reversed(range(15))]
+
+    # before excludes entries at that exact timestamp
+    before = (start + timedelta(seconds=5)).isoformat()
+    assert [item["user"] for item in storage.iter_history("s", before=before, page_size=3)] == [
+        f"message {index}" for index in reversed(range(10))
+    ]
@@ -0,0 +1,72 @@
+import asyncio
+
+from agents.intent import IntentEngine, classify_intent, estimate_priority
+
+
+def test_classify_intent_fills_the_llm_schema():
+    analysis = classify_intent("Urgent: fix this error, the build is broken", ["web_search", "code_exec"])
+
+    assert analysis["intent"] == "troubleshooting"
+    assert analysis["priority"] == 5
+    assert analysis["confidence"] > 0.5
+    assert set(analysis) == {"intent", "tools_needed", "priority", "requirements", "confidence"}
+
+
+def test_tools_are_limited_to_the_available_ones():
+    message = "Find the latest news and save it to a file"
+
+    assert classify_intent(message)["tools_needed"] == ["web_search", "file_ops"]
+    assert classify_intent(message, ["file_ops"])["tools_needed"] == ["file_ops"]
+
+
+def test_unmatched_message_is_a_low_confidence_general_query():
+    analysis = classify_intent("hello there")
+
+    assert analysis["intent"] == "general_query"
+    assert analysis["confidence"] == 0.3
+    assert estimate_priority("hello there") == 3
+    assert estimate_priority("no rush on this") == 2
+
+
+class Classifiers:
+    def __init__(self, llm_result):
+        self.llm_result = llm_result
+        self.llm_calls = 0
+
+    def local(self, message):
+        return classify_intent(message)
+
+    async def llm(self, message):
+        self.llm_calls += 1
+        return self.llm_result
+
+
+def test_hybrid_mode_asks_the_llm_only_when_unsure():
+    engine = IntentEngine(mode="hybrid", confidence_threshold=0.6)
+    classifiers = Classifiers({"intent": "greeting", "priority": 1})
+
+    confident = asyncio.run(engine.analyze("debug this bug", classifiers.local, classifiers.llm))
+    assert confident["intent_source"] == "local"
+    assert classifiers.llm_calls == 0
+
+    unsure = asyncio.run(engine.analyze("hello there", classifiers.local, classifiers.llm))
+    assert unsure["intent_source"] == "llm"
+    assert unsure["intent"] == "greeting"
+    # Fields the LLM left out come from the local analysis
+    assert unsure["tools_needed"] == []
+    assert engine.stats == {"local": 1, "llm": 1, "llm_failures": 0}
+
+
+def test_failed_llm_analysis_falls_back_to_local():
+    engine = IntentEngine(mode="llm")
+    classifiers = Classifiers(None)
+
+    analysis = asyncio.run(engine.analyze("plan my week", classifiers.local, classifiers.llm))
+
+    assert analysis["intent"] == "planning"
+    assert analysis["intent_source"] == "local"
+    assert engine.stats["llm_failures"] == 1
+
+
+def test_unknown_mode_falls_back_to_local():
+    assert IntentEngine(mode="psychic").mode == "local"
@@ -0,0 +1,64 @@
+import pytest
+
+from config import settings
+from orchestration.learned_router import LearnedRouter, numpy_available
+
+pytestmark = pytest.mark.skipif(not numpy_available(), reason="needs the learned-router extra")
+
+
+@pytest.fixture
+def router(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "learned_router_min_examples", 3)
+    monkeypatch.setattr(settings, "learned_router_save_every", 1)
+    return LearnedRouter(["research", "code"], buckets=64, model_path=tmp_path / "model.npz")
+
+
+def test_version_unchanged_until_trained(router):
+    router.partial_fit("find papers on transformers", "research")
+    router.partial_fit("fix this python traceback", "code")
+    assert not router.trained
+    assert router.version == 0
+    assert router.score("fix my python code") == {}
+
+    router.partial_fit("search for recent news", "research")
+    assert router.trained
+    assert router.version == 1
+
+    router.partial_fit("refactor this function", "code")
+    assert router.version == 2
+
+
+def test_untrained_reset_doesnt_bump_version(router):
+    router.fit(["hello"], ["research"])
+    router.fit([], [])
+    assert router.version == 0
+
+
+def test_online_examples_are_applied_in_groups(router, monkeypatch):
+    router.fit(["find papers", "fix this bug", "search the news"], ["research", "code", "research"])
+    version = router.version
+    monkeypatch.setattr(settings, "learned_router_save_every", 3)
+
+    router.partial_fit("debug this crash", "code")
+    router.partial_fit("look up the weather", "research")
+    assert router.version == version
+    assert router.get_stats()["pending_examples"] == 2
+
+    router.partial_fit("refactor this class", "code")
+    assert router.version == version + 1
+    assert router.get_stats()["pending_examples"] == 0
+    assert router.model_path.exists()
+
+
+def test_untrained_router_saves_nothing_and_reloads_trained_model(router, tmp_path):
+    router.save()
+    assert not router.model_path.exists()
+    assert router.get_stats()["agent_weights"] == {}
+
+    router.fit(["find papers", "fix this bug", "search the news"], ["research", "code", "research"])
+    router.save()
+
+    reloaded = LearnedRouter(["research", "code"], buckets=64, model_path=tmp_path / "model.npz")
+    assert reloaded.load()
+    assert reloaded.trained
+    assert reloaded.score("search for papers") == router.score("search for papers")
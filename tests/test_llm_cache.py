@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import agents.base
+from agents import CreativeAgent, ResearchAgent
+from llm import cache as cache_module
+from llm.cache import LLMResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable time.time() for the cache module"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault("memory_entries", 8)
+    kwargs.setdefault("ttl_seconds", 60)
+    kwargs.setdefault("max_disk_bytes", 1024 * 1024)
+    return LLMResponseCache(db_path=tmp_path / "llm_cache.db", **kwargs)
+
+
+def test_entries_expire_after_ttl_in_both_tiers(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    asyncio.run(cache.set("key", "response"))
+
+    clock[0] += 30
+    assert asyncio.run(cache.get("key")) == "response"
+
+    clock[0] += 31
+    assert asyncio.run(cache.get("key")) is None
+    assert cache.stats["expired"] == 2  # Once from memory, once from disk
+    assert cache.get_stats()["disk_bytes"] == 0
+
+
+def test_disk_hits_survive_a_restart(tmp_path):
+    asyncio.run(make_cache(tmp_path).set("key", "response"))
+
+    reopened = make_cache(tmp_path)
+    assert asyncio.run(reopened.get("key")) == "response"
+    assert reopened.stats["disk_hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_budget(tmp_path, clock):
+    cache = make_cache(tmp_path, memory_entries=1, max_disk_bytes=1000)
+
+    async def scenario():
+        for index in range(3):
+            clock[0] += 1
+            await cache.set(f"key{index}", str(index) * 300)
+        # Reading key0 back from disk makes key1 the least recently used
+        clock[0] += 1
+        assert await cache.get("key0") is not None
+        clock[0] += 1
+        await cache.set("key3", "3" * 300)
+
+        return [await cache.get(f"key{index}") is not None for index in range(4)]
+
+    present = asyncio.run(scenario())
+
+    assert present == [True, False, True, True]
+    assert cache.get_stats()["disk_bytes"] <= 1000
+    assert cache.stats["evictions"] == 1
+
+
+def test_agents_opted_out_of_caching_never_use_it(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    monkeypatch.setattr(agents.base, "get_response_cache", lambda: cache)
+    messages = [{"role": "user", "content": "Tell me about caching"}]
+
+    research = ResearchAgent()
+    first = asyncio.run(research._call_llm(messages))
+    assert asyncio.run(research._call_llm(messages)) == first
+    assert cache.stats["stores"] == 1
+    assert cache.stats["memory_hits"] == 1
+
+    creative = CreativeAgent()
+    assert not creative._should_cache()
+    asyncio.run(creative._call_llm(messages))
+    asyncio.run(creative._call_llm(messages))
+    assert cache.stats["stores"] == 1
+    assert cache.stats["misses"] == 1
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from llm.backends import LocalBackend
+
+
+def payload(prompt: str, **kwargs):
+    return {"model": "test-model", "messages": [{"role": "system", "content": "be brief"},
+                                                {"role": "user", "content": prompt}], **kwargs}
+
+
+def make_backend(**kwargs):
+    kwargs.setdefault("latency_ms", 0)
+    kwargs.setdefault("tokens_per_second", 0)
+    kwargs.setdefault("response_mode", "echo")
+    return LocalBackend(**kwargs)
+
+
+async def collect(stream):
+    return [token async for token in stream]
+
+
+def test_echo_replies_with_the_last_user_message():
+    backend = make_backend()
+
+    assert asyncio.run(backend.complete(payload("one two three"))) == "[local:test-model] one two three"
+    assert asyncio.run(backend.complete(payload("one two three", max_tokens=2))) == "[local:test-model] one two"
+    assert backend.stats["requests"] == 2
+
+
+def test_stream_joins_to_the_completed_response():
+    backend = make_backend()
+    request = payload("stream these words please")
+
+    tokens = asyncio.run(collect(backend.stream(request)))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == asyncio.run(backend.complete(request))
+
+
+def test_canned_responses_are_picked_by_prompt():
+    canned = ["alpha", "beta", "gamma", "delta"]
+    backend = make_backend(response_mode="canned", canned_responses=canned)
+    prompts = [f"question {index}" for index in range(20)]
+
+    first = [asyncio.run(backend.complete(payload(prompt))) for prompt in prompts]
+    second = [asyncio.run(make_backend(response_mode="canned", canned_responses=canned).complete(payload(prompt)))
+              for prompt in prompts]
+
+    assert first == second
+    assert set(first) <= set(canned)
+    assert len(set(first)) > 1
+
+
+@pytest.mark.parametrize("distribution", LocalBackend.DISTRIBUTIONS)
+def test_latency_is_seeded_and_centered_on_the_setting(distribution):
+    samples = [make_backend(latency_ms=100, distribution=distribution, spread=0.5, seed=7)._sample_latency()
+               for _ in range(2)]
+    assert samples[0] == samples[1]
+
+    backend = make_backend(latency_ms=100, distribution=distribution, spread=0.5, seed=7)
+    latencies = sorted(backend._sample_latency() for _ in range(501))
+    assert 0.07 < latencies[250] < 0.13
+
+
+def test_unknown_distribution_is_rejected():
+    with pytest.raises(ValueError):
+        make_backend(distribution="bimodal")
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from agents import ResearchAgent
+from config import settings
+from llm import model_router as model_router_module
+from llm.backends import LocalBackend
+from llm.errors import LLMRequestError
+from llm.model_router import ModelRouter
+
+
+class DownModelBackend(LocalBackend):
+    """Local backend where some models answer with a 503"""
+
+    def __init__(self, down_models):
+        super().__init__(latency_ms=0, tokens_per_second=0, response_mode="echo")
+        self.down_models = set(down_models)
+        self.calls = []
+
+    async def complete(self, payload):
+        self.calls.append(payload["model"])
+        if payload["model"] in self.down_models:
+            raise LLMRequestError("Service unavailable", status_code=503)
+        return await super().complete(payload)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable time.monotonic() for the model router"""
+    now = [1000.0]
+    monkeypatch.setattr(model_router_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_router(**kwargs):
+    options = dict(models={"intent": "small", "answer": "main"}, fallbacks=["backup"], window=10,
+                   min_samples=3, max_error_rate=0.5, max_p95_ms=1000, recovery_seconds=60)
+    options.update(kwargs)
+    return ModelRouter(**options)
+
+
+def test_failing_model_moves_behind_healthy_ones_until_it_recovers(clock):
+    router = make_router()
+    assert router.candidates("answer") == ["main", "backup"]
+    assert router.candidates("intent") == ["small", "backup"]
+
+    for _ in range(3):
+        router.record("main", 50, ok=False)
+
+    assert router.candidates("answer") == ["backup", "main"]
+    assert router.stats["marked_unhealthy"] == 1
+
+    clock[0] += 61
+    assert router.candidates("answer") == ["main", "backup"]
+    assert router.stats["recovered"] == 1
+    assert router.get_stats()["models"]["main"]["window_samples"] == 0
+
+
+def test_slow_model_is_marked_unhealthy():
+    router = make_router()
+    for latency in (200, 300, 5000):
+        router.record("main", latency, ok=True)
+
+    assert not router.is_healthy("main")
+    assert router.candidates("answer")[0] == "backup"
+
+
+def test_agent_fails_over_and_then_skips_the_unhealthy_model(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedging_enabled", False)
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_max_retries", 0)
+
+    agent = ResearchAgent()
+    agent.backend = DownModelBackend(["main"])
+    agent.model_router = make_router(min_samples=1)
+    messages = [{"role": "user", "content": "status report"}]
+
+    assert asyncio.run(agent._call_llm(messages)) == "[local:backup] status report"
+    assert agent.model_router.stats["failovers"] == 1
+
+    assert asyncio.run(agent._call_llm(messages)) == "[local:backup] status report"
+    assert agent.backend.calls == ["main", "backup", "backup"]
+    assert agent.model_router.stats["failovers"] == 1
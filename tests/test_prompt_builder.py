@@ -0,0 +1,18 @@
+from agents.prompt_builder import PromptBuilder, TRUNCATION_MARKER, estimate_tokens
+
+
+def test_truncation_keeps_the_start_within_budget():
+    builder = PromptBuilder(budget_tokens=1000)
+    content = "Answer first. " + "x " * 500
+
+    truncated = builder._truncate_text(content, 50)
+
+    assert truncated.startswith("Answer first.")
+    assert truncated.endswith(TRUNCATION_MARKER)
+    # One character words are counted by word, not by characters
+    assert estimate_tokens(truncated) <= 50
+
+
+def test_short_text_is_untouched():
+    builder = PromptBuilder(budget_tokens=1000)
+    assert builder._truncate_text("short answer", 50) == "short answer"
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from config import settings
+from llm.errors import LLMRequestError
+from llm.rate_limiter import AdaptiveRateLimiter
+
+
+def make_limiter(**kwargs):
+    options = dict(rate=1000, burst=100, min_concurrency=1, max_concurrency=8, initial_concurrency=2)
+    options.update(kwargs)
+    return AdaptiveRateLimiter(**options)
+
+
+def test_concurrency_stays_within_the_limit():
+    limiter = make_limiter()
+    running = peak = 0
+
+    async def request():
+        nonlocal running, peak
+        async with limiter.slot(track_latency=False):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def scenario():
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert peak == 2
+    assert limiter.get_stats()["in_flight"] == 0
+
+
+def test_waiters_are_served_highest_priority_first():
+    limiter = make_limiter(initial_concurrency=1)
+    order = []
+
+    async def request(priority, name):
+        async with limiter.slot(priority, track_latency=False):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        first = asyncio.create_task(request(3, "first"))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, request(1, "low"), request(5, "high"))
+
+    asyncio.run(scenario())
+    assert order == ["first", "high", "low"]
+
+
+def test_token_bucket_throttles_past_the_burst():
+    limiter = make_limiter(rate=20, burst=1, initial_concurrency=4)
+
+    async def request():
+        async with limiter.slot(track_latency=False):
+            pass
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(request() for _ in range(3)))
+        return loop.time() - start
+
+    # One request from the burst, then one every 50ms
+    assert asyncio.run(scenario()) >= 0.09
+    assert limiter.stats["throttled"] >= 1
+
+
+def test_rate_limit_response_halves_the_limit_and_pauses(monkeypatch):
+    monkeypatch.setattr(settings, "llm_backoff_base_seconds", 0.05)
+    limiter = make_limiter(initial_concurrency=4)
+
+    async def scenario():
+        with pytest.raises(LLMRequestError):
+            async with limiter.slot():
+                raise LLMRequestError("slow down", status_code=429)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with limiter.slot():
+            pass
+        return loop.time() - start
+
+    assert asyncio.run(scenario()) >= 0.04
+    assert limiter.get_stats()["concurrency_limit"] == 2
+    assert limiter.stats["backoffs"] == 1
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    limiter = make_limiter(initial_concurrency=1)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def holder():
+            async with limiter.slot(track_latency=False):
+                await release.wait()
+
+        held = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        release.set()
+        await held
+        async with limiter.slot(track_latency=False):
+            pass
+
+    asyncio.run(scenario())
+    assert limiter.get_stats()["in_flight"] == 0
+    assert limiter.get_stats()["waiting"] == 0
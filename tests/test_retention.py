@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from config import settings
+from memory.retention import RetentionEngine
+
+
+def make_entries(sessions: int, per_session: int, start: datetime):
+    return [
+        {
+            "session_id": f"old-{session}",
+            "timestamp": (start + timedelta(minutes=index)).isoformat(),
+            "user_message": "question " * 200,
+            "agent_response": "answer " * 800,
+            "agent_used": "research",
+            "tools_used": ["web_search"]
+        }
+        for session in range(sessions)
+        for index in range(per_session)
+    ]
+
+
+def age_sessions(storage, days: int):
+    old = datetime.now() - timedelta(days=days)
+    with storage.db.write() as conn:
+        conn.execute(
+            "UPDATE session_metadata SET last_activity = ?, last_activity_ts = ?",
+            (old.isoformat(), int(old.timestamp() * 1000))
+        )
+
+
+def freelist_count(storage) -> int:
+    with storage.db.read() as conn:
+        return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def page_count(storage) -> int:
+    with storage.db.read() as conn:
+        return conn.execute("PRAGMA page_count").fetchone()[0]
+
+
+def test_vacuum_reports_pages_actually_freed(storage):
+    storage.store_conversation_batch(make_entries(20, 10, datetime(2025, 1, 1)))
+    age_sessions(storage, 90)
+    pages_before = page_count(storage)
+    
+    engine = RetentionEngine(lambda: storage, batch_size=5, archive=False, vacuum_pages=50)
+    result = engine.run(30)
+    
+    assert result["phase"] == "done"
+    assert result["sessions_done"] == 20
+    assert freelist_count(storage) == 0
+    
+    released = pages_before - page_count(storage)
+    assert released > 50  # More than one vacuum step's worth
+    assert result["pages_freed"] == released
+    assert engine.get_stats()["pages_freed"] == released
+
+
+def test_full_vacuum_is_opt_in(storage, monkeypatch):
+    # Databases created before incremental mode need a full VACUUM to switch
+    with storage.db.write() as conn:
+        conn.execute("PRAGMA auto_vacuum=NONE")
+        conn.execute("VACUUM")
+    
+    storage.store_conversation_batch(make_entries(4, 5, datetime(2025, 1, 1)))
+    age_sessions(storage, 90)
+    
+    engine = RetentionEngine(lambda: storage, archive=False)
+    result = engine.run(30)
+    
+    assert result["sessions_done"] == 4
+    assert result["pages_freed"] == 0
+    with storage.db.read() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    
+    assert engine.enable_incremental_vacuum() > 0
+    with storage.db.write() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_archives_sessions_before_deleting(storage):
+    import gzip
+    import json
+    
+    storage.store_conversation_batch(make_entries(3, 2, datetime(2025, 1, 1)))
+    age_sessions(storage, 90)
+    
+    RetentionEngine(lambda: storage, archive=True).run(30)
+    
+    archives = list((storage.storage_path / "archive").rglob("*.ndjson.gz"))
+    assert len(archives) == 1
+    with gzip.open(archives[0], "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    
+    assert sorted(record["session_id"] for record in records) == ["old-0", "old-1", "old-2"]
+    assert all(len(record["conversations"]) == 2 for record in records)
+    assert storage.get_all_sessions() == []
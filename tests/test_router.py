@@ -0,0 +1,57 @@
+from agents import CodeAgent
+from config import settings
+from orchestration.router import AgentRouter
+
+
+def test_repeated_messages_hit_the_cache():
+    router = AgentRouter()
+    first = router._route_batch(["Write a poem about the sea"])[0]
+    second = router._route_batch(["Write a  poem about the sea!"])[0]
+
+    assert second == first
+    assert router.cache_stats["hits"] == 1
+    assert router.cache_stats["misses"] == 1
+
+
+def test_online_updates_keep_cached_decisions(monkeypatch):
+    monkeypatch.setattr(settings, "learned_router_save_every", 100)
+    router = AgentRouter()
+    router._route_batch(["Plan my project timeline"])
+
+    # An answered message queues a training example without changing the model
+    router.update_routing_weights("Plan my project timeline", "task", 0.9)
+    router._route_batch(["Plan my project timeline"])
+
+    assert router.cache_stats["hits"] == 1
+
+
+def test_explanation_without_cache(monkeypatch):
+    monkeypatch.setattr(settings, "routing_cache_size", 0)
+    router = AgentRouter()
+
+    explanation = router.get_routing_explanation("Debug this python function")
+
+    assert explanation["recommended_agent"] == "code"
+    assert router.get_cache_stats()["size"] == 0
+
+
+def test_routing_builds_no_agents():
+    router = AgentRouter()
+    decision = router._route_batch(["Debug this python function"])[0]
+    router.get_routing_explanation("Debug this python function")
+
+    assert decision.agent_name == "code"
+    assert router._agents == {}
+
+
+def test_agents_scoring_with_an_instance_are_built(monkeypatch):
+    class EagerCodeAgent(CodeAgent):
+        def can_handle(self, message, context=None, features=None):
+            return 1.0
+
+    monkeypatch.setitem(AgentRouter.agent_classes, "code", EagerCodeAgent)
+    router = AgentRouter()
+    decision = router._route_batch(["Good morning"])[0]
+
+    assert decision.agent_name == "code"
+    assert list(router._agents) == ["code"]
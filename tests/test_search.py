@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from config import settings
+from memory.storage import ConversationStorage
+
+
+def entry(session_id: str, minute: int, user_message: str, agent_response: str = "noted"):
+    return {
+        "session_id": session_id,
+        "timestamp": (datetime(2026, 1, 1) + timedelta(minutes=minute)).isoformat(),
+        "user_message": user_message,
+        "agent_response": agent_response,
+        "agent_used": "research"
+    }
+
+
+def test_session_search_only_returns_that_session(storage):
+    storage.store_conversation_batch([
+        entry("a", 0, "How does latency affect throughput?"),
+        entry("a", 1, "Unrelated question about cooking"),
+        entry("b", 2, "Latency budgets for the API")
+    ])
+
+    results = storage.search_conversations("a", "latency")
+
+    assert [result["user_message"] for result in results] == ["How does latency affect throughput?"]
+    assert results[0]["snippet"] == "How does [latency] affect throughput"
+    assert {result["session_id"] for result in storage.search_conversations(None, "latency")} == {"a", "b"}
+
+
+def test_session_search_matches_like_the_index(storage):
+    storage.store_conversation_batch([
+        entry("a", 0, "Café opening hours"),
+        entry("a", 1, "metadata format", "the data is stored as JSON"),
+        entry("a", 2, "database tuning")
+    ])
+
+    assert len(storage.search_conversations("a", "cafe")) == 1
+    # Prefix matching is on by default; exact terms match whole words only
+    assert len(storage.search_conversations("a", "data")) == 2
+    assert len(storage.search_conversations("a", "data", prefix=False)) == 1
+    # Every term has to match
+    assert storage.search_conversations("a", "cafe tuning") == []
+
+
+def test_session_search_ranks_user_text_higher_and_pages(storage):
+    storage.store_conversation_batch([
+        entry("a", 0, "something else", "mentions sqlite once"),
+        entry("a", 1, "sqlite locking"),
+        entry("a", 2, "unrelated")
+    ])
+
+    results = storage.search_conversations("a", "sqlite")
+    assert [result["user_message"] for result in results] == ["sqlite locking", "something else"]
+    assert results[0]["score"] > results[1]["score"]
+
+    assert [result["user_message"] for result in storage.search_conversations("a", "sqlite", limit=1, offset=1)] == [
+        "something else"
+    ]
+
+
+def test_existing_rows_are_backfilled_into_the_index(storage, monkeypatch):
+    storage.store_conversation_batch([entry("a", minute, f"message {minute} about indexing") for minute in range(7)])
+
+    # Make it look like a database from before the search index existed
+    with storage.db.write() as conn:
+        for trigger in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER conversations_fts_{trigger}")
+        conn.execute("DROP TABLE conversations_fts")
+        conn.execute("DELETE FROM storage_meta WHERE key LIKE 'fts_backfill_%'")
+    storage.close()
+
+    monkeypatch.setattr(settings, "storage_backfill_batch_size", 3)
+    reopened = ConversationStorage()
+    try:
+        assert reopened.fts_enabled
+        assert len(reopened.search_conversations(None, "indexing", limit=20)) == 7
+        with reopened.db.read() as conn:
+            assert conn.execute("SELECT value FROM storage_meta WHERE key = 'fts_backfill_done'").fetchone()[0] == "7"
+    finally:
+        reopened.close()
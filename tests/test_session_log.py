@@ -0,0 +1,51 @@
+import json
+
+from memory.session_log import SessionLog
+
+
+def entry(index: int):
+    return {"session_id": "s", "user_message": f"message {index}"}
+
+
+def line_count(path) -> int:
+    return len(path.read_bytes().splitlines())
+
+
+def test_compaction_enforces_the_history_cap(tmp_path):
+    log = SessionLog(tmp_path, max_entries=10, compact_factor=2.0)
+    for index in range(20):
+        log.append("s", [entry(index)])
+
+    # Lines past the cap wait for compaction but are never read back
+    assert line_count(tmp_path / "s.ndjson") == 20
+    assert log.tail("s", 50) == [entry(index) for index in range(10, 20)]
+
+    log.append("s", [entry(20)])
+
+    assert line_count(tmp_path / "s.ndjson") == 10
+    assert (tmp_path / "s.idx").stat().st_size == 10 * 8
+    assert log.tail("s", 3) == [entry(index) for index in range(18, 21)]
+
+    # The rebuilt index keeps later appends and tail reads lined up
+    log.append("s", [entry(21), entry(22)])
+    assert log.tail("s", 10) == [entry(index) for index in range(13, 23)]
+
+
+def test_legacy_file_is_converted_and_capped(tmp_path):
+    (tmp_path / "s.json").write_text(json.dumps([entry(index) for index in range(15)]))
+    log = SessionLog(tmp_path, max_entries=10)
+
+    assert log.tail("s", 5) == [entry(index) for index in range(10, 15)]
+    assert not (tmp_path / "s.json").exists()
+    assert line_count(tmp_path / "s.ndjson") == 10
+
+
+def test_partial_line_from_a_crash_is_skipped(tmp_path):
+    log = SessionLog(tmp_path, max_entries=10)
+    log.append("s", [entry(0)])
+    with open(tmp_path / "s.ndjson", "ab") as f:
+        f.write(b'{"session_id": "s", "user_mes')
+
+    log.append("s", [entry(1)])
+
+    assert log.tail("s", 10) == [entry(0), entry(1)]
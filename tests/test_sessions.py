@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+from memory.sessions import SessionStore
+
+
+class RecordingStorage:
+    """Keeps session state in a dict and records which thread touched it"""
+
+    def __init__(self):
+        self.states = {}
+        self.threads = set()
+
+    def load_session_state(self, session_id):
+        self.threads.add(threading.get_ident())
+        return self.states.get(session_id, {})
+
+    def save_session_state(self, session_id, state):
+        self.threads.add(threading.get_ident())
+        self.states[session_id] = state
+
+
+def test_spill_and_reload_run_off_the_event_loop():
+    storage = RecordingStorage()
+    store = SessionStore(lambda: storage, max_sessions=1, idle_seconds=3600)
+
+    async def scenario():
+        async with store.bind("a") as session:
+            session.context_for("coordinator").add_interaction("hello", "hi there")
+
+        # Binding a second session pushes the first out of the single slot
+        async with store.bind("b"):
+            pass
+        assert "a" in storage.states
+
+        async with store.bind("a") as session:
+            assert session.context_for("coordinator").recent_memory
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert storage.threads and loop_thread not in storage.threads
+    assert store.stats["reloads"] == 1
+
+
+def test_session_is_reused_while_its_spill_is_written():
+    storage = RecordingStorage()
+    store = SessionStore(lambda: storage, max_sessions=1, idle_seconds=3600)
+    release = threading.Event()
+    save = storage.save_session_state
+
+    def slow_save(session_id, state):
+        release.wait(5)
+        save(session_id, state)
+
+    storage.save_session_state = slow_save
+
+    async def scenario():
+        first = await store.acquire("a")
+        first.context_for("coordinator").add_interaction("hello", "hi there")
+
+        eviction = asyncio.create_task(store.acquire("b"))
+        await asyncio.sleep(0.05)
+        assert store.get_stats()["spilling"] == 1
+
+        # Still being written, so it comes back from memory rather than storage
+        reacquire = asyncio.create_task(store.acquire("a"))
+        await asyncio.sleep(0.05)
+        release.set()
+        await eviction
+        again = await reacquire
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert again is first
+    assert store.stats["reloads"] == 0
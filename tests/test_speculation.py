@@ -0,0 +1,80 @@
+import asyncio
+
+from agents.base import AgentResponse
+from orchestration.speculation import SpeculativeExecutor
+
+
+class FakeAgent:
+    """Answers after a delay and records what was added to its context"""
+
+    def __init__(self, name, answer, delay=0.0, error=False):
+        self.name = name
+        self.answer = answer
+        self.delay = delay
+        self.error = error
+        self.context = []
+        self.record_flags = []
+
+    async def process_message(self, message, context=None, record=True):
+        self.record_flags.append(record)
+        await asyncio.sleep(self.delay)
+        if record:
+            self.context.append((message, self.answer))
+        return AgentResponse(
+            content=self.answer,
+            agent_name=self.name,
+            confidence=0.8,
+            metadata={"error": "failed"} if self.error else {}
+        )
+
+    def add_to_context(self, message, response):
+        self.context.append((message, response))
+
+
+def run(agents, message="Explain python generators"):
+    executor = SpeculativeExecutor(min_relevance=0.5)
+    response = asyncio.run(executor.run(message, None, agents))
+    return executor, response
+
+
+def test_only_the_winner_is_recorded():
+    primary = FakeAgent("research", "Python generators yield values lazily", delay=0.05)
+    alternative = FakeAgent("code", "Generators in python are functions that yield")
+
+    executor, response = run([primary, alternative])
+
+    assert response.agent_name == "code"
+    assert primary.record_flags == alternative.record_flags == [False]
+    assert primary.context == []
+    assert alternative.context == [("Explain python generators", response.content)]
+    assert executor.stats["alternative_wins"] == 1
+
+
+def test_off_topic_and_refusals_dont_win():
+    primary = FakeAgent("research", "Python generators yield values lazily", delay=0.05)
+    refusal = FakeAgent("code", "I'm sorry, I can't help with python generators")
+
+    _, response = run([primary, refusal])
+    assert response.agent_name == "research"
+
+    off_topic = FakeAgent("creative", "Here is a poem about the sea")
+    _, response = run([FakeAgent("research", "Python generators yield", delay=0.05), off_topic])
+    assert response.agent_name == "research"
+
+
+def test_falls_back_to_primary_without_recording_errors():
+    primary = FakeAgent("research", "Something went wrong", error=True)
+    alternative = FakeAgent("code", "Unrelated", delay=0.01)
+
+    executor, response = run([primary, alternative])
+
+    assert response.agent_name == "research"
+    assert response.metadata["speculation"]["winner"] is None
+    assert primary.context == [] and alternative.context == []
+    assert executor.stats["primary_wins"] == executor.stats["alternative_wins"] == 0
+
+
+def test_relevance():
+    assert SpeculativeExecutor.relevance("Explain python generators", "python generators yield") == 2 / 3
+    assert SpeculativeExecutor.relevance("Explain python generators", "I apologize, python generators") == 0.0
+    assert SpeculativeExecutor.relevance("hi", "hello") == 1.0
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from memory.sqlite_pool import SQLiteConnectionManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = SQLiteConnectionManager(tmp_path / "test.db", read_pool_size=2)
+    with manager.write() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER)")
+    yield manager
+    manager.close()
+
+
+def count(db) -> int:
+    with db.read() as conn:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+def test_database_is_in_wal_mode(db):
+    with db.read() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_failed_write_is_rolled_back(db):
+    with db.write() as conn:
+        conn.execute("INSERT INTO items VALUES (1)")
+
+    with pytest.raises(RuntimeError):
+        with db.write() as conn:
+            conn.execute("INSERT INTO items VALUES (2)")
+            raise RuntimeError("boom")
+
+    assert count(db) == 1
+
+
+def test_readers_are_reused_and_see_committed_writes(db):
+    with db.read() as first:
+        pass
+    with db.read() as second:
+        assert second is first
+
+    with db.write() as conn:
+        conn.execute("INSERT INTO items VALUES (1)")
+    assert count(db) == 1
+
+
+def test_reader_pool_is_bounded(db):
+    borrowed = []
+    holding = threading.Barrier(3)
+    release = threading.Event()
+
+    def hold():
+        with db.read() as conn:
+            borrowed.append(conn)
+            holding.wait(5)
+            release.wait(5)
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in holders:
+        thread.start()
+    holding.wait(5)
+
+    # Both readers are out, so a third borrower waits for one to come back
+    waiter = threading.Thread(target=lambda: borrowed.append(db._acquire_reader()))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+
+    release.set()
+    waiter.join(5)
+    for thread in holders:
+        thread.join(5)
+
+    assert db._reader_count == 2
+    assert borrowed[2] in borrowed[:2]
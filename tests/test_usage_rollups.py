@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+
+def make_entries(session_id: str, count: int, start: datetime):
+    tools = [[], ["web_search"], ["web_search", "file_ops", "web_search"], ["code_exec"]]
+    agents = ["research", "code", "task"]
+    return [
+        {
+            "session_id": session_id,
+            "timestamp": (start + timedelta(hours=index * 7)).isoformat(),
+            "user_message": f"question {index}",
+            "agent_response": f"answer {index}",
+            "agent_used": agents[index % len(agents)],
+            "tools_used": tools[index % len(tools)],
+            "confidence": 0.5 + (index % 5) / 10
+        }
+        for index in range(count)
+    ]
+
+
+def rollups(conn):
+    return {
+        "session_agents": conn.execute("""
+            SELECT session_id, agent_used, message_count, ROUND(confidence_sum, 6) FROM session_agent_usage
+        """).fetchall(),
+        "session_tools": conn.execute("SELECT session_id, tool, use_count FROM session_tool_usage").fetchall(),
+        "daily_agents": conn.execute("""
+            SELECT day, agent_used, message_count, ROUND(confidence_sum, 6) FROM daily_agent_usage
+        """).fetchall(),
+        "daily_tools": conn.execute("SELECT day, tool, use_count FROM daily_tool_usage").fetchall()
+    }
+
+
+def recounted(conn):
+    return {
+        "session_agents": conn.execute("""
+            SELECT session_id, agent_used, COUNT(*), ROUND(TOTAL(confidence), 6)
+            FROM conversations GROUP BY session_id, agent_used
+        """).fetchall(),
+        "session_tools": conn.execute("""
+            SELECT c.session_id, j.value, COUNT(*) FROM conversations c, json_each(c.tools_used) j
+            GROUP BY c.session_id, j.value
+        """).fetchall(),
+        "daily_agents": conn.execute("""
+            SELECT substr(timestamp, 1, 10), agent_used, COUNT(*), ROUND(TOTAL(confidence), 6)
+            FROM conversations GROUP BY substr(timestamp, 1, 10), agent_used
+        """).fetchall(),
+        "daily_tools": conn.execute("""
+            SELECT substr(c.timestamp, 1, 10), j.value, COUNT(*) FROM conversations c, json_each(c.tools_used) j
+            GROUP BY substr(c.timestamp, 1, 10), j.value
+        """).fetchall()
+    }
+
+
+def assert_rollups_match(storage):
+    with storage.db.read() as conn:
+        actual, expected = rollups(conn), recounted(conn)
+    for name in expected:
+        assert sorted(actual[name]) == sorted(expected[name]), name
+
+
+def test_rollups_match_counts_after_inserts_and_deletes(storage):
+    storage.store_conversation_batch(make_entries("a", 30, datetime(2026, 3, 1)))
+    storage.store_conversation_batch(make_entries("b", 20, datetime(2026, 3, 2)))
+    assert_rollups_match(storage)
+
+    with storage.db.write() as conn:
+        conn.execute("DELETE FROM conversations WHERE session_id = 'a' AND id % 3 = 0")
+    assert_rollups_match(storage)
+
+    storage.clear_session("b")
+    assert_rollups_match(storage)
+    with storage.db.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM session_agent_usage WHERE session_id = 'b'").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM conversation_tools WHERE session_id = 'b'").fetchone()[0] == 0
+
+
+def test_session_statistics_come_from_rollups(storage):
+    storage.store_conversation_batch(make_entries("a", 8, datetime(2026, 3, 1)))
+
+    stats = storage.get_session_statistics("a")
+
+    assert stats["total_messages"] == 8
+    assert stats["agent_usage"] == {"research": 3, "code": 3, "task": 2}
+    assert stats["tool_usage"] == {"web_search": 6, "file_ops": 2, "code_exec": 2}
+    assert sum(day["total_messages"] for day in storage.get_daily_usage("2026-03-01", "2026-03-31")) == 8
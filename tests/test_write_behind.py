@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from memory.write_behind import StorageWriteError, WriteBehindQueue
+
+
+class FlakyStorage:
+    """Fails the first `failures` batch writes, then stores everything it is given"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.attempts = 0
+        self.stored = []
+
+    def store_conversation_batch(self, entries):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise RuntimeError("database is locked")
+        self.stored.extend(entries)
+
+
+def make_entry(index: int):
+    return {"session_id": "s", "user_message": f"message {index}"}
+
+
+def make_queue(storage, durability, **kwargs):
+    kwargs.setdefault("retry_attempts", 2)
+    kwargs.setdefault("retry_backoff", 0.0)
+    kwargs.setdefault("retry_interval", 0.01)
+    return WriteBehindQueue(lambda: storage, durability=durability, **kwargs)
+
+
+def test_sync_put_fails_and_keeps_entry_uncommitted():
+    storage = FlakyStorage(failures=2)
+    queue = make_queue(storage, "sync", retry_interval=60)
+
+    async def scenario():
+        with pytest.raises(StorageWriteError):
+            await queue.put(make_entry(0))
+
+        assert queue.uncommitted("s") == [make_entry(0)]
+        assert queue.stats["committed"] == 0
+        assert queue.stats["failed_attempts"] == 2
+
+        # The failed entry is written ahead of the next one
+        await queue.put(make_entry(1))
+        assert storage.stored == [make_entry(0), make_entry(1)]
+        assert queue.uncommitted("s") == []
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_transient_failure_is_retried_with_backoff():
+    storage = FlakyStorage(failures=1)
+    queue = make_queue(storage, "sync")
+
+    async def scenario():
+        await queue.put(make_entry(0))
+        await queue.close()
+
+    asyncio.run(scenario())
+    assert storage.attempts == 2
+    assert storage.stored == [make_entry(0)]
+    assert queue.stats["committed"] == 1
+    assert queue.stats["failed_batches"] == 0
+
+
+def test_flush_raises_and_idle_worker_retries():
+    storage = FlakyStorage(failures=2)
+    queue = make_queue(storage, "async")
+
+    async def scenario():
+        await queue.put(make_entry(0))
+        with pytest.raises(StorageWriteError):
+            await queue.flush()
+        assert queue.get_stats()["awaiting_retry"] == 1
+
+        # Nothing new arrives, so the worker retries on its own after retry_interval
+        for _ in range(100):
+            if storage.stored:
+                break
+            await asyncio.sleep(0.01)
+
+        assert storage.stored == [make_entry(0)]
+        assert queue.uncommitted("s") == []
+        assert queue.get_stats()["awaiting_retry"] == 0
+        await queue.close()
+
+    asyncio.run(scenario())
@@ -2,27 +2,43 @@ from .web_search import WebSearchTool
 from .file_ops import FileOperationsTool
 from .code_exec import CodeExecutionTool
 
-# Tool registry
-_TOOL_REGISTRY = {
-    "web_search": WebSearchTool(),
-    "file_ops": FileOperationsTool(),
-    "code_exec": CodeExecutionTool()
+# Tool registry: factories by name, instantiated on first use
+_TOOL_FACTORIES = {
+    "web_search": WebSearchTool,
+    "file_ops": FileOperationsTool,
+    "code_exec": CodeExecutionTool
 }
+_TOOL_INSTANCES = {}
 
 
 def get_tool_by_name(tool_name: str):
-    """Get a tool instance by name"""
-    return _TOOL_REGISTRY.get(tool_name)
+    """Get a tool instance by name, building it on first use"""
+    tool = _TOOL_INSTANCES.get(tool_name)
+    if tool is None and tool_name in _TOOL_FACTORIES:
+        tool = _TOOL_INSTANCES[tool_name] = _TOOL_FACTORIES[tool_name]()
+    return tool
+
+
+def get_tool_keywords(tool_name: str):
+    """Get a tool's routing keywords without building it"""
+    tool = _TOOL_INSTANCES.get(tool_name) or _TOOL_FACTORIES.get(tool_name)
+    return getattr(tool, "keywords", None)
 
 
 def get_available_tools():
     """Get list of all available tools"""
-    return list(_TOOL_REGISTRY.keys())
+    return list(dict.fromkeys([*_TOOL_FACTORIES, *_TOOL_INSTANCES]))
 
 
 def register_tool(name: str, tool_instance):
     """Register a new tool"""
-    _TOOL_REGISTRY[name] = tool_instance
+    _TOOL_INSTANCES[name] = tool_instance
+
+
+def register_tool_factory(name: str, factory):
+    """Register a tool class or factory, called the first time the tool is used"""
+    _TOOL_FACTORIES[name] = factory
+    _TOOL_INSTANCES.pop(name, None)
 
 
 __all__ = [
@@ -30,6 +46,8 @@ __all__ = [
     "FileOperationsTool", 
     "CodeExecutionTool",
     "get_tool_by_name",
+    "get_tool_keywords",
     "get_available_tools",
-    "register_tool"
+    "register_tool",
+    "register_tool_factory"
 ]
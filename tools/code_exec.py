@@ -16,10 +16,12 @@ from config import settings
 class CodeExecutionTool:
     """Tool for safe code execution with sandboxing and timeouts"""
     
+    # Routing hints, compiled into the shared keyword matcher
+    keywords = ["execute", "run", "code", "script", "test", "compile"]
+    
     def __init__(self):
         self.name = "code_exec"
         self.description = "Execute code safely with timeouts and sandboxing"
-        self.keywords = ["execute", "run", "code", "script", "test", "compile"]
         
         # Execution settings
         self.safe_mode = settings.safe_mode
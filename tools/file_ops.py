@@ -13,10 +13,12 @@ from config import settings
 class FileOperationsTool:
     """Tool for file system operations with safety constraints"""
     
+    # Routing hints, compiled into the shared keyword matcher
+    keywords = ["file", "save", "load", "read", "write", "create", "delete", "folder"]
+    
     def __init__(self):
         self.name = "file_ops"
         self.description = "File system operations: read, write, create, delete, list files"
-        self.keywords = ["file", "save", "load", "read", "write", "create", "delete", "folder"]
         
         # Safety settings
         self.safe_mode = settings.safe_mode
@@ -3,19 +3,22 @@ import json
 import os
 import sys
 from typing import Dict, Any, List, Optional
-import requests
 from urllib.parse import quote_plus
 
 from config import settings
+from llm import get_http_client
 
 
 class WebSearchTool:
     """Tool for performing web searches using DuckDuckGo Instant Answer API"""
     
+    # Routing hints, compiled into the shared keyword matcher
+    keywords = ["search", "find", "web", "internet", "current", "news", "information"]
+    
     def __init__(self):
         self.name = "web_search"
         self.description = "Search the web for information, news, and current data"
-        self.keywords = ["search", "find", "web", "internet", "current", "news", "information"]
+        self.idempotent = True  # Safe to share results between concurrent identical calls
         
         # DuckDuckGo Instant Answer API (no API key required)
         self.search_url = "https://api.duckduckgo.com/"
@@ -72,7 +75,8 @@ class WebSearchTool:
                 'skip_disambig': '1'
             }
             
-            response = requests.get(self.search_url, params=params, timeout=10)
+            client = get_http_client()
+            response = await client.get(self.search_url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -117,8 +121,6 @@ class WebSearchTool:
         """Search using SerpAPI (Google Search API)"""
         
         try:
-            import requests
-            
             url = "https://serpapi.com/search"
             params = {
                 'q': query,
@@ -132,7 +134,8 @@ class WebSearchTool:
             elif search_type == "images":
                 params['tbm'] = 'isch'
             
-            response = requests.get(url, params=params, timeout=15)
+            client = get_http_client()
+            response = await client.get(url, params=params, timeout=15)
             response.raise_for_status()
             
             data = response.json()
@@ -184,7 +187,8 @@ class WebSearchTool:
                 url = "https://api.bing.microsoft.com/v7.0/news/search"
                 params['responseFilter'] = 'News'
             
-            response = requests.get(url, headers=headers, params=params, timeout=15)
+            client = get_http_client()
+            response = await client.get(url, headers=headers, params=params, timeout=15)
             response.raise_for_status()
             
             data = response.json()
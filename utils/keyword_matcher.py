@@ -0,0 +1,136 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+
+@dataclass(frozen=True)
+class MessageFeatures:
+    """Keyword matches for one message, extracted in a single pass"""
+    text: str
+    lower: str
+    matched: FrozenSet[str]
+    word_count: int
+    groups: Dict[str, FrozenSet[str]] = field(repr=False, compare=False)
+    
+    def has(self, keyword: str) -> bool:
+        """Check whether a registered keyword occurs in the message"""
+        return keyword in self.matched
+    
+    def count(self, group: str) -> int:
+        """Number of distinct keywords from a group that occur in the message"""
+        return len(self.groups.get(group, frozenset()) & self.matched)
+    
+    def any(self, group: str) -> bool:
+        """Check whether any keyword from a group occurs in the message"""
+        return not self.groups.get(group, frozenset()).isdisjoint(self.matched)
+    
+    def hits(self, group: str) -> List[str]:
+        """Keywords from a group that occur in the message, sorted"""
+        return sorted(self.groups.get(group, frozenset()) & self.matched)
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over named keyword groups.
+    
+    Finds every registered keyword in a message in one pass over the
+    text, independent of how many keywords are registered. Matching is
+    case-insensitive substring matching, the same as `keyword in
+    message.lower()`.
+    """
+    
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups = {name: frozenset(k.lower() for k in keywords if k) for name, keywords in groups.items()}
+        self.keywords = sorted(set().union(*self.groups.values())) if self.groups else []
+        
+        # Trie transitions, failure links and the keywords ending at each state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        
+        for keyword in self.keywords:
+            self._add(keyword)
+        self._build_failure_links()
+    
+    def _add(self, keyword: str):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(keyword)
+    
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                
+                # Inherit matches that end inside this keyword
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def find(self, text: str) -> FrozenSet[str]:
+        """Return every registered keyword occurring in the (lowercased) text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        
+        return frozenset(found)
+    
+    def features(self, message: str) -> MessageFeatures:
+        """Extract the feature vector every routing scorer consumes"""
+        lower = message.lower()
+        return MessageFeatures(
+            text=message,
+            lower=lower,
+            matched=self.find(lower),
+            word_count=len(message.split()),
+            groups=self.groups
+        )
+
+
+# Keyword groups registered by agents, the router and the coordinator
+_groups: Dict[str, FrozenSet[str]] = {}
+_matcher: Optional[KeywordMatcher] = None
+
+
+def register_keyword_groups(groups: Dict[str, Iterable[str]]):
+    """Add keyword groups to the shared matcher, recompiling it on next use if anything changed"""
+    global _matcher
+    for name, keywords in groups.items():
+        keywords = frozenset(k.lower() for k in keywords if k)
+        if _groups.get(name) != keywords:
+            _groups[name] = keywords
+            _matcher = None
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """Get the shared matcher compiled from all registered groups"""
+    global _matcher
+    if _matcher is None:
+        _matcher = KeywordMatcher(_groups)
+    return _matcher
+
+
+def extract_features(message: str) -> MessageFeatures:
+    """Extract message features with the shared matcher"""
+    return get_keyword_matcher().features(message)